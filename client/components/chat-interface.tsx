@@ -58,6 +58,9 @@ export function ChatInterface({
           role: type === "user" ? "user" : "assistant",
           content,
         })),
+        // Scope retrieval to the book or chapter being discussed
+        bookId: context === "global" ? null : bookId,
+        chapterId: context === "chapter" ? chapterId : null,
       }),
     });
 
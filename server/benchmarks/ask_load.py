@@ -0,0 +1,101 @@
+"""
+Load test for the streaming /ask endpoint.
+
+Opens many concurrent streams against a running server and reports the
+time-to-first-token (TTFT) distribution, which is what readers actually feel
+when the server is busy.
+
+    python -m benchmarks.ask_load --url http://localhost:8000/ask --concurrency 128
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_stream(client: httpx.AsyncClient, url: str, question: str) -> dict:
+    started = time.perf_counter()
+    first_token = None
+    chunks = 0
+    async with client.stream(
+        "POST", url, json={"data": {"question": question, "history": []}}
+    ) as response:
+        response.raise_for_status()
+        async for text in response.aiter_text():
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            chunks += 1
+    return {
+        "ttft": first_token if first_token is not None else float("nan"),
+        "total": time.perf_counter() - started,
+        "chunks": chunks,
+    }
+
+
+async def run_load(url: str, question: str, concurrency: int, timeout: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_stream(client, url, question) for _ in range(concurrency)),
+            return_exceptions=True,
+        )
+        wall = time.perf_counter() - started
+
+    ok = [r for r in results if isinstance(r, dict)]
+    errors = [repr(r) for r in results if not isinstance(r, dict)]
+    ttft = [r["ttft"] for r in ok if r["ttft"] == r["ttft"]]
+    totals = [r["total"] for r in ok]
+    return {
+        "concurrency": concurrency,
+        "completed": len(ok),
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "ttft_seconds": {
+            "min": round(min(ttft), 3) if ttft else None,
+            "p50": round(percentile(ttft, 50), 3),
+            "p90": round(percentile(ttft, 90), 3),
+            "p99": round(percentile(ttft, 99), 3),
+            "max": round(max(ttft), 3) if ttft else None,
+            "mean": round(statistics.fmean(ttft), 3) if ttft else None,
+        },
+        "total_seconds": {
+            "p50": round(percentile(totals, 50), 3),
+            "p99": round(percentile(totals, 99), 3),
+        },
+        "sample_errors": errors[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/ask")
+    parser.add_argument("--question", default="What is hoisting?")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 32, 128],
+        help="One or more concurrency levels to run in sequence.",
+    )
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        report = asyncio.run(run_load(args.url, args.question, concurrency, args.timeout))
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
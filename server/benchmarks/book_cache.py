@@ -0,0 +1,144 @@
+"""
+On-disk size and warm-load time of the book cache for the full corpus.
+
+Stores every page of the synthetic corpus the previous way (page JSON appended
+to `readme_cache` on every refresh) and in the compressed, content-addressed
+tables, each in its own temporary SQLite file, then times loading every page's
+text back the way `load_page_contents` does.
+
+    python -m benchmarks.book_cache --scale 1 --refreshes 3
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from configs import lite_db
+
+
+def db_bytes(path: Path) -> int:
+    # Checkpoint the WAL so the main file holds everything.
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def store_legacy(path: Path, pages: list[dict], refreshes: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE readme_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha TEXT NOT NULL,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_readme_cache_sha ON readme_cache (sha, id DESC)")
+    for _ in range(refreshes):
+        conn.executemany(
+            "INSERT INTO readme_cache (sha, content) VALUES (?, ?)",
+            [(f'page-{page["sha"]}', json.dumps(page)) for page in pages],
+        )
+    conn.commit()
+    conn.close()
+
+
+def load_legacy(path: Path, keys: list[str]) -> dict[str, str]:
+    conn = sqlite3.connect(path)
+    found = {}
+    for start in range(0, len(keys), 500):
+        batch = keys[start : start + 500]
+        rows = conn.execute(
+            f"""
+            SELECT sha, content FROM readme_cache WHERE id IN (
+                SELECT MAX(id) FROM readme_cache WHERE sha IN ({", ".join(["?"] * len(batch))}) GROUP BY sha
+            )
+            """,
+            batch,
+        ).fetchall()
+        found.update((key, json.loads(content).get("content", "")) for key, content in rows)
+    conn.close()
+    return found
+
+
+def use_database(path: Path) -> None:
+    lite_db.close_db_connections()
+    lite_db.DB_PATH = path
+
+
+def time_loads(load, keys: list[str], repeats: int) -> list[float]:
+    load(keys)  # warm the page cache
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        assert len(load(keys)) == len(keys)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="Multiple of the real corpus size.")
+    parser.add_argument("--refreshes", type=int, default=3, help="Times the corpus is re-cached.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from benchmarks.corpus import iter_corpus
+    from module.book.cache import (
+        _zstd,
+        get_cache_stats,
+        get_cached_records,
+        init_cache_db,
+        update_cache_many,
+    )
+
+    pages = [{**page, "path": f'{book["id"]}/{page["path"]}'} for book, page in iter_corpus(args.scale)]
+    keys = [f'page-{page["sha"]}' for page in pages]
+    text_bytes = sum(len(page["content"].encode("utf-8")) for page in pages)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = Path(directory) / "legacy.db"
+        store_legacy(legacy_path, pages, args.refreshes)
+        legacy_load = time_loads(lambda k: load_legacy(legacy_path, k), keys, args.repeats)
+
+        path = Path(directory) / "app.db"
+        use_database(path)
+        init_cache_db()
+        sources = {key: page for key, page in zip(keys, pages)}
+        started = time.perf_counter()
+        for _ in range(args.refreshes):
+            update_cache_many({key: page["content"] for key, page in zip(keys, pages)}, sources)
+        store_seconds = (time.perf_counter() - started) / args.refreshes
+        load = time_loads(get_cached_records, keys, args.repeats)
+        stats = get_cache_stats()
+        use_database(path)
+
+        print(
+            json.dumps(
+                {
+                    "pages": len(pages),
+                    "text_bytes": text_bytes,
+                    "refreshes": args.refreshes,
+                    "zstd": _zstd() is not None,
+                    "legacy_db_bytes": db_bytes(legacy_path),
+                    "db_bytes": db_bytes(path),
+                    "compression_ratio": round(stats["compression_ratio"], 2),
+                    "store_ms": round(store_seconds * 1000, 1),
+                    "legacy_load_ms": round(statistics.median(legacy_load) * 1000, 2),
+                    "load_ms": round(statistics.median(load) * 1000, 2),
+                }
+            )
+        )
+        lite_db.close_db_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Prompt size and time-to-first-token with and without the context packer.
+
+Retrieves the top-k chunks for a set of identifier questions, then prompts the
+chat model once with every chunk joined (the previous behaviour) and once with
+the packed context. By default the index is built from the synthetic corpus and
+the model is a fake whose prefill time is proportional to the prompt; --ollama
+uses the configured embedder and chat model, --live the app's own index.
+
+    python -m benchmarks.context_packing --k 8 --budget 1024
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+async def time_to_first_token(chat_llm, prompt) -> float:
+    started = time.perf_counter()
+    async for _ in chat_llm.astream(prompt):
+        return time.perf_counter() - started
+    return time.perf_counter() - started
+
+
+async def run(chat_llm, embedder, questions: list[str], k: int, budget: int) -> dict:
+    from module.ask.context import count_tokens, pack_context
+    from module.ask.helpers import join_documents, search_documents
+    from prompts.doc_assistant import build_assistant_prompt
+
+    rows = {"joined": [], "packed": []}
+    for question in questions:
+        embedding = await embedder.aembed_query(question)
+        docs = await search_documents(embedding, k=k, question=question)
+        packed, _ = pack_context(docs, budget)
+        for mode, context in (("joined", join_documents(docs)), ("packed", packed)):
+            prompt = build_assistant_prompt(question, context)
+            ttft = await time_to_first_token(chat_llm, prompt)
+            rows[mode].append((count_tokens(context), ttft))
+
+    result = {"k": k, "budget": budget, "queries": len(questions)}
+    for mode, values in rows.items():
+        result[f"{mode}_context_tokens"] = round(statistics.mean(v[0] for v in values), 1)
+        result[f"{mode}_ttft_ms"] = round(statistics.mean(v[1] for v in values) * 1000, 1)
+    result["tokens_saved_pct"] = round(
+        100 * (1 - result["packed_context_tokens"] / result["joined_context_tokens"]), 1
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--budget", type=int, default=1024)
+    parser.add_argument("--prefill", type=float, default=400.0, help="Fake model: prompt tokens per second.")
+    parser.add_argument("--ollama", action="store_true", help="Use the configured Ollama models.")
+    parser.add_argument("--live", action="store_true", help="Query the app's existing index.")
+    args = parser.parse_args()
+
+    if not args.live:
+        workdir = tempfile.mkdtemp(prefix="context-packing-")
+        os.environ["APP_DB_PATH"] = os.path.join(workdir, "app.db")
+        os.chdir(workdir)
+
+    from benchmarks.corpus import IDENTIFIERS
+    from benchmarks.retrieval_eval import QUESTION_TEMPLATES, build_synthetic_index
+    from module.search.cache import init_search_db
+
+    if args.ollama or args.live:
+        from configs.llm import chat_llm, embedder
+    else:
+        from benchmarks.fakes import FakeChatModel, FakeEmbedder
+
+        chat_llm, embedder = FakeChatModel(prefill_tokens_per_sec=args.prefill), FakeEmbedder()
+
+    init_search_db()
+    if not args.live:
+        asyncio.run(build_synthetic_index(embedder, 1))
+
+    questions = [template.format(name) for name in IDENTIFIERS[:10] for template in QUESTION_TEMPLATES]
+    for k in args.k:
+        print(json.dumps(asyncio.run(run(chat_llm, embedder, questions, k, args.budget))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Deterministic synthetic corpus shaped like the YDKJS books.
+
+Pages are generated lazily, so a corpus many times the size of the real one
+can be streamed without ever being held in memory by the generator itself.
+"""
+
+import hashlib
+import random
+from pathlib import Path
+from typing import Iterator
+
+from module.book.types import Book, BookPage
+
+BOOKS = [
+    "get-started",
+    "scope-closures",
+    "objects-classes",
+    "types-grammar",
+    "sync-async",
+    "es-next-beyond",
+]
+
+IDENTIFIERS = [
+    "Object.freeze", "Object.seal", "Symbol.iterator", "Promise.all", "Array.from",
+    "Reflect.ownKeys", "Proxy", "WeakMap", "globalThis", "??=", "?.", "async function*",
+    "Function.prototype.bind", "Object.defineProperty", "Number.isNaN", "typeof null",
+    "let", "const", "var", "this", "new.target", "super", "yield", "await", "import.meta",
+]
+
+WORDS = (
+    "scope closure lexical hoisting value type coercion object prototype class "
+    "module function callback promise iterator generator engine compile runtime "
+    "variable declaration expression statement property reference behavior program"
+).split()
+
+# Roughly the size of the real corpus: 6 books x 12 chapters x ~40 KB.
+CHAPTERS_PER_BOOK = 12
+PARAGRAPHS_PER_CHAPTER = 120
+
+
+def _paragraph(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(40, 70))]
+    if rng.random() < 0.5:
+        words.insert(rng.randrange(len(words)), f"`{rng.choice(IDENTIFIERS)}`")
+    return " ".join(words).capitalize() + "."
+
+
+def _code_block(rng: random.Random) -> str:
+    name = rng.choice(WORDS)
+    return (
+        "```js\n"
+        f"function {name}() {{\n"
+        f"    var {rng.choice(WORDS)} = {rng.choice(IDENTIFIERS)};\n"
+        f"    return {name};\n"
+        "}\n```"
+    )
+
+
+def generate_page(book_id: str, chapter: int, revision: int = 0) -> str:
+    rng = random.Random(f"{book_id}/{chapter}/{revision}")
+    parts = [f"# You Don't Know JS: {book_id}\n## Chapter {chapter}: {rng.choice(WORDS).title()}"]
+    for index in range(PARAGRAPHS_PER_CHAPTER):
+        if index % 15 == 0:
+            parts.append(f"### {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}")
+        parts.append(_code_block(rng) if rng.random() < 0.15 else _paragraph(rng))
+    return "\n\n".join(parts)
+
+
+def iter_corpus(scale: int = 1) -> Iterator[tuple[Book, BookPage]]:
+    """
+    Yield (book, page) pairs with content, `scale` times the size of the real corpus.
+    Copies beyond the first get their own book ids so every page is distinct.
+    """
+    for copy in range(scale):
+        for name in BOOKS:
+            book_id = name if copy == 0 else f"{name}-{copy}"
+            book: Book = {"name": book_id.replace("-", " ").title(), "id": book_id, "sha": book_id, "pages": []}
+            for chapter in range(1, CHAPTERS_PER_BOOK + 1):
+                content = generate_page(book_id, chapter)
+                sha = hashlib.sha1(content.encode("utf-8")).hexdigest()
+                page: BookPage = {
+                    "path": f"ch{chapter}.md",
+                    "mode": "100644",
+                    "type": "blob",
+                    "sha": sha,
+                    "size": len(content),
+                    "url": f"local://blobs/{sha}",
+                    "content": content,
+                }
+                yield book, page
+
+
+def write_corpus(root: Path, scale: int = 1) -> list[str]:
+    """
+    Lay the corpus out on disk like the YDKJS repository (a README listing the
+    books in reading order, one folder of chapters per book), to serve through
+    `benchmarks.github_stub` or `YDKJS_SOURCE`.
+
+    :return: The book folder names, in reading order.
+    """
+    book_ids = []
+    for book, page in iter_corpus(scale):
+        folder = root / book["id"]
+        if book["id"] not in book_ids:
+            book_ids.append(book["id"])
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / "README.md").write_text(f"# {book['name']}\n", encoding="utf-8")
+        (folder / page["path"]).write_text(page["content"], encoding="utf-8")
+
+    listing = "\n".join(
+        f"{index}. [{book_id.replace('-', ' ').title()}]({book_id}/README.md)"
+        for index, book_id in enumerate(book_ids, start=1)
+    )
+    (root / "README.md").write_text(
+        f"# You Don't Know JS Yet\n\n## Reading order\n\n{listing}\n", encoding="utf-8"
+    )
+    return book_ids
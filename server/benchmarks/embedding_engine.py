@@ -0,0 +1,86 @@
+"""
+Embedding throughput at different batch sizes and concurrency levels.
+
+The baseline is the previous path: one blocking `embed_documents` call per
+64-chunk batch, one batch at a time. By default the backend is a fake with
+Ollama-like latency (fixed cost per request plus a cost per text, with
+requests overlapping up to the server's parallelism); pass --ollama to
+measure the real embedding model instead.
+
+    python -m benchmarks.embedding_engine --chunks 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.corpus import iter_corpus
+from benchmarks.fakes import FakeEmbedder
+from module.llm.embedding import EmbeddingEngine
+
+
+def sample_texts(count: int) -> list[str]:
+    texts = []
+    for _, page in iter_corpus(10):
+        texts.extend(page["content"][i : i + 800] for i in range(0, len(page["content"]), 700))
+        if len(texts) >= count:
+            break
+    return texts[:count]
+
+
+def run_baseline(embedder, texts: list[str]) -> dict:
+    started = time.perf_counter()
+    for start in range(0, len(texts), 64):
+        embedder.embed_documents(texts[start : start + 64])
+    seconds = time.perf_counter() - started
+    return {"mode": "baseline", "seconds": round(seconds, 3), "chunks_per_sec": round(len(texts) / seconds, 1)}
+
+
+async def run_engine(embedder, texts: list[str], batch_size: int, concurrency: int) -> dict:
+    engine = EmbeddingEngine(embedder, batch_size=batch_size, concurrency=concurrency)
+    await engine.embed(texts)
+    stats = engine.stats()
+    return {
+        "mode": "engine",
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "seconds": round(stats["seconds"], 3),
+        "chunks_per_sec": round(stats["chunks_per_sec"], 1),
+        "tokens_per_sec": round(stats["tokens_per_sec"], 1),
+        "retries": stats["retries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--call-latency", type=float, default=0.05, help="Fake backend: seconds per request.")
+    parser.add_argument("--text-latency", type=float, default=0.004, help="Fake backend: seconds per text.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fake backend: fraction of failing requests.")
+    parser.add_argument("--ollama", action="store_true", help="Use the configured Ollama embedder.")
+    args = parser.parse_args()
+
+    if args.ollama:
+        from configs.llm import embedder
+    else:
+        embedder = FakeEmbedder(
+            call_latency=args.call_latency,
+            text_latency=args.text_latency,
+            failure_rate=args.failure_rate,
+        )
+
+    texts = sample_texts(args.chunks)
+    baseline = run_baseline(embedder, texts)
+    print(json.dumps(baseline))
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            result = asyncio.run(run_engine(embedder, texts, batch_size, concurrency))
+            result["speedup"] = round(result["chunks_per_sec"] / baseline["chunks_per_sec"], 2)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Offline stand-ins for the Ollama models, for benchmarks that must not hit the network.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import struct
+import time
+
+
+class FakeEmbedder:
+    """
+    Deterministic embedder: each text maps to a fixed unit vector derived from its
+    hash, after an optional simulated per-call and per-text latency. A fraction
+    of calls can be made to fail, to exercise retries.
+    """
+
+    def __init__(
+        self,
+        dim: int = 768,
+        call_latency: float = 0.0,
+        text_latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.dim = dim
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.texts = 0
+        self._rng = random.Random(seed)
+
+    def _maybe_fail(self):
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise RuntimeError("simulated embedding backend failure")
+
+    def _vector(self, text: str) -> list[float]:
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        values = []
+        counter = 0
+        while len(values) < self.dim:
+            block = hashlib.sha256(seed + counter.to_bytes(4, "little")).digest()
+            values.extend(v / 2**31 for v in struct.unpack("<8i", block))
+            counter += 1
+        values = values[: self.dim]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.call_latency + self.text_latency * len(texts))
+        self._maybe_fail()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        await asyncio.sleep(self.call_latency + self.text_latency * len(texts))
+        self._maybe_fail()
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeChunk:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Streaming chat model whose time to first token grows with the prompt, like a
+    CPU-hosted model's prefill: `prompt tokens / prefill_tokens_per_sec`, then one
+    reply token every `1 / decode_tokens_per_sec` seconds.
+    """
+
+    def __init__(
+        self,
+        prefill_tokens_per_sec: float = 400.0,
+        decode_tokens_per_sec: float = 20.0,
+        reply: str = "Closures remember the scope they were created in. " * 8,
+    ):
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.decode_tokens_per_sec = decode_tokens_per_sec
+        self.reply = reply
+        self.calls = 0
+
+    @staticmethod
+    def _prompt_tokens(messages) -> int:
+        from module.ask.context import count_tokens
+
+        if isinstance(messages, str):
+            return count_tokens(messages)
+        return sum(count_tokens(message.content) for message in messages)
+
+    async def astream(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self._prompt_tokens(messages) / self.prefill_tokens_per_sec)
+        for word in self.reply.split(" "):
+            yield FakeChunk(word + " ")
+            await asyncio.sleep(1 / self.decode_tokens_per_sec)
+
+    async def ainvoke(self, messages):
+        return FakeChunk("".join([chunk.content async for chunk in self.astream(messages)]))
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the GitHub contents and git trees/blobs API.
+
+Serves a directory (e.g. a checkout of You-Dont-Know-JS) with the same JSON
+shapes, git-compatible SHAs and ETag handling as api.github.com, and can inject
+rate-limit responses and latency. Point the server at it with:
+
+    python -m benchmarks.github_stub ./You-Dont-Know-JS --port 8765
+    YDKJS_REPO_URL=http://127.0.0.1:8765 python entry.py
+
+(To skip HTTP altogether, set YDKJS_SOURCE to the directory instead.)
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from module.book.local_repo import load_directory
+from utils.git_objects import MODE_TREE
+
+
+class GitHubStub:
+    def __init__(self, root: Path, base_url: str, rate_limit_every: int = 0, latency: float = 0.0):
+        repo = load_directory(root)
+        self.root_sha, self.objects = repo.root_sha, repo.objects
+        self.base_url = base_url
+        self.rate_limit_every = rate_limit_every
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def contents(self) -> list[dict]:
+        items = []
+        for mode, name, sha in self.objects[self.root_sha][1]:
+            is_dir = mode == MODE_TREE
+            git_url = f"{self.base_url}/git/{'trees' if is_dir else 'blobs'}/{sha}"
+            items.append(
+                {
+                    "name": name,
+                    "path": name,
+                    "sha": sha,
+                    "size": 0 if is_dir else len(self.objects[sha][1]),
+                    "url": f"{self.base_url}/contents/{name}",
+                    "html_url": f"{self.base_url}/tree/{name}",
+                    "git_url": git_url,
+                    "download_url": None if is_dir else f"{self.base_url}/raw/{name}",
+                    "type": "dir" if is_dir else "file",
+                    "_links": {"self": git_url, "git": git_url, "html": git_url},
+                }
+            )
+        return items
+
+    def tree(self, sha: str) -> dict:
+        entries = []
+        for mode, name, child_sha in self.objects[sha][1]:
+            is_dir = mode == MODE_TREE
+            entry = {
+                "path": name,
+                "mode": mode.zfill(6) if is_dir else mode,
+                "type": "tree" if is_dir else "blob",
+                "sha": child_sha,
+                "url": f"{self.base_url}/git/{'trees' if is_dir else 'blobs'}/{child_sha}",
+            }
+            if not is_dir:
+                entry["size"] = len(self.objects[child_sha][1])
+            entries.append(entry)
+        return {"sha": sha, "url": f"{self.base_url}/git/trees/{sha}", "tree": entries, "truncated": False}
+
+    def blob(self, sha: str) -> dict:
+        data = self.objects[sha][1]
+        return {
+            "sha": sha,
+            "node_id": sha,
+            "size": len(data),
+            "url": f"{self.base_url}/git/blobs/{sha}",
+            "content": base64.encodebytes(data).decode("ascii"),
+            "encoding": "base64",
+        }
+
+    def resolve(self, path: str):
+        parts = path.strip("/").split("/")
+        if parts == ["contents"]:
+            return self.contents()
+        if len(parts) == 3 and parts[0] == "git" and parts[2] in self.objects:
+            kind = self.objects[parts[2]][0]
+            if parts[1] == "trees" and kind == "tree":
+                return self.tree(parts[2])
+            if parts[1] == "blobs" and kind == "blob":
+                return self.blob(parts[2])
+        return None
+
+
+def make_handler(stub: GitHubStub):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body: bytes = b"", headers: dict | None = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if body:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if stub.latency:
+                time.sleep(stub.latency)
+            with stub.lock:
+                stub.requests += 1
+                limited = stub.rate_limit_every and stub.requests % stub.rate_limit_every == 0
+            if limited:
+                reset = str(int(time.time()) + 1)
+                self.send_json(
+                    403,
+                    b'{"message": "API rate limit exceeded"}',
+                    {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset},
+                )
+                return
+
+            payload = stub.resolve(self.path.split("?", 1)[0])
+            if payload is None:
+                self.send_json(404, b'{"message": "Not Found"}')
+                return
+
+            body = json.dumps(payload).encode("utf-8")
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_json(304, headers={"ETag": etag})
+                return
+            self.send_json(200, body, {"ETag": etag})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", type=Path, help="Directory to serve as the repository.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with a 403 rate limit.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay each response.")
+    args = parser.parse_args()
+
+    stub = GitHubStub(
+        args.root, f"http://{args.host}:{args.port}", args.rate_limit_every, args.latency
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub))
+    print(f"Serving {args.root} ({len(stub.objects)} objects) on {stub.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
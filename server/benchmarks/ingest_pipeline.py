@@ -0,0 +1,106 @@
+"""
+Ingestion memory/throughput benchmark on a synthetic corpus.
+
+Runs the streaming index pipeline, and the previous concatenate-then-split
+approach for comparison, each in a fresh process against a temporary Chroma
+directory and SQLite file, with a fake embedder so no model is needed.
+
+    python -m benchmarks.ingest_pipeline --scale 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+async def run_pipeline(scale: int, collection, embedder) -> dict:
+    from benchmarks.corpus import iter_corpus
+    from module.index.pipeline import run_index_pipeline
+
+    async def pages():
+        for book, page in iter_corpus(scale):
+            yield book, page
+
+    return await run_index_pipeline(
+        pages(), lambda book, page, count: None, collection=collection, embedder=embedder, model="fake"
+    )
+
+
+def run_legacy(scale: int, collection, embedder) -> dict:
+    from benchmarks.corpus import iter_corpus
+    from module.llm.helpers import embed_chunks, get_chunk_id, split_document_into_chunks, upsert_chunks
+
+    started = time.perf_counter()
+    full_content = ""
+    for _, page in iter_corpus(scale):
+        full_content += f"\n\n-----\n\n{page['content']}"
+    chunks = split_document_into_chunks(full_content)
+    vectors, embedded = embed_chunks(chunks, embedder, "fake")
+    unique = {get_chunk_id(doc): (doc, vector) for doc, vector in zip(chunks, vectors)}
+    ids = list(unique)
+    for start in range(0, len(ids), 1000):
+        batch = ids[start : start + 1000]
+        upsert_chunks(
+            collection, batch, [unique[i][1] for i in batch], [unique[i][0] for i in batch]
+        )
+    seconds = time.perf_counter() - started
+    return {"chunks": len(chunks), "embedded": embedded, "seconds": seconds, "chunks_per_sec": len(chunks) / seconds}
+
+
+def child(mode: str, scale: int, workdir: Path) -> None:
+    os.environ["APP_DB_PATH"] = str(workdir / "app.db")
+    import chromadb
+
+    from benchmarks.fakes import FakeEmbedder
+    from module.llm.cache import init_embedding_cache_db
+
+    init_embedding_cache_db()
+    client = chromadb.PersistentClient(path=str(workdir / "chroma"))
+    collection = client.get_or_create_collection("bench", embedding_function=None)
+    embedder = FakeEmbedder()
+
+    if mode == "pipeline":
+        stats = asyncio.run(run_pipeline(scale, collection, embedder))
+    else:
+        stats = run_legacy(scale, collection, embedder)
+
+    print(json.dumps({"mode": mode, "scale": scale, "peak_rss_mb": round(peak_rss_mb(), 1), **stats}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10, help="Multiple of the real corpus size.")
+    parser.add_argument("--modes", nargs="+", default=["pipeline", "legacy"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.scale, args.workdir)
+        return
+
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.ingest_pipeline", "--child", mode,
+                 "--scale", str(args.scale), "--workdir", workdir],
+                check=True, capture_output=True, text=True,
+            )
+            print(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
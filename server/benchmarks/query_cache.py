@@ -0,0 +1,71 @@
+"""
+Latency of retrieval with cold and warm query caches.
+
+Embeds and retrieves a set of questions twice against a temporary synthetic
+index: the first pass misses both cache levels, the second hits them.
+
+    python -m benchmarks.query_cache --embed-latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+async def timed_retrieval(questions: list[str]) -> list[float]:
+    from module.ask.helpers import embed_question, search_documents
+
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        embedding = await embed_question(question)
+        await search_documents(embedding, question=question)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def summarize(label: str, latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "pass": label,
+        "queries": len(latencies),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--embed-latency", type=float, default=0.03, help="Fake embedder: seconds per call.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query-cache-")
+    os.environ["APP_DB_PATH"] = os.path.join(workdir, "app.db")
+    os.chdir(workdir)
+
+    from benchmarks.corpus import IDENTIFIERS
+    from benchmarks.fakes import FakeEmbedder
+    from benchmarks.retrieval_eval import QUESTION_TEMPLATES, build_synthetic_index
+    import configs.llm
+    from module.ask import helpers
+    from module.index.cache import init_index_db
+    from module.search.cache import init_search_db
+
+    init_index_db()
+    init_search_db()
+    embedder = FakeEmbedder(call_latency=args.embed_latency)
+    configs.llm.embedder = embedder
+    asyncio.run(build_synthetic_index(embedder, 1))
+
+    questions = [template.format(name) for name in IDENTIFIERS for template in QUESTION_TEMPLATES]
+    for label in ("cold", "warm"):
+        print(json.dumps(summarize(label, asyncio.run(timed_retrieval(questions)))))
+    print(json.dumps(helpers.get_query_cache_stats()))
+
+
+if __name__ == "__main__":
+    main()
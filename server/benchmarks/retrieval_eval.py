@@ -0,0 +1,119 @@
+"""
+Recall@k and latency of vector-only versus hybrid (BM25 + vector) retrieval.
+
+Each query asks about one JS identifier; the relevant set is every chunk that
+literally contains it. By default a temporary index is built from the synthetic
+corpus; --live evaluates the app's own index (run `python entry.py` first).
+
+    python -m benchmarks.retrieval_eval --ollama
+    python -m benchmarks.retrieval_eval --live
+
+Without --ollama the fake embedder gives meaningless vectors, so vector-only
+recall is a floor and only the lexical side and latencies are representative.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+QUESTION_TEMPLATES = [
+    "How does {} work?",
+    "When should I use {}?",
+    "What does the book say about {}?",
+]
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def build_synthetic_index(embedder, scale: int):
+    from benchmarks.corpus import iter_corpus
+    from module.index.pipeline import run_index_pipeline
+    from module.llm.cache import init_embedding_cache_db
+
+    init_embedding_cache_db()
+
+    async def pages():
+        for book, page in iter_corpus(scale):
+            yield book, page
+
+    await run_index_pipeline(pages(), lambda book, page, count: None, embedder=embedder, model="eval")
+
+
+async def evaluate(embedder, identifiers: list[str], ks: list[int]) -> list[dict]:
+    from configs.chroma_db import collection
+    from module.ask.helpers import search_documents
+
+    queries = []
+    for identifier in identifiers:
+        relevant = set(collection.get(where_document={"$contains": identifier}, include=[])["ids"])
+        if relevant:
+            for template in QUESTION_TEMPLATES:
+                queries.append((template.format(identifier), relevant))
+
+    results = []
+    for mode in ("vector", "hybrid"):
+        os.environ["RETRIEVAL_MODE"] = mode
+        for k in ks:
+            recalls, latencies = [], []
+            for question, relevant in queries:
+                embedding = await embedder.aembed_query(question)
+                started = time.perf_counter()
+                docs = await search_documents(embedding, k=k, question=question)
+                latencies.append((time.perf_counter() - started) * 1000)
+                found = {doc.id for doc in docs}
+                recalls.append(len(found & relevant) / min(k, len(relevant)))
+            results.append(
+                {
+                    "mode": mode,
+                    "k": k,
+                    "queries": len(queries),
+                    "recall": round(statistics.mean(recalls), 3),
+                    "latency_ms_p50": round(percentile(latencies, 0.5), 2),
+                    "latency_ms_p95": round(percentile(latencies, 0.95), 2),
+                }
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--scale", type=int, default=1, help="Synthetic corpus size, in multiples of the real one.")
+    parser.add_argument("--ollama", action="store_true", help="Embed with the configured Ollama model.")
+    parser.add_argument("--live", action="store_true", help="Evaluate the app's existing index.")
+    args = parser.parse_args()
+
+    if not args.live:
+        # Point SQLite and Chroma (which opens ./chroma_db) at a scratch directory
+        # before anything imports them.
+        workdir = tempfile.mkdtemp(prefix="retrieval-eval-")
+        os.environ["APP_DB_PATH"] = os.path.join(workdir, "app.db")
+        os.chdir(workdir)
+
+    from benchmarks.corpus import IDENTIFIERS
+    from module.search.cache import init_search_db
+
+    if args.ollama or args.live:
+        from configs.llm import embedder
+    else:
+        from benchmarks.fakes import FakeEmbedder
+
+        embedder = FakeEmbedder()
+
+    init_search_db()
+    if not args.live:
+        asyncio.run(build_synthetic_index(embedder, args.scale))
+
+    for result in asyncio.run(evaluate(embedder, IDENTIFIERS, args.k)):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Offline benchmark suite for ingestion, retrieval and /ask.
+
+Everything runs against a temporary directory: the synthetic corpus is served
+by the local GitHub stub, the embedder and chat model are deterministic fakes,
+and Chroma and SQLite live in the scratch directory, so no network or model is
+needed and runs are comparable across machines and commits.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --output after.json --baseline results.json
+
+Benchmarks: startup (import time of the app, from `python -X importtime`,
+checked against --import-budget-ms), chunking, embedding, get_books (cold and warm), ingestion,
+retrieval (p50/p99, cold and cached) and ask (time to first token and
+tokens/sec at several concurrency levels). With --baseline, every metric is
+compared with the baseline run and regressions beyond --threshold are listed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+# Metrics where a larger value is better; for every other metric smaller is better.
+HIGHER_IS_BETTER = ("_per_sec", "recall")
+# Counts that describe the workload rather than its speed.
+NOT_COMPARED = ("budget_ms", "pages", "chunks", "queries", "concurrency", "batch_size", "books", "bytes", "streams")
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(seconds) * 1000, 3),
+    }
+
+
+class Suite:
+    """
+    Shared state for one run: the scratch directory, the stub server and the
+    fakes patched in for the Ollama models.
+    """
+
+    def __init__(self, workdir: Path, args: argparse.Namespace):
+        self.workdir = workdir
+        self.args = args
+        self.books = None
+        self.indexed = False
+
+    def setup(self) -> None:
+        from benchmarks.corpus import write_corpus
+
+        repo = self.workdir / "repo"
+        self.book_ids = write_corpus(repo, self.args.scale)
+
+        from benchmarks.github_stub import GitHubStub, make_handler
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), None)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.stub = GitHubStub(repo, base_url, latency=self.args.github_latency)
+        server.RequestHandlerClass = make_handler(self.stub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # Read at import time by the modules below.
+        os.environ["YDKJS_REPO_URL"] = base_url
+        os.environ.pop("YDKJS_SOURCE", None)
+        os.environ["APP_DB_PATH"] = str(self.workdir / "app.db")
+        os.environ["ANSWER_CACHE_ENABLED"] = "false"
+        os.environ["SINGLE_FLIGHT_ENABLED"] = "false"
+        os.chdir(self.workdir)
+
+        from benchmarks.fakes import FakeChatModel, FakeEmbedder
+        import configs.llm
+
+        configs.llm.embedder = FakeEmbedder(
+            call_latency=self.args.embed_call_latency,
+            text_latency=self.args.embed_text_latency,
+        )
+        configs.llm.chat_llm = FakeChatModel(
+            prefill_tokens_per_sec=self.args.prefill_tokens_per_sec,
+            decode_tokens_per_sec=1 / self.args.token_latency,
+        )
+
+        from module.ask.cache import init_answer_cache_db
+        from module.book.cache import init_cache_db
+        from module.index.cache import init_index_db
+        from module.llm.cache import init_embedding_cache_db
+        from module.search.cache import init_search_db
+
+        init_cache_db()
+        init_embedding_cache_db()
+        init_index_db()
+        init_search_db()
+        init_answer_cache_db()
+
+    def questions(self) -> list[str]:
+        from benchmarks.corpus import IDENTIFIERS
+        from benchmarks.retrieval_eval import QUESTION_TEMPLATES
+
+        return [template.format(name) for name in IDENTIFIERS for template in QUESTION_TEMPLATES]
+
+    async def ensure_index(self) -> None:
+        if not self.indexed:
+            await self.bench_ingestion()
+
+    async def bench_startup(self) -> dict:
+        """
+        Import the app in fresh interpreters, as uvicorn does on start and on every
+        reload, and keep the fastest of a few runs.
+        """
+        runs = []
+        for _ in range(self.args.import_runs):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {self.args.import_target}"],
+                cwd=Path(__file__).parent.parent,
+                env=os.environ,
+                capture_output=True,
+                text=True,
+            )
+            wall = time.perf_counter() - started
+            if completed.returncode != 0:
+                raise RuntimeError(f"Importing {self.args.import_target} failed:\n{completed.stderr[-2000:]}")
+            runs.append((wall, parse_importtime(completed.stderr)))
+
+        wall, modules = min(runs, key=lambda run: run[0])
+        # Direct imports of the target (and of site, which is negligible).
+        children = {name: us for name, (_, us, depth) in modules.items() if depth == 1}
+        slowest = sorted(children.items(), key=lambda item: item[1], reverse=True)[:10]
+        result = {
+            "import_ms": round(modules[self.args.import_target][1] / 1000, 1),
+            "process_ms": round(wall * 1000, 1),
+            "modules": len(modules),
+            "slowest": [f"{name} {us / 1000:.1f}ms" for name, us in slowest],
+        }
+        if self.args.import_budget_ms:
+            result["budget_ms"] = self.args.import_budget_ms
+            result["over_budget"] = result["import_ms"] > self.args.import_budget_ms
+        return result
+
+    async def bench_chunking(self) -> dict:
+        from benchmarks.corpus import iter_corpus
+        from module.index.pipeline import get_page_metadata
+        from module.llm.helpers import split_document_into_chunks
+
+        pages = list(iter_corpus(self.args.scale))
+        size = sum(len(page["content"].encode("utf-8")) for _, page in pages)
+        started = time.perf_counter()
+        chunks = sum(
+            len(split_document_into_chunks(page["content"], metadata=get_page_metadata(book, page)))
+            for book, page in pages
+        )
+        seconds = time.perf_counter() - started
+        return {
+            "pages": len(pages),
+            "bytes": size,
+            "chunks": chunks,
+            "seconds": round(seconds, 3),
+            "mb_per_sec": round(size / seconds / 1e6, 2),
+            "chunks_per_sec": round(chunks / seconds, 1),
+        }
+
+    async def bench_embedding(self) -> dict:
+        from benchmarks.corpus import iter_corpus
+        from module.llm.embedding import EmbeddingEngine
+        from module.llm.helpers import split_document_into_chunks
+
+        texts = []
+        for _, page in iter_corpus(self.args.scale):
+            texts.extend(doc.page_content for doc in split_document_into_chunks(page["content"]))
+            if len(texts) >= self.args.embed_chunks:
+                break
+        engine = EmbeddingEngine()
+        await engine.embed(texts[: self.args.embed_chunks])
+        stats = engine.stats()
+        return {
+            "chunks": stats["chunks"],
+            "batch_size": stats["batch_size"],
+            "concurrency": stats["concurrency"],
+            "seconds": round(stats["seconds"], 3),
+            "chunks_per_sec": round(stats["chunks_per_sec"], 1),
+            "tokens_per_sec": round(stats["tokens_per_sec"], 1),
+        }
+
+    async def bench_get_books(self) -> dict:
+        from module.book.controller import get_books
+        from utils.make_request import close_http_client
+
+        result = {}
+        try:
+            for label in ("cold", "warm"):
+                requests_before = self.stub.requests
+                started = time.perf_counter()
+                books = await get_books()
+                result[f"{label}_seconds"] = round(time.perf_counter() - started, 4)
+                result[f"{label}_requests"] = self.stub.requests - requests_before
+        finally:
+            await close_http_client()
+        result["books"] = len(books)
+        result["pages"] = sum(len(book["pages"]) for book in books)
+        return result
+
+    async def bench_ingestion(self) -> dict:
+        from module.book.controller import get_book_index
+        from module.index.controller import sync_index
+        from utils.make_request import close_http_client
+
+        try:
+            books = await get_book_index()
+            started = time.perf_counter()
+            summary = await sync_index(books)
+        finally:
+            await close_http_client()
+        seconds = time.perf_counter() - started
+        self.indexed = True
+        return {
+            "pages": summary["pages"]["added"],
+            "chunks": summary["chunks"]["added"],
+            "seconds": round(seconds, 3),
+            "chunks_per_sec": round(summary["chunks"]["added"] / seconds, 1),
+        }
+
+    async def bench_retrieval(self) -> dict:
+        await self.ensure_index()
+        from module.ask import helpers
+
+        result = {"queries": len(self.questions())}
+        for mode in ("vector", "hybrid"):
+            os.environ["RETRIEVAL_MODE"] = mode
+            for label in ("cold", "cached"):
+                latencies = []
+                for question in self.questions():
+                    if label == "cold":
+                        helpers.retrieval_cache.clear()
+                        helpers.query_embedding_cache.clear()
+                    else:
+                        embedding = await helpers.embed_question(question)
+                        await helpers.search_documents(embedding, question=question)
+                    started = time.perf_counter()
+                    embedding = await helpers.embed_question(question)
+                    await helpers.search_documents(embedding, question=question)
+                    latencies.append(time.perf_counter() - started)
+                for name, value in latency_summary(latencies).items():
+                    result[f"{mode}_{label}_{name}"] = value
+        os.environ.pop("RETRIEVAL_MODE")
+        return result
+
+    async def bench_ask(self) -> dict:
+        await self.ensure_index()
+        from module.ask import helpers
+        from module.ask.controller import ask_with_streaming
+
+        async def stream(question: str) -> tuple[float, float, int]:
+            started = time.perf_counter()
+            first_token, tokens = None, 0
+            async for piece in ask_with_streaming(question):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                tokens += 1
+            total = time.perf_counter() - started
+            decode = total - first_token
+            return first_token, tokens / decode if decode else 0.0, tokens
+
+        result = {}
+        questions = self.questions()
+        for concurrency in self.args.concurrency:
+            helpers.retrieval_cache.clear()
+            batch = [questions[i % len(questions)] + f" ({i})" for i in range(concurrency)]
+            started = time.perf_counter()
+            runs = await asyncio.gather(*(stream(question) for question in batch))
+            wall = time.perf_counter() - started
+            ttfts = [ttft for ttft, _, _ in runs]
+            prefix = f"c{concurrency}"
+            result[f"{prefix}_streams"] = concurrency
+            result[f"{prefix}_ttft_p50_ms"] = round(percentile(ttfts, 0.5) * 1000, 2)
+            result[f"{prefix}_ttft_p99_ms"] = round(percentile(ttfts, 0.99) * 1000, 2)
+            result[f"{prefix}_tokens_per_sec"] = round(
+                statistics.mean(rate for _, rate, _ in runs), 1
+            )
+            result[f"{prefix}_total_tokens_per_sec"] = round(
+                sum(tokens for _, _, tokens in runs) / wall, 1
+            )
+        return result
+
+
+BENCHMARKS = ["startup", "chunking", "embedding", "get_books", "ingestion", "retrieval", "ask"]
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int, int]]:
+    """
+    :return: Module name -> (self us, cumulative us, nesting depth) from the
+        `-X importtime` report.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(own), int(cumulative), depth)
+    return modules
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    :return: One row per metric present in both runs, with the relative change
+        and whether it is a regression beyond `threshold`.
+    """
+    rows = []
+    for bench, metrics in results.items():
+        for name, value in metrics.items():
+            before = baseline.get(bench, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            if name.endswith(NOT_COMPARED) or "requests" in name or not before:
+                continue
+            change = (value - before) / before
+            higher_is_better = any(marker in name for marker in HIGHER_IS_BETTER)
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "benchmark": bench,
+                    "metric": name,
+                    "baseline": before,
+                    "value": value,
+                    "change_pct": round(change * 100, 1),
+                    "regression": worse > threshold,
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument("--baseline", type=Path, help="A previous --output to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression.")
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size, in multiples of the real one.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--embed-chunks", type=int, default=2000)
+    parser.add_argument("--embed-call-latency", type=float, default=0.02)
+    parser.add_argument("--embed-text-latency", type=float, default=0.001)
+    parser.add_argument("--github-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Fake chat model: seconds per token.")
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--import-target", default="entry", help="Module whose import time is measured.")
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, help="Fail the run if importing takes longer.")
+    args = parser.parse_args()
+
+    output = args.output.resolve() if args.output else None
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as workdir:
+        suite = Suite(Path(workdir), args)
+        suite.setup()
+        results = {}
+        for name in BENCHMARKS:
+            if name not in args.only:
+                continue
+            results[name] = asyncio.run(getattr(suite, f"bench_{name}")())
+            print(json.dumps({"benchmark": name, **results[name]}))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    if output:
+        output.write_text(json.dumps(report, indent=2, default=str))
+
+    if baseline:
+        rows = compare(results, baseline["results"], args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f'{row["benchmark"]:>10} {row["metric"]:<32} {row["baseline"]:>12} -> '
+                f'{row["value"]:>12} {row["change_pct"]:>+7.1f}% {flag}'
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+    if results.get("startup", {}).get("over_budget"):
+        print(f'Import of {args.import_target} is over budget: {results["startup"]}')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
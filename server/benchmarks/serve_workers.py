@@ -0,0 +1,127 @@
+"""
+Retrieval throughput and memory of several read-only workers on one flat index.
+
+Publishes a flat index of random unit vectors, then for each worker count
+starts that many worker processes on it. All workers start querying at the
+same moment and keep going for --seconds. The report gives the aggregate
+queries/sec and each worker's RSS and PSS (proportional set size: pages
+shared through the page cache are split between the processes mapping them).
+With --republish, a new generation is published halfway through and the
+workers report every generation they served from.
+
+    python -m benchmarks.serve_workers --size 50000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.ingest_pipeline import peak_rss_mb
+from benchmarks.run import latency_summary
+from benchmarks.vector_backends import iter_vectors
+
+
+def memory_mb() -> dict:
+    # Linux only; elsewhere just the peak RSS.
+    try:
+        rollup = Path("/proc/self/smaps_rollup").read_text().splitlines()
+    except OSError:
+        return {"peak_rss_mb": round(peak_rss_mb(), 1)}
+    fields = {line.split(":")[0]: int(line.split()[1]) for line in rollup[1:]}
+    return {"rss_mb": round(fields["Rss"] / 1024, 1), "pss_mb": round(fields["Pss"] / 1024, 1)}
+
+
+def worker(index: Path, dims: int, seconds: float, start_at: float) -> dict:
+    import numpy as np
+
+    from module.search.flat_index import FlatIndex
+
+    retriever = FlatIndex(index)
+    queries = np.random.default_rng(os.getpid()).standard_normal((256, dims)).tolist()
+    retriever.similarity_search_by_vector(queries[0], k=20)
+
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies = []
+    generations = set()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        retriever.similarity_search_by_vector(queries[len(latencies) % len(queries)], k=20)
+        latencies.append(time.perf_counter() - started)
+        generations.add(retriever.stats()["generation"])
+    return {
+        "queries": len(latencies),
+        "latency": latency_summary(latencies),
+        "generations": sorted(generations),
+        **memory_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--republish", action="store_true", help="Publish a new generation mid-run.")
+    parser.add_argument(
+        "--blas-threads",
+        type=int,
+        default=1,
+        help="BLAS threads per worker; 1 leaves the cores to the workers.",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--index", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(worker(args.index, args.dims, args.seconds, args.start_at)))
+        return
+
+    from module.search.flat_index import write_flat_index
+
+    threads = str(args.blas_threads)
+    env = {**os.environ, "OMP_NUM_THREADS": threads, "OPENBLAS_NUM_THREADS": threads, "MKL_NUM_THREADS": threads}
+    with tempfile.TemporaryDirectory() as workdir:
+        index = Path(workdir) / "flat_index"
+        write_flat_index(index, iter_vectors(args.size, args.dims), args.size)
+
+        for count in args.workers:
+            # Long enough for every worker to import NumPy and map the index.
+            start_at = time.time() + 3 + count * 0.5
+            children = [
+                subprocess.Popen(
+                    [sys.executable, "-m", "benchmarks.serve_workers", "--child",
+                     "--index", str(index), "--dims", str(args.dims),
+                     "--seconds", str(args.seconds), "--start-at", str(start_at)],
+                    stdout=subprocess.PIPE, text=True, env=env,
+                )
+                for _ in range(count)
+            ]
+            if args.republish:
+                time.sleep(max(0.0, start_at - time.time()) + args.seconds / 2)
+                write_flat_index(index, iter_vectors(args.size, args.dims), args.size)
+            results = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+
+            print(
+                json.dumps(
+                    {
+                        "workers": count,
+                        "size": args.size,
+                        "queries_per_sec": round(sum(r["queries"] for r in results) / args.seconds, 1),
+                        "p50_ms": round(sorted(r["latency"]["p50_ms"] for r in results)[len(results) // 2], 3),
+                        "generations": sorted({g for r in results for g in r["generations"]}),
+                        "memory_mb": [{k: v for k, v in r.items() if k.endswith("_mb")} for r in results],
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
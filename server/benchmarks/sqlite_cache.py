@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for readme_cache lookups.
+
+Compares the previous access pattern (a fresh connection per query against an
+unindexed, append-only table) with the pooled WAL connections in configs/lite_db
+and the content-addressed cache tables the old table is migrated into. Each
+database is built in a temporary directory.
+
+    python -m benchmarks.sqlite_cache --rows 10000 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from configs import lite_db
+from module.book.cache import get_cached_text, init_cache_db
+
+
+def populate(path: Path, rows: int, distinct: int) -> list[str]:
+    shas = [f"page-{random.getrandbits(160):040x}" for _ in range(distinct)]
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE readme_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha TEXT NOT NULL,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    payload = json.dumps({"path": "ch1.md", "content": "x" * 200})
+    batch = 50_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO readme_cache (sha, content) VALUES (?, ?)",
+            [(shas[i % distinct], payload) for i in range(start, min(rows, start + batch))],
+        )
+    conn.commit()
+    conn.close()
+    return shas
+
+
+def lookup_unpooled(path: Path, sha: str):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT * FROM readme_cache WHERE sha = ? ORDER BY id DESC LIMIT 1", (sha,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def measure(lookup, shas: list[str], budget: float, threads: int = 1) -> float:
+    """
+    Run lookups for roughly `budget` seconds and return lookups per second.
+    """
+    counts = [0] * threads
+    deadline = time.perf_counter() + budget
+
+    def worker(slot: int):
+        rng = random.Random(slot)
+        while time.perf_counter() < deadline:
+            lookup(rng.choice(shas))
+            counts[slot] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def run(rows: int, budget: float, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "app.db"
+        shas = populate(path, rows, distinct=max(1, rows // 4))
+
+        before = measure(lambda sha: lookup_unpooled(path, sha), shas, budget)
+
+        lite_db.close_db_connections()
+        lite_db.DB_PATH = path
+        init_cache_db()
+        after = measure(get_cached_text, shas, budget)
+        after_threaded = measure(get_cached_text, shas, budget, threads=threads)
+        lite_db.close_db_connections()
+
+        return {
+            "rows": rows,
+            "before_lookups_per_sec": round(before, 1),
+            "after_lookups_per_sec": round(after, 1),
+            f"after_{threads}_threads_lookups_per_sec": round(after_threaded, 1),
+            "speedup": round(after / before, 1) if before else None,
+            "db_bytes": os.path.getsize(path),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--seconds", type=float, default=3.0, help="Budget per measurement.")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        print(json.dumps(run(rows, args.seconds, args.threads), indent=2))
+
+
+if __name__ == "__main__":
+    main()
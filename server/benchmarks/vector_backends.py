@@ -0,0 +1,172 @@
+"""
+Query latency, memory and startup time of the vector backends.
+
+Builds a Chroma collection and a flat index (float16 and float32) of random
+unit vectors at each size, then, in a fresh process per backend and size,
+times opening the index, the first query, single queries (p50/p99), scoped and batched
+queries, and reports the peak RSS. Building happens in its own process so the
+query process only pays for what a server would.
+
+    python -m benchmarks.vector_backends --sizes 5000 50000 500000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.ingest_pipeline import peak_rss_mb
+from benchmarks.run import latency_summary
+
+BOOKS = 10
+
+
+def iter_vectors(size: int, dims: int, batch_size: int = 5000):
+    import numpy as np
+
+    for start in range(0, size, batch_size):
+        rng = np.random.default_rng(start)
+        vectors = rng.standard_normal((min(batch_size, size - start), dims), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"chunk-{start + i}" for i in range(len(vectors))]
+        metadatas = [
+            {"book_id": f"book-{(start + i) % BOOKS}", "chapter": f"ch{(start + i) % 7}", "chunk_index": start + i}
+            for i in range(len(vectors))
+        ]
+        documents = [f"Synthetic chunk {start + i}." for i in range(len(vectors))]
+        yield ids, documents, metadatas, vectors
+
+
+def make_queries(count: int, size: int, dims: int) -> list[list[float]]:
+    import numpy as np
+
+    # Near existing rows, so every query has a clear nearest neighbour.
+    rng = np.random.default_rng(size)
+    rows = sorted(rng.integers(0, size, count).tolist())
+    queries = []
+    for start, (_, _, _, vectors) in zip(range(0, size, 5000), iter_vectors(size, dims)):
+        for row in rows:
+            if start <= row < start + len(vectors):
+                queries.append((vectors[row - start] + rng.normal(0, 0.02, dims)).tolist())
+    rng.shuffle(queries)
+    return queries
+
+
+def build(backend: str, size: int, dims: int, workdir: Path) -> dict:
+    started = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=str(workdir / "chroma")).get_or_create_collection(
+            "bench", embedding_function=None
+        )
+        for ids, documents, metadatas, vectors in iter_vectors(size, dims):
+            collection.upsert(ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas)
+    else:
+        from module.search.flat_index import write_flat_index
+
+        dtype = backend.removeprefix("flat-")
+        write_flat_index(workdir / backend, iter_vectors(size, dims), size, dtype)
+    return {"build_seconds": round(time.perf_counter() - started, 2)}
+
+
+def open_backend(backend: str, workdir: Path):
+    if backend == "chroma":
+        import chromadb
+        from langchain_chroma import Chroma
+
+        from benchmarks.fakes import FakeEmbedder
+        from module.search.vector import ChromaRetriever
+
+        client = chromadb.PersistentClient(path=str(workdir / "chroma"))
+        collection = client.get_or_create_collection("bench", embedding_function=None)
+        vector_store = Chroma(collection_name="bench", embedding_function=FakeEmbedder(), client=client)
+        return ChromaRetriever(vector_store, collection)
+
+    from module.search.flat_index import FlatIndex
+
+    return FlatIndex(workdir / backend)
+
+
+def query(backend: str, size: int, dims: int, workdir: Path, queries: int, batch_size: int) -> dict:
+    vectors = make_queries(queries, size, dims)
+
+    started = time.perf_counter()
+    retriever = open_backend(backend, workdir)
+    open_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    retriever.similarity_search_by_vector(vectors[0], k=4)
+    first_query = time.perf_counter() - started
+    assert retriever.count() == size
+
+    single = []
+    for vector in vectors:
+        started = time.perf_counter()
+        retriever.similarity_search_by_vector(vector, k=20)
+        single.append(time.perf_counter() - started)
+
+    scoped = []
+    for vector in vectors:
+        started = time.perf_counter()
+        retriever.similarity_search_by_vector(vector, k=20, filter={"book_id": "book-3"})
+        scoped.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch_size):
+        retriever.similarity_search_by_vectors(vectors[start : start + batch_size], k=20)
+    batched = time.perf_counter() - started
+
+    return {
+        # Importing the backend and opening the index: what a restarted worker waits for.
+        "startup_ms": round(open_seconds * 1000, 1),
+        "first_query_ms": round(first_query * 1000, 2),
+        "query": latency_summary(single),
+        "scoped_query": latency_summary(scoped),
+        "batched_queries_per_sec": round(len(vectors) / batched, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000, 500000])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "flat-float16", "flat-float32"])
+    parser.add_argument("--dims", type=int, default=768, help="nomic-embed-text vectors have 768.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--child", choices=["build", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, size = args.backends[0], args.sizes[0]
+        if args.child == "build":
+            stats = build(backend, size, args.dims, args.workdir)
+        else:
+            stats = query(backend, size, args.dims, args.workdir, args.queries, args.batch_size)
+        print(json.dumps(stats))
+        return
+
+    def run_child(step: str, backend: str, size: int, workdir: str) -> dict:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.vector_backends", "--child", step,
+             "--backends", backend, "--sizes", str(size), "--dims", str(args.dims),
+             "--queries", str(args.queries), "--batch-size", str(args.batch_size), "--workdir", workdir],
+            check=True, capture_output=True, text=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    for size in args.sizes:
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory() as workdir:
+                stats = run_child("build", backend, size, workdir)
+                stats.update(run_child("query", backend, size, workdir))
+                disk = sum(path.stat().st_size for path in Path(workdir).rglob("*") if path.is_file())
+                print(json.dumps({"backend": backend, "size": size, "disk_mb": round(disk / 2**20, 1), **stats}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,64 @@
-from chromadb import PersistentClient  # This is for development purposes only.
-from langchain_chroma import Chroma
-from configs.llm import embedder
+import threading
 
-chroma_client = PersistentClient(path="./chroma_db")
+collection_name = "ydkjs_collection"
 
+# Opening the persistent client loads chromadb and its SQLite store, so nothing is
+# built until first use: `chroma_db.collection` and friends are created on first
+# access (see configs.llm for the same pattern) and cached as module attributes.
+_lock = threading.RLock()
+
+
+def _create_chroma_client():
+    from chromadb import PersistentClient  # This is for development purposes only.
+
+    return PersistentClient(path="./chroma_db")
+
+
+def _create_vector_store():
+    from langchain_chroma import Chroma
+    from configs import llm
+
+    return Chroma(
+        collection_name=collection_name, embedding_function=llm.embedder, client=_get("chroma_client")
+    )
+
+
+def _create_retriever():
+    # What retrieval searches, chosen by VECTOR_BACKEND (see module.search.vector).
+    # The flat backend never opens Chroma in the serving process.
+    from module.search.vector import ChromaRetriever, vector_backend
+
+    if vector_backend() == "flat":
+        from module.search.flat_index import FlatIndex
+
+        return FlatIndex()
+    return ChromaRetriever(_get("vector_store"), _get("collection"))
+
+
+def _create_collection():
+    # Raw handle for ingestion, which upserts precomputed vectors under deterministic ids.
+    return _get("chroma_client").get_or_create_collection(
+        name=collection_name, embedding_function=None
+    )
+
+
+_factories = {
+    "chroma_client": _create_chroma_client,
+    "vector_store": _create_vector_store,
+    "retriever": _create_retriever,
+    "collection": _create_collection,
+}
+
+
+def _get(name: str):
+    # Re-entrant: building the vector store first builds the client.
+    with _lock:
+        if name not in globals():
+            globals()[name] = _factories[name]()
+    return globals()[name]
 
-collection_name = "ydkjs_collection"
 
-retriever = Chroma(
-    collection_name=collection_name, embedding_function=embedder, client=chroma_client
-).as_retriever()
+def __getattr__(name: str):
+    if name not in _factories:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _get(name)
@@ -1,26 +1,167 @@
+import atexit
+import os
+import shutil
 import sqlite3
+import threading
+import time
 from pathlib import Path
 from contextlib import contextmanager
 
-DB_PATH = Path(__file__).parent.parent / "app.db"
+# Where app.db lived before APP_DB_PATH pointed into a mounted data directory.
+LEGACY_DB_PATH = Path(__file__).parent.parent / "app.db"
+DB_PATH = Path(os.getenv("APP_DB_PATH", LEGACY_DB_PATH))
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+# Each thread keeps one connection open for its lifetime: the asyncio.to_thread
+# workers that query the cache are reused, so connection setup and the sqlite3
+# statement cache survive across queries instead of being rebuilt every call.
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+PRAGMAS = (
+    # Only takes effect on a new, empty database; older ones are switched by
+    # compact_db with a one-off VACUUM.
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+def move_legacy_db() -> bool:
+    """
+    Move server/app.db to APP_DB_PATH when that does not exist yet, so the book
+    and embedding caches survive the move to a data directory. Call before the
+    first connection is opened.
+    :return: Whether a database was moved.
+    """
+    if DB_PATH.exists() or not LEGACY_DB_PATH.exists() or DB_PATH.resolve() == LEGACY_DB_PATH.resolve():
+        return False
+    # Copied (the target may be another filesystem) WAL first and the database
+    # last, each through a rename, so DB_PATH only appears once complete. The
+    # shared-memory file is rebuilt from the WAL.
+    for suffix in ("-wal", ""):
+        source = Path(f"{LEGACY_DB_PATH}{suffix}")
+        if source.exists():
+            partial = Path(f"{DB_PATH}{suffix}.partial")
+            shutil.copy2(source, partial)
+            os.replace(partial, f"{DB_PATH}{suffix}")
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{LEGACY_DB_PATH}{suffix}").unlink(missing_ok=True)
+    print(f"Moved {LEGACY_DB_PATH} to {DB_PATH}")
+    return True
+
+
+def _connect() -> sqlite3.Connection:
+    # check_same_thread is off only so close_db_connections can close from any thread.
+    conn = sqlite3.connect(
+        DB_PATH, timeout=30, cached_statements=256, check_same_thread=False
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _thread_connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = _local.conn = _connect()
+        _local.generation = _generation
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_db_connections() -> None:
+    """
+    Close every pooled connection, e.g. at shutdown or after pointing DB_PATH elsewhere.
+    """
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        # Threads still holding a closed connection reconnect on their next query.
+        _generation += 1
+
+
+atexit.register(close_db_connections)
+
+
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = _thread_connection()
     try:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def run_db_query(query: str, params=(), fetchone=False, fetchall=False):
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
+        cursor = conn.execute(query, params)
         if fetchone:
             return cursor.fetchone()
         if fetchall:
             return cursor.fetchall()
         return None
+
+
+def run_db_many(query: str, seq_of_params) -> None:
+    with get_db_connection() as conn:
+        conn.executemany(query, seq_of_params)
+
+
+def get_db_size() -> dict:
+    with get_db_connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    wal = DB_PATH.with_name(DB_PATH.name + "-wal")
+    return {
+        "file_bytes": DB_PATH.stat().st_size if DB_PATH.exists() else 0,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+        "used_bytes": (page_count - free_pages) * page_size,
+        "free_bytes": free_pages * page_size,
+    }
+
+
+def compact_db(step_pages: int = 256, pause: float = 0.01) -> dict:
+    """
+    Return free pages to the filesystem a few at a time.
+
+    Each `incremental_vacuum` step is a short write transaction; WAL readers
+    keep going throughout and writers wait at most one step. A database created
+    before incremental auto-vacuum was enabled needs one full VACUUM to switch
+    modes, which rewrites the file once.
+    :return: File sizes before and after, and how the space was reclaimed.
+    """
+    before = get_db_size()
+    conn = _thread_connection()
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    full_vacuum = mode != 2
+    if full_vacuum:
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            # The pragma frees pages as its rows are stepped through.
+            conn.execute(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+            conn.commit()
+            time.sleep(pause)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    after = get_db_size()
+    return {
+        "full_vacuum": full_vacuum,
+        "bytes_before": before["file_bytes"] + before["wal_bytes"],
+        "bytes_after": after["file_bytes"] + after["wal_bytes"],
+        "bytes_reclaimed": before["file_bytes"] + before["wal_bytes"] - after["file_bytes"] - after["wal_bytes"],
+    }
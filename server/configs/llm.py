@@ -1,11 +1,40 @@
-from langchain_ollama.embeddings import OllamaEmbeddings
-from langchain_ollama import ChatOllama
+import threading
 
-embedder = OllamaEmbeddings(model="nomic-embed-text")
+embedding_model = "nomic-embed-text"
+chat_model = "gemma:2b"  # llama3.2, gemma3:4b
 
-chat_llm = ChatOllama(
-    model="gemma:2b",  # llama3.2, gemma3:4b
-    temperature=0,  # for deterministic output 0 ~ 1.0 creative output
-    top_p=1,  # a.k.a. nucleus sampling, focus level 0.2 ~ diverse 1.0
-    top_k=0,  # most likely next tokens., 40 is a good value for most tasks
-)
+# The clients are built on first use rather than at import, so importing the app
+# (and every uvicorn reload) does not wait for langchain_ollama. Modules read
+# them as `llm.embedder` / `llm.chat_llm` at call time; assigning either
+# attribute (as the benchmarks do with fakes) replaces it everywhere.
+_lock = threading.Lock()
+
+
+def _create_embedder():
+    from langchain_ollama.embeddings import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=embedding_model)
+
+
+def _create_chat_llm():
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(
+        model=chat_model,
+        temperature=0,  # for deterministic output 0 ~ 1.0 creative output
+        top_p=1,  # a.k.a. nucleus sampling, focus level 0.2 ~ diverse 1.0
+        top_k=0,  # most likely next tokens., 40 is a good value for most tasks
+    )
+
+
+_factories = {"embedder": _create_embedder, "chat_llm": _create_chat_llm}
+
+
+def __getattr__(name: str):
+    factory = _factories.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
@@ -0,0 +1,21 @@
+import os
+
+# SERVE_MODE=single (the default): one server process owns everything. It
+# creates the SQLite schema, restores INDEX_SNAPSHOT, compacts the book cache
+# and may use either vector backend.
+#
+# SERVE_MODE=workers: the process is one of several request workers, e.g.
+# `uvicorn entry:app --workers 4`. Workers search the flat index read-only and
+# never open Chroma or change the schema. A separate writer process
+# (`python entry.py sync --interval-hours N`) ingests, publishes new index
+# generations and compacts the caches. The writer serves the ingestion and
+# embedding metrics on its own /metrics (--metrics-port); the workers' /metrics
+# only has the request metrics.
+
+
+def serve_mode() -> str:
+    return os.getenv("SERVE_MODE", "single").lower()
+
+
+def is_worker() -> bool:
+    return serve_mode() == "workers"
@@ -1,78 +1,320 @@
+import argparse
 import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
 from http.client import responses
+from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Body
-from starlette.responses import StreamingResponse
+from fastapi import FastAPI, Body, HTTPException, Query
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from configs.chroma_db import retriever
-from configs.llm import chat_llm
-from module.llm.helpers import split_document_into_chunks, store_embeddings
-from prompts.doc_assistant import build_assistant_prompt
-
 load_dotenv()
 
-from module.book.cache import init_cache_db
-from module.book.controller import get_books
+from configs import chroma_db
+from configs.lite_db import move_legacy_db
+from configs.serving import is_worker
+from module.book.cache import init_cache_db, compact_cache, get_cache_stats
+from module.index.cache import init_index_db
+from module.search.cache import init_search_db
+from module.ask.cache import init_answer_cache_db, get_answer_cache_stats
+from module.ask.controller import ask_with_streaming, in_flight
+from module.ask.helpers import get_query_cache_stats
+from module.ask.timings import RequestTimer
+from module.ask.warmup import get_readiness, is_ready, run_warmup
+from module.search.vector import vector_backend
+from utils.metrics import CONTENT_TYPE, registry, serve_metrics
+from utils.profiler import SamplingProfiler, profiler_enabled
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    tasks = []
+    if is_worker():
+        # The writer process owns the schema, the index and compaction; a worker
+        # only reads them (see configs.serving).
+        if vector_backend() != "flat":
+            raise RuntimeError("SERVE_MODE=workers needs VECTOR_BACKEND=flat")
+    else:
+        move_legacy_db()
+        init_cache_db()
+        init_answer_cache_db()
+        init_search_db()
+        init_index_db()
+        tasks.append(asyncio.create_task(run_cache_maintenance()))
+    # Models load in the background: the server answers /healthz right away and
+    # /readyz once the warm-up has gone through.
+    tasks.append(asyncio.create_task(run_warmup()))
+    yield
+    for task in tasks:
+        task.cancel()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# One sampler for the process: a second /debug/profile while it runs gets a 409.
+profiler = SamplingProfiler()
 
 class Data(BaseModel):
     question: str
-    history: list[str] = []
+    history: list[dict[str, str] | str] = []
 
 class AskRequest(BaseModel):
     data: Data
 
-def ask_with_streaming(question: str):
-    docs = retriever.invoke(question)
-    context = "\n\n".join([doc.page_content for doc in docs])
-    prompt = build_assistant_prompt(question, context)
-    for chunk in chat_llm.stream(prompt):
-        # print(chunk.content, end="", flush=True)
-        yield chunk.content
+async def run_cache_maintenance():
+    """
+    Compact the book cache every CACHE_COMPACT_INTERVAL_HOURS (off by default;
+    `python entry.py compact` does the same on demand).
+    """
+    hours = float(os.getenv("CACHE_COMPACT_INTERVAL_HOURS", 0))
+    if hours <= 0:
+        return
+    while True:
+        await asyncio.sleep(hours * 3600)
+        try:
+            print(f"Cache compaction: {await asyncio.to_thread(compact_cache)}")
+        except Exception as e:
+            print(f"Cache compaction failed: {e!r}")
+
+async def init_chroma(publish_flat_index: bool = False):
+    # Ingestion-only imports, kept out of the server's startup path.
+    from module.book.controller import get_book_index, prune_book_cache
+    from module.book.local_repo import get_local_repo
+    from module.index.controller import sync_index
+    from module.index.cache import bump_index_generation
+    from module.search.vector import rebuild_vector_index
+    from utils.make_request import close_http_client
+
+    # A YDKJS_SOURCE checkout may have moved since the last sync of a long-running writer.
+    get_local_repo.cache_clear()
+    try:
+        books = await get_book_index()
+        if not books:
+            print("No books found, leaving the index untouched")
+            return
+        summary = await sync_index(books)
+    finally:
+        await close_http_client()
+    print(f"Index sync: {summary}")
+    changed = any(summary["chunks"][kind] for kind in ("added", "updated", "removed"))
+    flat_rows = await asyncio.to_thread(
+        rebuild_vector_index, None, not changed, publish_flat_index
+    )
+    if flat_rows is not None:
+        # Servers reading the flat index drop results cached against the old one.
+        bump_index_generation()
+        print(f"Flat index rebuilt: {flat_rows} chunks")
+    # Only after a complete sync: what the books no longer refer to is garbage.
+    print(f"Cache entries pruned: {await prune_book_cache(books)}")
 
 
-# Define the retrieval + LLM chain
-def ask_question(question: str):
-    docs = retriever.invoke(question)
-    context = "\n\n".join([doc.page_content for doc in docs])
-    prompt = build_assistant_prompt(question, context)
-    return chat_llm.invoke(prompt).content
+async def run_writer(interval_hours: float, metrics_port: int = 0) -> None:
+    """
+    Sync once, or every `interval_hours` as the long-running writer next to
+    SERVE_MODE=workers servers, compacting the cache on its own schedule. An empty
+    collection is first seeded from INDEX_SNAPSHOT, so the sync only embeds
+    what changed since the snapshot.
 
+    The writer itself runs without SERVE_MODE (and so on the Chroma backend), but
+    always publishes the flat index the workers read. A long-running writer
+    serves its ingestion and embedding metrics on `metrics_port` (0 to not).
+    """
+    from module.index.snapshot import SnapshotError, restore_snapshot_if_empty
 
-async def init_chroma():
-    books = await get_books()
-    full_content = ""
-    for book in books:
-        for page in book["pages"]:
-            full_content += f"\n\n-----\n\n{page['content']}"
-    chunks = split_document_into_chunks(full_content)
-    store_embeddings(chunks)
+    try:
+        await asyncio.to_thread(restore_snapshot_if_empty, None, chroma_db.collection)
+    except SnapshotError as e:
+        print(f"Ignoring the index snapshot, syncing from scratch: {e}")
+    if interval_hours <= 0:
+        await init_chroma(publish_flat_index=True)
+        return
 
+    if metrics_port:
+        serve_metrics(metrics_port)
+        print(f"Serving writer metrics on :{metrics_port}/metrics")
+    maintenance = asyncio.create_task(run_cache_maintenance())
+    try:
+        while True:
+            try:
+                await init_chroma(publish_flat_index=True)
+            except Exception as e:
+                print(f"Index sync failed: {e!r}")
+            await asyncio.sleep(interval_hours * 3600)
+    finally:
+        maintenance.cancel()
 
-# response = ask_question("How does JavaScript's event loop work?")
+
+# response = asyncio.run(ask_question("How does JavaScript's event loop work?"))
 # print(response)
-# ask_with_streaming("how can I ensure an object is immutable")
 
 @app.get("/")
 def hello(request = Body(...)) -> dict[str, str]:
     return { "message": "Hello, World!" }
 
+@app.get("/healthz")
+def healthz() -> dict[str, str]:
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz() -> JSONResponse:
+    return JSONResponse(get_readiness(), status_code=200 if is_ready() else 503)
+
+@app.get("/stats")
+async def stats() -> dict:
+    answer_cache = await asyncio.to_thread(get_answer_cache_stats)
+    book_cache = await asyncio.to_thread(get_cache_stats)
+    return {
+        "answer_cache": answer_cache,
+        "book_cache": book_cache,
+        "query_cache": get_query_cache_stats(),
+        "vector_index": await asyncio.to_thread(chroma_db.retriever.stats),
+        "single_flight": in_flight.stats(),
+    }
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    # The ydkjs_ask_* request metrics. Ingestion (ydkjs_ingest_*) and batch
+    # embedding (ydkjs_embed_*) run in `python entry.py sync`, which serves its
+    # own /metrics on --metrics-port.
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/debug/profile")
+async def profile(seconds: float = Query(10.0, gt=0, le=60)) -> PlainTextResponse:
+    """
+    Sample every thread's stack for `seconds` and return the collapsed stacks
+    (for flamegraph.pl or speedscope). Only served with PROFILER_ENABLED=true.
+    """
+    if not profiler_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        stacks = await asyncio.to_thread(profiler.profile, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
 @app.post("/ask")
-def ask(request = Body(...)) -> StreamingResponse:
+async def ask(request = Body(...)) -> StreamingResponse:
+    """
+    Stream the answer as plain text.
+
+    The response starts once the first token is ready, with the stages before it
+    (history, embed, retrieve, cache, pack, prompt, ttft) in a Server-Timing
+    header. With `"stats": true` in the request data, the stream ends with a
+    record separator (\\x1e) and a JSON frame holding every stage timing and
+    the number of chunks streamed.
+    """
+    timer = RequestTimer()
     data = request.get("data", {})
     question = data.get("question", "")
     history = data.get("history", [])
+    # Set by the book and chapter chat views; the global chat sends neither.
+    book_id = data.get("bookId") or None
+    chapter_id = data.get("chapterId") or None
+    if chapter_id and not book_id:
+        raise HTTPException(status_code=400, detail="chapterId requires bookId")
+
+    send_stats = bool(data.get("stats"))
 
     # question = request.data.question
     # history = request.data.history
-    response = ask_with_streaming(question)
-    print(response)
-    return StreamingResponse(response, media_type="text/plain")
+    response = ask_with_streaming(
+        question, book_id=book_id, chapter=chapter_id, history=history, timer=timer
+    )
+    # Wait for the first token so retrieval timings can go out as headers.
+    try:
+        first = await anext(response)
+    except StopAsyncIteration:
+        first = None
+
+    async def body():
+        try:
+            if first is not None:
+                yield first
+                async for piece in response:
+                    yield piece
+        finally:
+            await response.aclose()
+        if send_stats:
+            yield "\x1e" + json.dumps(timer.finish()) + "\n"
+
+    return StreamingResponse(
+        body(), media_type="text/plain", headers={"Server-Timing": timer.server_timing()}
+    )
 #
 
-if __name__ == "__main__":
+def run_snapshot_command(action: str, directory: Path, force: bool) -> None:
+    from configs.chroma_db import collection
+    from module.index.snapshot import SnapshotError, export_snapshot, import_snapshot
+    from module.llm.cache import init_embedding_cache_db
+
+    init_embedding_cache_db()
+    init_index_db()
+    init_search_db()
+    init_answer_cache_db()
+    if action == "export":
+        manifest = export_snapshot(directory)
+    else:
+        if collection.count() and not force:
+            raise SystemExit("The collection already has chunks; pass --force to import anyway")
+        try:
+            manifest = import_snapshot(directory)
+        except SnapshotError as e:
+            raise SystemExit(str(e))
+    print(json.dumps(manifest, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the books and maintain the caches.")
+    commands = parser.add_subparsers(dest="command")
+    sync = commands.add_parser("sync", help="Index the books into Chroma (the default).")
+    sync.add_argument(
+        "--interval-hours",
+        type=float,
+        default=0,
+        help="Keep running and sync this often, as the writer for SERVE_MODE=workers servers.",
+    )
+    sync.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv("WRITER_METRICS_PORT", 8001)),
+        help="With --interval-hours, serve ingestion metrics on this port (0 to not). "
+        "Defaults to WRITER_METRICS_PORT or 8001.",
+    )
+    compact = commands.add_parser("compact", help="Apply cache retention and vacuum app.db.")
+    compact.add_argument("--max-age-days", type=float, help="Defaults to CACHE_MAX_AGE_DAYS.")
+    compact.add_argument("--max-bytes", type=int, help="Defaults to CACHE_MAX_BYTES.")
+    commands.add_parser("stats", help="Print cache statistics as JSON.")
+    snapshot = commands.add_parser("snapshot", help="Export or import a prebuilt index.")
+    snapshot.add_argument("action", choices=["export", "import"])
+    snapshot.add_argument("directory", type=Path)
+    snapshot.add_argument(
+        "--force", action="store_true", help="Import into a collection that already has chunks, replacing them."
+    )
+    args = parser.parse_args()
+
+    move_legacy_db()
     init_cache_db()
-    asyncio.run(init_chroma())
+    if args.command == "compact":
+        print(json.dumps(compact_cache(args.max_age_days, args.max_bytes), indent=2))
+    elif args.command == "stats":
+        print(json.dumps(get_cache_stats(), indent=2))
+    elif args.command == "snapshot":
+        run_snapshot_command(args.action, args.directory, args.force)
+    else:
+        from module.llm.cache import init_embedding_cache_db
+
+        init_embedding_cache_db()
+        init_index_db()
+        init_search_db()
+        # Created here too: request workers read it but never create it.
+        init_answer_cache_db()
+        asyncio.run(
+            run_writer(getattr(args, "interval_hours", 0), getattr(args, "metrics_port", 0))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import hashlib
+import math
+import os
+import re
+import time
+from array import array
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from configs.lite_db import run_db_query
+from module.llm.helpers import get_chunk_id
+
+answer_cache_stats = {"hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+
+def _max_entries() -> int:
+    return int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+
+
+def _similarity_threshold() -> Optional[float]:
+    """
+    Near-duplicate matching is opt-in: set ANSWER_CACHE_SIMILARITY (e.g. 0.95)
+    to reuse answers for differently-worded questions over the same context.
+    """
+    value = os.getenv("ANSWER_CACHE_SIMILARITY")
+    return float(value) if value else None
+
+
+def answer_cache_enabled() -> bool:
+    return os.getenv("ANSWER_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+def get_context_key(docs: list[Document]) -> str:
+    # Retrievers hand back the stored id; derive it the way ingest did for the rest.
+    chunk_ids = sorted(doc.id or get_chunk_id(doc) for doc in docs)
+    return hashlib.sha256("\n".join(chunk_ids).encode("utf-8")).hexdigest()
+
+
+def get_answer_key(question: str, context_key: str) -> str:
+    value = f"{normalize_question(question)}\n{context_key}"
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _pack_embedding(embedding: Optional[list[float]]) -> Optional[bytes]:
+    return array("f", embedding).tobytes() if embedding else None
+
+
+def _unpack_embedding(blob: Optional[bytes]) -> list[float]:
+    vector = array("f")
+    if blob:
+        vector.frombytes(blob)
+    return vector.tolist()
+
+
+def _cosine_similarity(a: list[float], b: list[float]) -> float:
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _touch(key: str) -> None:
+    run_db_query(
+        "UPDATE answer_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?",
+        (time.time(), key),
+    )
+
+
+def get_cached_answer(
+    question: str, docs: list[Document], embedding: Optional[list[float]] = None
+) -> Optional[str]:
+    """
+    Look up a previously generated answer for this question and retrieved context.
+
+    The exact key is the normalized question plus the ids of the retrieved chunks,
+    so re-ingesting a book (which changes the chunk ids) retires stale answers on
+    its own. When a similarity threshold is configured, answers to near-duplicate
+    questions over the very same chunks are reused as well.
+
+    :param question: The user's question.
+    :param docs: The documents retrieved for the question.
+    :param embedding: The question embedding, used for near-duplicate matching.
+    :return: The cached answer, or None on a miss.
+    """
+    context_key = get_context_key(docs)
+    oldest = time.time() - _ttl_seconds()
+
+    key = get_answer_key(question, context_key)
+    row = run_db_query(
+        "SELECT answer FROM answer_cache WHERE key = ? AND created_at >= ?",
+        (key, oldest),
+        fetchone=True,
+    )
+    if row:
+        _touch(key)
+        answer_cache_stats["hits"] += 1
+        return row[0]
+
+    threshold = _similarity_threshold()
+    if threshold is not None and embedding:
+        candidates = run_db_query(
+            "SELECT key, embedding, answer FROM answer_cache "
+            "WHERE context_key = ? AND created_at >= ? AND embedding IS NOT NULL",
+            (context_key, oldest),
+            fetchall=True,
+        )
+        best = max(
+            candidates,
+            key=lambda c: _cosine_similarity(embedding, _unpack_embedding(c[1])),
+            default=None,
+        )
+        if best and _cosine_similarity(embedding, _unpack_embedding(best[1])) >= threshold:
+            _touch(best[0])
+            answer_cache_stats["near_hits"] += 1
+            return best[2]
+
+    answer_cache_stats["misses"] += 1
+    return None
+
+
+def store_answer(
+    question: str,
+    docs: list[Document],
+    answer: str,
+    embedding: Optional[list[float]] = None,
+) -> None:
+    if not answer.strip():
+        return
+    context_key = get_context_key(docs)
+    now = time.time()
+    run_db_query(
+        """
+        INSERT OR REPLACE INTO answer_cache
+            (key, question, context_key, embedding, answer, hits, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        """,
+        (
+            get_answer_key(question, context_key),
+            normalize_question(question),
+            context_key,
+            _pack_embedding(embedding),
+            answer,
+            now,
+            now,
+        ),
+    )
+    answer_cache_stats["stores"] += 1
+    evict_answers()
+
+
+def evict_answers() -> None:
+    """
+    Drop expired answers, then the least recently used ones beyond the size limit.
+    """
+    before = get_answer_cache_size()
+    run_db_query(
+        "DELETE FROM answer_cache WHERE created_at < ?", (time.time() - _ttl_seconds(),)
+    )
+    run_db_query(
+        """
+        DELETE FROM answer_cache WHERE key IN (
+            SELECT key FROM answer_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (_max_entries(),),
+    )
+    answer_cache_stats["evictions"] += before - get_answer_cache_size()
+
+
+def get_answer_cache_size() -> int:
+    return run_db_query("SELECT COUNT(*) FROM answer_cache", fetchone=True)[0]
+
+
+def get_answer_cache_stats() -> dict:
+    lookups = (
+        answer_cache_stats["hits"] + answer_cache_stats["near_hits"] + answer_cache_stats["misses"]
+    )
+    hits = answer_cache_stats["hits"] + answer_cache_stats["near_hits"]
+    return {
+        **answer_cache_stats,
+        "entries": get_answer_cache_size(),
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+def get_conversation_summaries(prefix_keys: list[str]) -> dict[str, tuple[int, str]]:
+    """
+    :param prefix_keys: Keys of conversation prefixes, built with `get_history_key`.
+    :return: A mapping of prefix key to (messages covered, summary) for every key found.
+    """
+    found = {}
+    for start in range(0, len(prefix_keys), 500):
+        batch = prefix_keys[start : start + 500]
+        placeholders = ", ".join(["?"] * len(batch))
+        rows = run_db_query(
+            f"SELECT prefix_key, covered, summary FROM conversation_summaries "
+            f"WHERE prefix_key IN ({placeholders}) AND created_at >= ?",
+            (*batch, time.time() - _ttl_seconds()),
+            fetchall=True,
+        )
+        found.update({prefix_key: (covered, summary) for prefix_key, covered, summary in rows})
+    return found
+
+
+def store_conversation_summary(prefix_key: str, covered: int, summary: str) -> None:
+    now = time.time()
+    run_db_query(
+        "INSERT OR REPLACE INTO conversation_summaries (prefix_key, covered, summary, created_at) "
+        "VALUES (?, ?, ?, ?)",
+        (prefix_key, covered, summary, now),
+    )
+    run_db_query(
+        "DELETE FROM conversation_summaries WHERE created_at < ?", (now - _ttl_seconds(),)
+    )
+
+
+def init_answer_cache_db() -> None:
+    create_table = """
+    CREATE TABLE IF NOT EXISTS answer_cache (
+        key TEXT PRIMARY KEY,
+        question TEXT NOT NULL,
+        context_key TEXT NOT NULL,
+        embedding BLOB,
+        answer TEXT NOT NULL,
+        hits INTEGER DEFAULT 0,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL
+    );
+    """
+    run_db_query(create_table)
+    run_db_query(
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_context ON answer_cache (context_key)"
+    )
+    run_db_query(
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_last_used ON answer_cache (last_used_at)"
+    )
+    # Rolling conversation summaries, keyed by a hash of the messages they cover.
+    run_db_query(
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            prefix_key TEXT PRIMARY KEY,
+            covered INTEGER NOT NULL,
+            summary TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        """
+    )
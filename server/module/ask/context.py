@@ -0,0 +1,172 @@
+import functools
+import os
+import re
+
+from langchain_core.documents import Document
+
+from module.ask.types import ContextStats
+from utils.tokens import estimate_tokens
+
+# Chunks are split with a 100-character overlap; look a little further in case
+# the splitter moved the boundary to the next separator.
+_MAX_OVERLAP = 400
+# Shorter suffix/prefix matches are more likely coincidence than real overlap.
+_MIN_OVERLAP = 16
+_SEPARATOR = "\n\n"
+
+
+def _token_budget() -> int:
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", 1024))
+
+
+def _duplicate_threshold() -> float:
+    return float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", 0.8))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_tokenizer():
+    """
+    Load the chat model's tokenizer from CONTEXT_TOKENIZER (a Hugging Face
+    `tokenizer.json`, e.g. gemma's). Without one, tokens are estimated.
+    """
+    path = os.getenv("CONTEXT_TOKENIZER")
+    if not path:
+        return None
+    from tokenizers import Tokenizer
+
+    return Tokenizer.from_file(path)
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _strip_overlap(previous: str, text: str) -> str | None:
+    """
+    :return: `text` without the prefix it shares with the end of `previous`,
+        or None when the two do not overlap.
+    """
+    for size in range(min(len(previous), len(text), _MAX_OVERLAP), _MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return None
+
+
+def merge_adjacent_chunks(docs: list[Document]) -> list[Document]:
+    """
+    Merge retrieved chunks that are neighbours on the same page into one block,
+    removing the text the splitter repeated between them.
+
+    Blocks keep the rank of their best chunk, so the result is still ordered by
+    relevance; chunks without a page position are passed through unchanged.
+    """
+    by_page: dict[str, list[tuple[int, Document]]] = {}
+    blocks: list[tuple[int, Document]] = []
+    for rank, doc in enumerate(docs):
+        page_key = doc.metadata.get("page_key")
+        if page_key is None or doc.metadata.get("chunk_index") is None:
+            blocks.append((rank, doc))
+        else:
+            by_page.setdefault(page_key, []).append((rank, doc))
+
+    for chunks in by_page.values():
+        chunks.sort(key=lambda item: item[1].metadata["chunk_index"])
+        rank, first = chunks[0]
+        text, last_index = first.page_content, first.metadata["chunk_index"]
+        for next_rank, doc in chunks[1:]:
+            index = doc.metadata["chunk_index"]
+            if index == last_index:
+                continue
+            if index == last_index + 1:
+                rest = _strip_overlap(text, doc.page_content)
+                text += rest if rest is not None else _SEPARATOR + doc.page_content
+                rank = min(rank, next_rank)
+            else:
+                blocks.append((rank, Document(page_content=text, metadata=first.metadata)))
+                rank, first, text = next_rank, doc, doc.page_content
+            last_index = index
+        blocks.append((rank, Document(page_content=text, metadata=first.metadata)))
+
+    blocks.sort(key=lambda item: item[0])
+    return [doc for _, doc in blocks]
+
+
+def _shingles(text: str, size: int = 5) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(docs: list[Document]) -> list[Document]:
+    """
+    Drop blocks whose word shingles mostly repeat a better-ranked block, e.g. the
+    same passage quoted in two books.
+    """
+    threshold = _duplicate_threshold()
+    kept: list[tuple[Document, set]] = []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(
+            len(shingles & other) / (len(shingles | other) or 1) >= threshold
+            for _, other in kept
+        ):
+            continue
+        kept.append((doc, shingles))
+    return [doc for doc, _ in kept]
+
+
+def _truncate_to_budget(text: str, tokens: int, budget: int) -> str:
+    # Cut proportionally, then back off to a line or word boundary.
+    cut = text[: max(1, len(text) * budget // max(tokens, 1))]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > len(cut) // 2 else cut
+
+
+def pack_context(docs: list[Document], budget: int | None = None) -> tuple[str, ContextStats]:
+    """
+    Assemble the prompt context from retrieved chunks within a token budget.
+
+    Neighbouring chunks of a page are merged without their overlap, near-duplicate
+    blocks are dropped, and the remaining blocks are added in relevance order while
+    they fit in `budget` tokens (CONTEXT_TOKEN_BUDGET). A block that does not fit is
+    skipped in favour of smaller, less relevant ones; the best block is truncated
+    rather than dropped, so the context is never empty when anything was retrieved.
+
+    :param docs: The retrieved chunks, most relevant first.
+    :param budget: The token budget; defaults to CONTEXT_TOKEN_BUDGET.
+    :return: The context text and what packing saved over joining every chunk.
+    """
+    budget = budget or _token_budget()
+    merged = merge_adjacent_chunks(docs)
+    blocks = drop_near_duplicates(merged)
+
+    separator_tokens = count_tokens(_SEPARATOR)
+    parts: list[str] = []
+    used = 0
+    for doc in blocks:
+        tokens = count_tokens(doc.page_content)
+        cost = tokens + (separator_tokens if parts else 0)
+        if used + cost <= budget:
+            parts.append(doc.page_content)
+            used += cost
+        elif not parts:
+            parts.append(_truncate_to_budget(doc.page_content, tokens, budget))
+            used = count_tokens(parts[0])
+
+    context = _SEPARATOR.join(parts)
+    tokens_in = count_tokens(_SEPARATOR.join(doc.page_content for doc in docs))
+    tokens_out = count_tokens(context)
+    stats: ContextStats = {
+        "chunks": len(docs),
+        "blocks": len(parts),
+        "dropped": len(merged) - len(parts),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "tokens_saved": tokens_in - tokens_out,
+        "budget": budget,
+    }
+    return context, stats
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import AsyncIterator
+
+from configs import llm
+from module.ask.cache import (
+    answer_cache_enabled,
+    get_cached_answer,
+    normalize_question,
+    store_answer,
+)
+from module.ask.context import pack_context
+from module.ask.helpers import (
+    embed_question,
+    replay_answer,
+    retrieve_documents,
+    search_documents,
+)
+from module.ask.history import (
+    format_conversation,
+    get_conversation_key,
+    load_conversation,
+    rewrite_question,
+    schedule_summary_update,
+)
+from module.ask.singleflight import SingleFlight
+from module.ask.timings import RequestTimer
+from module.ask.types import Conversation, HistoryStats
+from prompts.doc_assistant import build_assistant_prompt
+
+in_flight = SingleFlight()
+
+
+def single_flight_enabled() -> bool:
+    return os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def get_flight_key(
+    question: str, book_id: str | None, chapter: str | None, history: list | None
+) -> str:
+    conversation_key = get_conversation_key(history or [], question)
+    value = f"{normalize_question(question)}\n{book_id or ''}\n{chapter or ''}\n{conversation_key}"
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+async def prepare_history(
+    question: str, history: list | None
+) -> tuple[Conversation, str, HistoryStats]:
+    """
+    Load the conversation summary and rewrite a follow-up question for retrieval.
+    :return: The conversation, the question to search with, and how long it took.
+    """
+    started = time.perf_counter()
+    conversation = await asyncio.to_thread(load_conversation, history or [], question)
+    search_question = await rewrite_question(question, conversation)
+    stats: HistoryStats = {
+        "messages": len(conversation["history"]),
+        "summarized": conversation["covered"],
+        "verbatim": len(conversation["messages"]),
+        "rewritten": search_question != question,
+        "seconds": time.perf_counter() - started,
+    }
+    return conversation, search_question, stats
+
+
+async def ask_with_streaming(
+    question: str,
+    book_id: str | None = None,
+    chapter: str | None = None,
+    history: list | None = None,
+    timer: RequestTimer | None = None,
+) -> AsyncIterator[str]:
+    """
+    Answer a question, streaming the reply, sharing the work between identical
+    requests in flight.
+
+    Concurrent requests with the same normalized question, scope and conversation
+    attach to a single retrieval and generation (see `SingleFlight`); late joiners
+    are replayed what was already streamed. See `generate_answer` for the rest.
+
+    :param timer: Collects this request's stage timings; the time to first token,
+        chunk count and total are recorded here however the stream ends. Streams
+        the client abandoned or that failed are counted with the source
+        "cancelled" or "error".
+    """
+    if timer is None:
+        timer = RequestTimer()
+
+    if single_flight_enabled():
+        key = get_flight_key(question, book_id, chapter, history)
+        # Stays "coalesced" unless this request's factory runs the generation.
+        timer.source = "coalesced"
+        stream = in_flight.stream(
+            key, lambda: generate_answer(question, book_id, chapter, history, timer)
+        )
+    else:
+        stream = generate_answer(question, book_id, chapter, history, timer)
+
+    try:
+        async for piece in stream:
+            if not timer.tokens:
+                timer.mark("ttft")
+            timer.tokens += 1
+            yield piece
+    except (GeneratorExit, asyncio.CancelledError):
+        timer.source = "cancelled"
+        raise
+    except Exception:
+        timer.source = "error"
+        raise
+    finally:
+        timer.finish()
+
+
+async def generate_answer(
+    question: str,
+    book_id: str | None = None,
+    chapter: str | None = None,
+    history: list | None = None,
+    timer: RequestTimer | None = None,
+) -> AsyncIterator[str]:
+    """
+    Answer a question with retrieval-augmented generation, streaming the reply.
+
+    Everything from the query embedding to the last token is awaited on the event
+    loop, so the number of concurrent streams is bounded by the model backend
+    rather than by Starlette's threadpool. Answers already generated for the same
+    question and retrieved chunks are replayed from the answer cache instead.
+    The retrieved chunks are packed into a token budget before prompting, since
+    prompt size drives prefill time on the CPU-hosted model.
+
+    With history, follow-up questions are rewritten into standalone ones for
+    retrieval and the answer sees a rolling summary plus the latest messages; the
+    summary is brought up to date in the background after the answer.
+
+    :param book_id: Only retrieve context from this book (the book chat view).
+    :param chapter: Only retrieve context from this chapter of `book_id`.
+    :param history: Earlier messages of the conversation, oldest first.
+    :param timer: Records the embed, retrieve, pack and other stage timings.
+    """
+    if timer is None:
+        timer = RequestTimer()
+    timer.source = "generated"
+
+    conversation, search_question, history_stats = await prepare_history(question, history)
+    timer.record("history", history_stats["seconds"])
+    if history_stats["messages"]:
+        print(f"History: {history_stats}")
+
+    with timer.stage("embed"):
+        embedding = await embed_question(search_question)
+    with timer.stage("retrieve"):
+        docs = await search_documents(
+            embedding, question=search_question, book_id=book_id, chapter=chapter
+        )
+
+    # Keyed by the standalone question, so "why?" in two chats does not share an answer.
+    use_cache = answer_cache_enabled()
+    if use_cache:
+        with timer.stage("cache"):
+            cached = await asyncio.to_thread(get_cached_answer, search_question, docs, embedding)
+        if cached is not None:
+            timer.source = "cached"
+            async for piece in replay_answer(cached):
+                yield piece
+            schedule_summary_update(conversation)
+            return
+
+    with timer.stage("pack"):
+        context, context_stats = pack_context(docs)
+    print(f"Context: {context_stats}")
+    with timer.stage("prompt"):
+        prompt = build_assistant_prompt(question, context, format_conversation(conversation))
+    answer = []
+    generation_started = time.perf_counter()
+    async for chunk in llm.chat_llm.astream(prompt):
+        answer.append(chunk.content)
+        yield chunk.content
+    timer.record("generate", time.perf_counter() - generation_started)
+
+    # Only complete generations reach this point; a disconnect closes the generator first.
+    if use_cache:
+        await asyncio.to_thread(
+            store_answer, search_question, docs, "".join(answer), embedding
+        )
+    schedule_summary_update(conversation)
+
+
+async def ask_question(
+    question: str, book_id: str | None = None, chapter: str | None = None
+) -> str:
+    docs = await retrieve_documents(question, book_id=book_id, chapter=chapter)
+    context, _ = pack_context(docs)
+    prompt = build_assistant_prompt(question, context)
+    response = await llm.chat_llm.ainvoke(prompt)
+    return response.content
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterator
+
+from langchain_core.documents import Document
+
+from configs import chroma_db, llm
+from module.ask.cache import normalize_question
+from module.index.cache import get_index_generation
+from module.llm.helpers import get_chunk_id
+from module.search.cache import search_lexical
+from module.search.helpers import reciprocal_rank_fusion
+from utils.lru_cache import LRUCache
+
+# Level 1: normalized question -> embedding. Level 2: question and scope -> the
+# retrieved chunks. Embeddings only depend on the model, so only level 2 is
+# dropped when the index changes.
+query_embedding_cache = LRUCache(int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048)))
+retrieval_cache = LRUCache(int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024)))
+
+# The index generation is re-read at most this often, so a request rarely
+# touches SQLite just to validate the retrieval cache.
+_GENERATION_CHECK_SECONDS = float(os.getenv("INDEX_GENERATION_CHECK_SECONDS", 1.0))
+_index_state = {"generation": None, "checked_at": 0.0}
+
+
+def retrieval_mode() -> str:
+    # "hybrid" fuses BM25 with the vector search; "vector" is dense retrieval only.
+    return os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+
+
+def _check_index_generation() -> None:
+    now = time.monotonic()
+    if now - _index_state["checked_at"] < _GENERATION_CHECK_SECONDS:
+        return
+    _index_state["checked_at"] = now
+    generation = get_index_generation()
+    if generation != _index_state["generation"]:
+        # Ingestion changed the collection, possibly from another process.
+        retrieval_cache.clear()
+        _index_state["generation"] = generation
+
+
+def get_query_cache_stats() -> dict:
+    return {
+        "embeddings": query_embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "index_generation": _index_state["generation"],
+    }
+
+
+async def embed_question(question: str) -> list[float]:
+    key = (llm.embedding_model, normalize_question(question))
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await llm.embedder.aembed_query(question)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+
+def get_scope_filter(book_id: str | None = None, chapter: str | None = None) -> dict | None:
+    """
+    Build the `where` filter restricting retrieval to a book or one of its chapters.
+    """
+    conditions = []
+    if book_id is not None:
+        conditions.append({"book_id": book_id})
+    if chapter is not None:
+        conditions.append({"chapter": chapter})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+async def search_documents(
+    embedding: list[float],
+    k: int = 4,
+    question: str | None = None,
+    book_id: str | None = None,
+    chapter: str | None = None,
+) -> list[Document]:
+    """
+    Find the chunks for a question, by vector similarity alone or, in hybrid mode
+    and when the question text is given, fused with a BM25 search over the same
+    chunks so exact identifiers (`Object.freeze`, `??=`) are not missed.
+
+    Both searches fetch a wider candidate list and are merged with reciprocal-rank
+    fusion; chunks found only lexically are loaded from the vector backend by id. Given a book
+    (and optionally a chapter), both searches only consider that scope's chunks.
+
+    Results for a question are kept in an LRU cache until the index changes.
+    """
+    if question is None:
+        return await _search_documents(embedding, k, question, book_id, chapter)
+
+    _check_index_generation()
+    generation = _index_state["generation"]
+    key = (retrieval_mode(), normalize_question(question), k, book_id, chapter)
+    docs = retrieval_cache.get(key)
+    if docs is None:
+        docs = await _search_documents(embedding, k, question, book_id, chapter)
+        # A new index published while searching: the result may be from the old one.
+        if _index_state["generation"] == generation:
+            retrieval_cache.put(key, docs)
+    return list(docs)
+
+
+async def _search_documents(
+    embedding: list[float],
+    k: int,
+    question: str | None,
+    book_id: str | None,
+    chapter: str | None,
+) -> list[Document]:
+    scope = get_scope_filter(book_id, chapter)
+    if question is None or retrieval_mode() != "hybrid":
+        return await chroma_db.retriever.asimilarity_search_by_vector(embedding, k=k, filter=scope)
+
+    candidates = max(k * 5, int(os.getenv("RETRIEVAL_CANDIDATES", 20)))
+    vector_docs, lexical = await asyncio.gather(
+        chroma_db.retriever.asimilarity_search_by_vector(embedding, k=candidates, filter=scope),
+        asyncio.to_thread(search_lexical, question, candidates, book_id, chapter),
+    )
+
+    docs = {doc.id or get_chunk_id(doc): doc for doc in vector_docs}
+    ranked = reciprocal_rank_fusion(
+        [list(docs), [chunk_id for chunk_id, _ in lexical]],
+        k=int(os.getenv("RRF_K", 60)),
+    )[:k]
+    missing = [chunk_id for chunk_id in ranked if chunk_id not in docs]
+    if missing:
+        docs.update(await asyncio.to_thread(chroma_db.retriever.get_documents, missing))
+    return [docs[chunk_id] for chunk_id in ranked if chunk_id in docs]
+
+
+async def retrieve_documents(
+    question: str, k: int = 4, book_id: str | None = None, chapter: str | None = None
+) -> list[Document]:
+    """
+    Retrieve the chunks most relevant to a question without blocking the event loop.
+
+    The question is embedded through the async Ollama client and the vector search
+    only borrows the default executor for the duration of the Chroma query, so a
+    streaming request never pins a worker thread while waiting on the model.
+
+    :param question: The user's question.
+    :param k: The number of chunks to return.
+    :param book_id: Restrict retrieval to this book.
+    :param chapter: Restrict retrieval to this chapter of `book_id`.
+    :return: The retrieved documents, most relevant first.
+    """
+    embedding = await embed_question(question)
+    return await search_documents(
+        embedding, k=k, question=question, book_id=book_id, chapter=chapter
+    )
+
+
+def join_documents(docs: list[Document]) -> str:
+    return "\n\n".join([doc.page_content for doc in docs])
+
+
+async def replay_answer(answer: str) -> AsyncIterator[str]:
+    """
+    Stream a stored answer back word by word so a cache hit looks like a live reply.
+    """
+    for piece in re.findall(r"\s*\S+\s*", answer) or [answer]:
+        yield piece
+        await asyncio.sleep(0)
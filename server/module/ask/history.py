@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+
+from configs import llm
+from module.ask.cache import get_conversation_summaries, store_conversation_summary
+from module.ask.types import ChatMessage, Conversation
+from prompts.conversation import build_rewrite_prompt, build_summary_prompt
+
+# Openings that point back at something said earlier: a leading connective
+# ("and for objects?", "what about let?"), or a pronoun as the subject, possibly
+# after a question word and auxiliary ("does it work on arrays?", "why is that?").
+# "this" is left out on purpose: in this corpus it is usually the JS keyword.
+_FOLLOW_UP_RE = re.compile(
+    r"^\s*(?:"
+    r"(?:and|but|also|so|then|instead|what about|how about|what if|why not|same for)\b"
+    r"|(?:(?:what|why|how|when|where)\s+)?"
+    r"(?:(?:is|are|was|were|does|do|did|can|could|would|will|should)\s+)?"
+    r"(?:it|it's|its|that|those|they|them)\b"
+    r")"
+    r"|\bthe (?:previous|above|same) (?:one|answer|example|snippet|code)\b",
+    re.IGNORECASE,
+)
+
+# Summarization tasks still running; referenced so they are not garbage collected.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _recent_messages() -> int:
+    # Messages kept verbatim after the summary: the last two exchanges by default.
+    return int(os.getenv("HISTORY_RECENT_MESSAGES", 4))
+
+
+def _max_message_chars() -> int:
+    return int(os.getenv("HISTORY_MESSAGE_MAX_CHARS", 800))
+
+
+def _max_summary_chars() -> int:
+    return int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", 1200))
+
+
+def _rewrite_mode() -> str:
+    # "llm" rewrites follow-ups with the chat model, "concat" prepends the previous
+    # user message to the search query, "off" searches with the question as asked.
+    return os.getenv("HISTORY_REWRITE", "llm").lower()
+
+
+def normalize_history(history: list) -> list[ChatMessage]:
+    """
+    Accept the client's `{role, content}` messages (plain strings count as user
+    messages) and drop the canned greeting the chat views open with.
+    """
+    messages: list[ChatMessage] = []
+    for item in history or []:
+        if isinstance(item, str):
+            role, content = "user", item
+        else:
+            role, content = item.get("role"), item.get("content") or ""
+            role = "user" if role == "user" else "assistant"
+        if not content.strip():
+            continue
+        if not messages and role == "assistant":
+            continue
+        messages.append({"role": role, "content": content.strip()})
+    return messages
+
+
+def get_history_keys(messages: list[ChatMessage]) -> list[str]:
+    """
+    :return: A chained hash per prefix of the conversation: element i identifies
+        the first i + 1 messages, so a summary is found again only for the exact
+        messages it was made from.
+    """
+    keys, previous = [], ""
+    for message in messages:
+        value = f"{previous}\n{message['role']}\n{message['content']}"
+        previous = hashlib.sha256(value.encode("utf-8")).hexdigest()
+        keys.append(previous)
+    return keys
+
+
+def _format_messages(messages: list[ChatMessage]) -> str:
+    limit = _max_message_chars()
+    lines = []
+    for message in messages:
+        content = message["content"]
+        if len(content) > limit:
+            content = content[:limit].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"{message['role'].title()}: {content}")
+    return "\n".join(lines)
+
+
+def format_conversation(conversation: Conversation) -> str:
+    parts = []
+    if conversation["summary"]:
+        parts.append(f"Summary of earlier messages: {conversation['summary']}")
+    if conversation["messages"]:
+        parts.append(_format_messages(conversation["messages"]))
+    return "\n".join(parts)
+
+
+def _history_messages(history: list, question: str) -> list[ChatMessage]:
+    messages = normalize_history(history)
+    # Clients may or may not include the question being asked as the last message.
+    if messages and messages[-1] == {"role": "user", "content": question.strip()}:
+        messages.pop()
+    return messages
+
+
+def get_conversation_key(history: list, question: str = "") -> str:
+    """
+    :return: A key for the conversation so far; empty when there is no history.
+    """
+    keys = get_history_keys(_history_messages(history, question))
+    return keys[-1] if keys else ""
+
+
+def load_conversation(history: list, question: str = "") -> Conversation:
+    """
+    Find the longest cached summary of this conversation's history and the
+    messages after it.
+
+    Messages the summary does not cover yet are passed on verbatim, capped a little
+    above the recent window in case summarization fell behind, so the prompt stays
+    the same size however long the chat gets.
+    """
+    messages = _history_messages(history, question)
+    keys = get_history_keys(messages)
+    cached = get_conversation_summaries(keys) if keys else {}
+
+    covered, summary = 0, ""
+    for index in range(len(keys) - 1, -1, -1):
+        if keys[index] in cached:
+            covered, summary = cached[keys[index]]
+            break
+
+    pending = messages[covered:]
+    return {
+        "history": messages,
+        "summary": summary,
+        "covered": covered,
+        "messages": pending[-(_recent_messages() + 4) :],
+    }
+
+
+def is_follow_up(question: str) -> bool:
+    return bool(_FOLLOW_UP_RE.search(question))
+
+
+async def rewrite_question(question: str, conversation: Conversation) -> str:
+    """
+    Turn a follow-up question into a standalone one for retrieval.
+    Questions that do not look like follow-ups are returned unchanged.
+    """
+    mode = _rewrite_mode()
+    if mode == "off" or not conversation["history"] or not is_follow_up(question):
+        return question
+
+    if mode == "concat":
+        previous = [m["content"] for m in conversation["history"] if m["role"] == "user"]
+        return f"{previous[-1]} {question}" if previous else question
+
+    prompt = build_rewrite_prompt(question, format_conversation(conversation))
+    response = await llm.chat_llm.ainvoke(prompt)
+    lines = response.content.strip().strip('"').splitlines()
+    rewritten = lines[0].strip() if lines else ""
+    # A rambling reply is worse for retrieval than the original question.
+    if not rewritten or len(rewritten) > 3 * len(question) + 200:
+        return question
+    return rewritten
+
+
+async def update_summary(conversation: Conversation) -> None:
+    """
+    Fold the messages that have left the recent window into the summary, so the
+    next turn only summarizes what is new since this one.
+    """
+    history = conversation["history"]
+    target = len(history) - _recent_messages()
+    if target <= conversation["covered"]:
+        return
+
+    started = time.perf_counter()
+    new_messages = history[conversation["covered"] : target]
+    prompt = build_summary_prompt(conversation["summary"], _format_messages(new_messages))
+    try:
+        response = await llm.chat_llm.ainvoke(prompt)
+    except Exception as e:
+        # The messages stay verbatim and are folded in on a later turn.
+        print(f"Conversation summary failed: {e!r}")
+        return
+    summary = response.content.strip()[: _max_summary_chars()]
+    await asyncio.to_thread(
+        store_conversation_summary, get_history_keys(history[:target])[-1], target, summary
+    )
+    print(
+        f"Summarized {len(new_messages)} messages of a {len(history)}-message conversation "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def schedule_summary_update(conversation: Conversation) -> None:
+    """
+    Update the summary in the background once the answer has been streamed, so
+    summarization never delays the first token.
+    """
+    task = asyncio.create_task(update_summary(conversation))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
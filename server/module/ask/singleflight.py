@@ -0,0 +1,101 @@
+import asyncio
+from typing import AsyncIterator, Callable
+
+
+class _Flight:
+    """
+    One running generation and everything it has emitted so far.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.source = source
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def notify(self) -> None:
+        # Wake every waiting subscriber, and give later waits a fresh event.
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def run(self) -> None:
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self.notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            await self.source.aclose()
+            self.done = True
+            self.notify()
+
+
+class SingleFlight:
+    """
+    Share one streamed generation between concurrent identical requests.
+
+    The first request for a key starts the generation; requests arriving while it
+    runs subscribe to it, get everything emitted so far replayed, then follow the
+    live stream. When the last subscriber goes away before the end, the generation
+    is cancelled so the model stops working for nobody.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.counters = {"started": 0, "coalesced": 0, "cancelled": 0}
+
+    def _start(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> _Flight:
+        flight = _Flight(factory())
+        flight.task = asyncio.create_task(flight.run())
+
+        def forget(_task: asyncio.Task) -> None:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+        flight.task.add_done_callback(forget)
+        self._flights[key] = flight
+        self.counters["started"] += 1
+        return flight
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """
+        :param key: Identifies requests that may share a generation.
+        :param factory: Creates the stream when no generation for `key` is running.
+        :return: The full stream, from its first chunk, for every subscriber.
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.done:
+            flight = self._start(key, factory)
+        else:
+            self.counters["coalesced"] += 1
+
+        flight.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                while sent < len(flight.chunks):
+                    yield flight.chunks[sent]
+                    sent += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+                self.counters["cancelled"] += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._flights)}
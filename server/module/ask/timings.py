@@ -0,0 +1,81 @@
+import time
+from contextlib import contextmanager
+
+from module.ask.types import AskTimings
+from utils.metrics import COUNT_BUCKETS, registry
+
+ask_stage_seconds = registry.histogram(
+    "ydkjs_ask_stage_seconds",
+    "Time spent in each stage of an /ask request.",
+    ("stage",),
+)
+ask_tokens = registry.histogram(
+    "ydkjs_ask_tokens",
+    "Chunks streamed back per /ask request.",
+    buckets=COUNT_BUCKETS,
+)
+ask_requests = registry.counter(
+    "ydkjs_ask_requests_total",
+    "/ask requests by how the answer was produced, or cancelled / error for streams that did not complete.",
+    ("source",),
+)
+
+# Stages whose duration is known before the first byte, in request order.
+HEADER_STAGES = ("history", "embed", "retrieve", "cache", "pack", "prompt", "ttft")
+
+
+class RequestTimer:
+    """
+    Stage timings of one /ask request.
+
+    Each stage is recorded on the request (for the Server-Timing header and the
+    optional stats frame) and in the process-wide histograms behind /metrics.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.source = "generated"
+        self.tokens = 0
+        self._finished = False
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        ask_stage_seconds.observe(seconds, stage=stage)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def mark(self, stage: str) -> None:
+        """
+        Record the time since the request started, e.g. the first token.
+        """
+        if stage not in self.stages:
+            self.record(stage, time.perf_counter() - self.started)
+
+    def finish(self) -> AskTimings:
+        if not self._finished:
+            self._finished = True
+            self.record("total", time.perf_counter() - self.started)
+            ask_tokens.observe(self.tokens)
+            ask_requests.inc(source=self.source)
+        return self.stats()
+
+    def stats(self) -> AskTimings:
+        return {
+            "source": self.source,
+            "tokens": self.tokens,
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+        }
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f"{name};dur={self.stages[name] * 1000:.1f}"
+            for name in HEADER_STAGES
+            if name in self.stages
+        )
@@ -0,0 +1,43 @@
+from typing import Literal, TypedDict
+
+
+class ContextStats(TypedDict):
+    # Retrieved chunks in, merged blocks packed, and blocks left out as
+    # near-duplicates or for lack of budget.
+    chunks: int
+    blocks: int
+    dropped: int
+    tokens_in: int
+    tokens_out: int
+    tokens_saved: int
+    budget: int
+
+
+class ChatMessage(TypedDict):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class Conversation(TypedDict):
+    # `summary` covers the first `covered` messages of the history; `messages`
+    # are the later ones, passed to the model verbatim.
+    history: list[ChatMessage]
+    summary: str
+    covered: int
+    messages: list[ChatMessage]
+
+
+class HistoryStats(TypedDict):
+    messages: int
+    summarized: int
+    verbatim: int
+    rewritten: bool
+    seconds: float
+
+
+class AskTimings(TypedDict):
+    # How the answer was produced: "generated", "cached" (answer cache) or
+    # "coalesced" (shared with an identical request in flight).
+    source: str
+    tokens: int
+    stages_ms: dict[str, float]
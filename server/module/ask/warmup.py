@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+
+from configs import chroma_db, llm
+from configs.serving import is_worker
+from module.ask.helpers import search_documents
+
+WARMUP_QUESTION = "What is a closure?"
+
+# Written by the warm-up task only; read by /readyz.
+_state = {"status": "pending", "error": None, "attempts": 0, "seconds": {}}
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+
+def get_readiness() -> dict:
+    return {**_state, "seconds": dict(_state["seconds"])}
+
+
+async def _timed(name: str, step):
+    started = time.perf_counter()
+    result = await step
+    _state["seconds"][name] = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def warm_up() -> None:
+    """
+    Build the clients and load both models before the first real request.
+
+    Opens the vector backend, embeds a question (Ollama loads the embedding model), runs
+    one retrieval (filling the SQLite and Chroma page caches) and asks the chat
+    model for a one-word reply (Ollama loads it too).
+    """
+    await _timed("index", asyncio.to_thread(lambda: chroma_db.retriever))
+    embedding = await _timed("embed", llm.embedder.aembed_query(WARMUP_QUESTION))
+    await _timed("retrieve", search_documents(embedding, question=WARMUP_QUESTION))
+    await _timed("chat", llm.chat_llm.ainvoke("Reply with the single word OK."))
+
+
+def _check_published_index() -> None:
+    from module.search.flat_index import current_generation
+
+    if current_generation() is None:
+        raise RuntimeError("No flat index generation published yet; is the writer running?")
+    if not chroma_db.retriever.count():
+        raise RuntimeError("The published flat index holds no chunks")
+
+
+async def prepare() -> None:
+    """
+    Load the INDEX_SNAPSHOT bundle into an empty collection, then warm up.
+    Request workers leave the snapshot to the writer process and stay unready
+    until it has published a non-empty index.
+    """
+    if is_worker():
+        await _timed("index", asyncio.to_thread(_check_published_index))
+    else:
+        from module.index.snapshot import restore_snapshot_if_empty
+
+        await _timed("snapshot", asyncio.to_thread(restore_snapshot_if_empty))
+    if warmup_enabled():
+        await warm_up()
+
+
+async def run_warmup() -> None:
+    """
+    Prepare until it succeeds, so the server becomes ready once Ollama is up even
+    if it started first. With WARMUP_ENABLED=false the models are not preloaded
+    and the first requests pay for loading instead.
+    """
+    # Imported in the background task, off the server's startup path.
+    from module.index.snapshot import SnapshotError
+
+    retry_seconds = float(os.getenv("WARMUP_RETRY_SECONDS", 15))
+    started = time.perf_counter()
+    while True:
+        _state["attempts"] += 1
+        try:
+            await prepare()
+        except SnapshotError as e:
+            # A snapshot for another embedding model (or a corrupt one) will not
+            # get better by retrying; stay unready until it is replaced.
+            _state["status"] = "failed"
+            _state["error"] = repr(e)
+            print(f"Refusing the index snapshot: {e}")
+            return
+        except Exception as e:
+            _state["status"] = "failed"
+            _state["error"] = repr(e)
+            print(f"Warm-up failed, retrying in {retry_seconds}s: {e!r}")
+            await asyncio.sleep(retry_seconds)
+            continue
+        _state["status"] = "ready"
+        _state["error"] = None
+        _state["seconds"]["total"] = round(time.perf_counter() - started, 3)
+        print(f"Warm-up: {_state['seconds']}")
+        return
@@ -1,36 +1,427 @@
-from configs.lite_db import run_db_query
+import functools
+import hashlib
+import json
+import os
+import threading
 
+from configs.lite_db import compact_db, get_db_connection, get_db_size, run_db_query
+from module.book.types import CacheCompaction
 
-def get_cached_record(value: str, column: str = "sha"):
+# SQLite caps the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+# How a blob's bytes are stored.
+CODEC_RAW = 0
+CODEC_ZSTD = 1
+
+# Texts shorter than this are stored raw: the zstd frame header outweighs any gain.
+_MIN_COMPRESS_BYTES = 256
+
+# Entry kinds pruned to what the last successful ingestion referenced.
+REFERENCED_KINDS = ("page", "tree")
+
+# Entries left over from earlier versions of the repository: pages and trees
+# the last ingestion did not reference, and every README and reading order but
+# the newest. Takes REFERENCED_KINDS as parameters.
+_UNREFERENCED_ENTRIES = f"""
+    cache_entries.kind IN ({", ".join(["?"] * len(REFERENCED_KINDS))})
+    AND cache_entries.key NOT IN (SELECT key FROM cache_references)
+    OR cache_entries.kind IN ('readme', 'reading_order') AND cache_entries.key != (
+        SELECT newest.key FROM cache_entries newest WHERE newest.kind = cache_entries.kind
+        ORDER BY newest.updated_at DESC, newest.key DESC LIMIT 1
+    )
+"""
+
+# Compressor and decompressor objects must not be shared between threads.
+_local = threading.local()
+
+
+@functools.lru_cache(maxsize=1)
+def _zstd():
+    """
+    The zstandard module, or None when it is not installed (blobs are then stored
+    raw, and compressed ones written by another install cannot be read).
+    """
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _max_age_days() -> float | None:
+    value = os.getenv("CACHE_MAX_AGE_DAYS")
+    return float(value) if value else None
+
+
+def _max_bytes() -> int | None:
+    value = os.getenv("CACHE_MAX_BYTES")
+    return int(value) if value else None
+
+
+def _compressor():
+    if getattr(_local, "compressor", None) is None:
+        level = int(os.getenv("CACHE_ZSTD_LEVEL", 9))
+        _local.compressor = _zstd().ZstdCompressor(level=level)
+    return _local.compressor
+
+
+def _decompressor():
+    if getattr(_local, "decompressor", None) is None:
+        _local.decompressor = _zstd().ZstdDecompressor()
+    return _local.decompressor
+
+
+def encode_blob(text: str) -> tuple[bytes, int, bytes, int]:
+    """
+    :return: The content hash, codec, stored bytes and uncompressed size of a text.
+    """
+    raw = text.encode("utf-8")
+    content_hash = hashlib.sha256(raw).digest()
+    if len(raw) >= _MIN_COMPRESS_BYTES and _zstd() is not None:
+        compressed = _compressor().compress(raw)
+        if len(compressed) < len(raw):
+            return content_hash, CODEC_ZSTD, compressed, len(raw)
+    return content_hash, CODEC_RAW, raw, len(raw)
+
+
+def decode_blob(codec: int, data: bytes) -> str:
+    if codec == CODEC_ZSTD:
+        if _zstd() is None:
+            raise RuntimeError("The cache holds zstd-compressed entries; install zstandard")
+        data = _decompressor().decompress(data)
+    return bytes(data).decode("utf-8")
+
+
+def get_cache_kind(key: str) -> str:
+    """
+    Entries are keyed `page-<sha>`, `book-<sha>`, `ai-<sha>` or by the bare
+    README blob sha.
+    """
+    prefix, _, rest = key.partition("-")
+    if rest:
+        return {"page": "page", "book": "tree", "ai": "reading_order"}.get(prefix, "other")
+    return "readme"
+
+
+def get_cached_text(key: str) -> str | None:
     row = run_db_query(
-        f"SELECT * FROM readme_cache WHERE {column} = ? ORDER BY id DESC LIMIT 1",
-        (value,),
+        """
+        SELECT b.codec, b.data FROM cache_entries e
+        JOIN cache_blobs b ON b.hash = e.blob_hash
+        WHERE e.key = ?
+        """,
+        (key,),
         fetchone=True,
     )
-    return row
+    return decode_blob(*row) if row else None
 
 
-# def update_cache_record(**kwargs) -> None:
-#     columns = ", ".join(kwargs.keys())
-#     placeholders = ", ".join(["?"] * len(kwargs))
-#     values = tuple(kwargs.values())
-#     query = f"INSERT INTO readme_cache ({columns}) VALUES ({placeholders})"
-#     run_db_query(query, values)
+def get_cached_records(values: list[str]) -> dict[str, str]:
+    """
+    Fetch the cached text for many keys in as few queries as possible.
+    :param values: The cache keys to look up, e.g. `page-<sha>`.
+    :return: A mapping of key to text for every key found in the cache.
+    """
+    found = {}
+    values = list(dict.fromkeys(values))
+    for start in range(0, len(values), _LOOKUP_BATCH):
+        batch = values[start : start + _LOOKUP_BATCH]
+        placeholders = ", ".join(["?"] * len(batch))
+        rows = run_db_query(
+            f"""
+            SELECT e.key, b.codec, b.data FROM cache_entries e
+            JOIN cache_blobs b ON b.hash = e.blob_hash
+            WHERE e.key IN ({placeholders})
+            """,
+            tuple(batch),
+            fetchall=True,
+        )
+        found.update((key, decode_blob(codec, data)) for key, codec, data in rows)
+    return found
 
 
 def update_cache(sha: str, content: str) -> None:
+    update_cache_many({sha: content})
+
+
+def update_cache_many(entries: dict[str, str], sources: dict[str, dict] | None = None) -> None:
+    """
+    Store many entries in a single transaction, replacing earlier versions.
+
+    Texts are stored once per content hash, so identical pages under several
+    keys (or a page re-fetched unchanged) share one compressed blob.
+    :param entries: Cache key to text.
+    :param sources: Cache key to the GitHub item the text came from; its `path`
+        and `url` are kept in their own columns.
+    """
+    sources = sources or {}
+    blobs = {}
+    rows = []
+    for key, text in entries.items():
+        content_hash, codec, data, size = encode_blob(text)
+        blobs[content_hash] = (content_hash, codec, size, data)
+        source = sources.get(key, {})
+        rows.append((key, get_cache_kind(key), content_hash, source.get("path"), source.get("url")))
+
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO cache_blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+            list(blobs.values()),
+        )
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO cache_entries (key, kind, blob_hash, path, url)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+
+def delete_unreferenced_entries(keys: set[str]) -> int:
+    """
+    Keep only the given page and tree entries, plus the newest README and
+    reading order; everything else is left over from earlier versions of the
+    repository. Call after a successful ingestion, with the keys it used.
+
+    The keys are kept in `cache_references`, so `get_cache_stats` can tell
+    which entries the next prune would delete.
+    :return: The number of entries deleted.
+    """
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM cache_references")
+        conn.executemany(
+            "INSERT OR IGNORE INTO cache_references (key) VALUES (?)", [(key,) for key in keys]
+        )
+        return conn.execute(
+            f"DELETE FROM cache_entries WHERE {_UNREFERENCED_ENTRIES}", REFERENCED_KINDS
+        ).rowcount
+
+
+def apply_cache_retention(max_age_days: float | None = None, max_bytes: int | None = None) -> int:
+    """
+    Delete entries stored more than `max_age_days` ago, then the oldest entries
+    until the stored blobs fit in `max_bytes`. Defaults come from
+    CACHE_MAX_AGE_DAYS and CACHE_MAX_BYTES; unset means no limit.
+    :return: The number of entries deleted.
+    """
+    max_age_days = _max_age_days() if max_age_days is None else max_age_days
+    max_bytes = _max_bytes() if max_bytes is None else max_bytes
+    deleted = 0
+    with get_db_connection() as conn:
+        if max_age_days is not None:
+            deleted += conn.execute(
+                "DELETE FROM cache_entries WHERE updated_at < datetime('now', ?)",
+                (f"-{max_age_days} days",),
+            ).rowcount
+        if max_bytes is not None:
+            total = conn.execute(
+                """
+                SELECT COALESCE(SUM(LENGTH(data)), 0) FROM cache_blobs
+                WHERE hash IN (SELECT blob_hash FROM cache_entries)
+                """
+            ).fetchone()[0]
+            if total > max_bytes:
+                # Oldest first; a blob shared by several keys counts for each of them.
+                rows = conn.execute(
+                    """
+                    SELECT e.key, LENGTH(b.data) FROM cache_entries e
+                    JOIN cache_blobs b ON b.hash = e.blob_hash
+                    ORDER BY e.updated_at, e.key
+                    """
+                ).fetchall()
+                evicted = []
+                for key, size in rows:
+                    if total <= max_bytes:
+                        break
+                    evicted.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM cache_entries WHERE key = ?", evicted)
+                deleted += len(evicted)
+    return deleted
+
+
+def delete_orphan_blobs() -> tuple[int, int]:
+    """
+    :return: The number of blobs no entry refers to any more, and their size,
+        both deleted.
+    """
+    with get_db_connection() as conn:
+        count, size = conn.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM cache_blobs
+            WHERE hash NOT IN (SELECT blob_hash FROM cache_entries)
+            """
+        ).fetchone()
+        conn.execute("DELETE FROM cache_blobs WHERE hash NOT IN (SELECT blob_hash FROM cache_entries)")
+    return count, size
+
+
+def compact_cache(
+    max_age_days: float | None = None, max_bytes: int | None = None
+) -> CacheCompaction:
+    """
+    Apply the retention policy, drop orphaned blobs and give the freed pages back
+    to the filesystem with an incremental vacuum (see `compact_db`).
+    """
+    entries = apply_cache_retention(max_age_days, max_bytes)
+    blobs, blob_bytes = delete_orphan_blobs()
+    vacuum = compact_db()
+    return {
+        "entries_deleted": entries,
+        "blobs_deleted": blobs,
+        "blob_bytes_deleted": blob_bytes,
+        **vacuum,
+    }
+
+
+def get_cache_stats() -> dict:
+    entries = run_db_query(
+        "SELECT kind, COUNT(*) FROM cache_entries GROUP BY kind", fetchall=True
+    )
+    # Measured against the keys of the last prune; unknown before the first one.
+    unreferenced = (
+        run_db_query(
+            f"SELECT COUNT(*) FROM cache_entries WHERE {_UNREFERENCED_ENTRIES}",
+            REFERENCED_KINDS,
+            fetchone=True,
+        )[0]
+        if run_db_query("SELECT 1 FROM cache_references LIMIT 1", fetchone=True)
+        else None
+    )
+    blobs, raw, stored = run_db_query(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM cache_blobs",
+        fetchone=True,
+    )
+    dead_blobs, dead_bytes = run_db_query(
+        """
+        SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM cache_blobs
+        WHERE hash NOT IN (SELECT blob_hash FROM cache_entries)
+        """,
+        fetchone=True,
+    )
+    max_age_days = _max_age_days()
+    expired = (
+        run_db_query(
+            "SELECT COUNT(*) FROM cache_entries WHERE updated_at < datetime('now', ?)",
+            (f"-{max_age_days} days",),
+            fetchone=True,
+        )[0]
+        if max_age_days is not None
+        else 0
+    )
+    return {
+        "entries": dict(entries),
+        "live_entries": (
+            None if unreferenced is None else sum(count for _, count in entries) - unreferenced
+        ),
+        "unreferenced_entries": unreferenced,
+        "expired_entries": expired,
+        "blobs": blobs,
+        "live_blobs": blobs - dead_blobs,
+        "dead_blobs": dead_blobs,
+        "dead_bytes": dead_bytes,
+        "text_bytes": raw,
+        "stored_bytes": stored,
+        "compression_ratio": raw / stored if stored else 0.0,
+        "db": get_db_size(),
+    }
+
+
+def get_http_cache(url: str) -> tuple[str, str] | None:
+    """
+    :return: The (etag, body) last stored for a url, if any.
+    """
+    return run_db_query(
+        "SELECT etag, body FROM http_cache WHERE url = ?", (url,), fetchone=True
+    )
+
+
+def update_http_cache(url: str, etag: str, body: str) -> None:
     run_db_query(
-        "INSERT INTO readme_cache (sha, content) VALUES (?, ?)", (sha, content)
+        "INSERT OR REPLACE INTO http_cache (url, etag, body) VALUES (?, ?, ?)",
+        (url, etag, body),
+    )
+
+
+def _migrate_readme_cache() -> int:
+    """
+    Move the newest row per key of the old append-only `readme_cache` table into
+    the content-addressed tables, unwrapping page JSON to its text, then drop it.
+    """
+    exists = run_db_query(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'readme_cache'",
+        fetchone=True,
+    )
+    if not exists:
+        return 0
+
+    rows = run_db_query(
+        """
+        SELECT sha, content FROM readme_cache WHERE id IN (
+            SELECT MAX(id) FROM readme_cache GROUP BY sha
+        )
+        """,
+        fetchall=True,
     )
+    for start in range(0, len(rows), _LOOKUP_BATCH):
+        entries, sources = {}, {}
+        for key, content in rows[start : start + _LOOKUP_BATCH]:
+            if content is None:
+                continue
+            if get_cache_kind(key) == "page":
+                page = json.loads(content)
+                entries[key] = page.get("content") or ""
+                sources[key] = page
+            else:
+                entries[key] = content
+        update_cache_many(entries, sources)
+    run_db_query("DROP TABLE readme_cache")
+    return len(rows)
 
 
 def init_cache_db() -> None:
-    create_table = """
-    CREATE TABLE IF NOT EXISTS readme_cache (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sha TEXT NOT NULL,
-        content TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
-    run_db_query(create_table)
+    # Text lives in cache_blobs once per content hash; cache_entries maps each key
+    # (page-<sha>, book-<sha>, ai-<sha> or the README sha) to its blob.
+    run_db_query(
+        """
+        CREATE TABLE IF NOT EXISTS cache_blobs (
+            hash BLOB PRIMARY KEY,
+            codec INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID;
+        """
+    )
+    run_db_query(
+        """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            blob_hash BLOB NOT NULL,
+            path TEXT,
+            url TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+        """
+    )
+    run_db_query(
+        "CREATE INDEX IF NOT EXISTS idx_cache_entries_blob ON cache_entries (blob_hash)"
+    )
+    # The page and tree keys the last successful ingestion used.
+    run_db_query(
+        "CREATE TABLE IF NOT EXISTS cache_references (key TEXT PRIMARY KEY) WITHOUT ROWID"
+    )
+    run_db_query(
+        """
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT NOT NULL,
+            body TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    migrated = _migrate_readme_cache()
+    if migrated:
+        print(f"Moved {migrated} readme_cache entries to the compressed cache")
@@ -1,115 +1,169 @@
 import json
 import asyncio
+from typing import AsyncIterator
 
-from module.book.cache import update_cache, get_cached_record
+from module.book.cache import (
+    delete_unreferenced_entries,
+    get_cached_records,
+    update_cache_many,
+)
 from module.llm.helpers import analyze_intro_readme
+from module.book.types import Book, BookPage
 from module.book.helpers import (
+    get_blob_text,
+    is_markdown_page,
     get_repo_contents,
     get_readme_content,
     get_repo_book_contents,
 )
-from utils.translate_base64_content_To_text import translate_base64_content_to_text
 
 
-async def get_books():
-    contents = await asyncio.to_thread(get_repo_contents)
-    readme, sha = await asyncio.to_thread(get_readme_content, contents)
+async def get_book_index() -> list[Book] | None:
+    """
+    Resolve every book in reading order together with its markdown pages, without
+    loading page content (each page has `content=None`).
 
-    if readme:
-        result = await asyncio.to_thread(analyze_intro_readme, readme, contents, sha)
-        books = list(result.items())
-
-        async def process_book(k, v):
-            """
-            Process a single book: retrieve from cache if possible, otherwise fetch and cache.
-            Accumulates all pages for the book.
-            """
-            current_sha = f'book-{v["sha"]}'
-            # Try to get the whole book from cache
-            cached_row = await asyncio.to_thread(get_cached_record, current_sha)
-            if cached_row:
-                # Decode and parse the cached book content
-                cached_json = cached_row[2]
-                parsed_content = json.loads(cached_json)
-                pages = parsed_content.get("tree", [])
-
-                book_pages = []
-                # Loop through all pages and accumulate their content
-                for page in pages:
-                    page_sha = f'page-{page["sha"]}'
-                    try:
-                        # Check if the individual page is cached
-                        cached_page_row = await asyncio.to_thread(
-                            get_cached_record, page_sha
-                        )
-
-                        if cached_page_row:
-                            # Use cached page content
-                            cached_page_json = cached_page_row[2]
-                            parsed_page_row = json.loads(cached_page_json)
-                            content = parsed_page_row.get("content", "")
-                        else:
-                            # If not cached, fetch and cache it
-                            try:
-                                content = await asyncio.to_thread(
-                                    get_repo_book_contents,
-                                    page["url"],
-                                )
-                            except Exception as e:
-                                print(f"Error fetching {page['url']}: {e}")
-                                continue
-                            # Await the cache update in a thread for IO
-                            if not content:
-                                continue
-                            await asyncio.to_thread(
-                                update_cache,
-                                page_sha,
-                                json.dumps(
-                                    {
-                                        **page,
-                                        "content": translate_base64_content_to_text(
-                                            content["content"]
-                                        ),
-                                    }
-                                ),
-                            )
-
-                        book_pages.append({**page, "content": content})
-                    except Exception as e:
-                        print(f"Error processing {page_sha}: {e}")
-                        continue
-
-                # Return the book with all accumulated pages
-                return {"name": k, "pages": book_pages}
-
-            # If book is not cached at all, fetch and cache it
-            book = await asyncio.to_thread(get_repo_book_contents, v["url"])
-            book = {**book, "name": k}
-            # Translate the base64 content to text
-            book_content = await asyncio.to_thread(
-                translate_base64_content_to_text, book["content"]
+    Book trees are looked up in one query, the misses are fetched concurrently and
+    written in one transaction, so this costs a constant number of SQLite round
+    trips however many books there are.
+    """
+    contents = await get_repo_contents()
+    readme, sha = await get_readme_content(contents)
+
+    if not readme:
+        return None
+
+    result = await asyncio.to_thread(analyze_intro_readme, readme, contents, sha)
+    books = list(result.items())
+    # The folder name doubles as the book id used by the client routes.
+    book_ids = {item["sha"]: item["name"] for item in contents}
+
+    # Resolve every book tree, fetching and caching only the misses
+    book_keys = {k: f'book-{v["sha"]}' for k, v in books}
+    cached_books = await asyncio.to_thread(get_cached_records, list(book_keys.values()))
+    trees = {key: json.loads(content) for key, content in cached_books.items()}
+
+    async def fetch_tree(k, v):
+        return book_keys[k], await get_repo_book_contents(v["url"])
+
+    fetched_trees = dict(
+        await asyncio.gather(
+            *(fetch_tree(k, v) for k, v in books if book_keys[k] not in trees)
+        )
+    )
+    if fetched_trees:
+        await asyncio.to_thread(
+            update_cache_many,
+            {key: json.dumps(tree) for key, tree in fetched_trees.items()},
+        )
+        trees.update(fetched_trees)
+
+    return [
+        {
+            "name": k,
+            "id": book_ids.get(v["sha"], k),
+            "sha": v["sha"],
+            "pages": [
+                {**page, "content": None}
+                for page in trees[book_keys[k]].get("tree", [])
+                if is_markdown_page(page)
+            ],
+        }
+        for k, v in books
+    ]
+
+
+async def load_page_contents(pages: list[BookPage]) -> dict[str, str | None]:
+    """
+    Load the text of many pages with one cache lookup and one cache write.
+    :return: A mapping of `page-<sha>` to text, or None where the fetch failed.
+    """
+    pages_by_key = {f'page-{page["sha"]}': page for page in pages}
+    # Page entries hold the bare text, so a warm load parses no JSON.
+    page_contents = await asyncio.to_thread(get_cached_records, list(pages_by_key))
+
+    async def fetch_page(page_sha, page):
+        try:
+            blob = await get_repo_book_contents(page["url"])
+            return page_sha, get_blob_text(blob)
+        except Exception as e:
+            print(f"Error processing {page_sha}: {e}")
+            return page_sha, None
+
+    fetched_pages = dict(
+        await asyncio.gather(
+            *(
+                fetch_page(key, page)
+                for key, page in pages_by_key.items()
+                if key not in page_contents
             )
-            book = {**book, "content": book_content, "tree": contents}
-            # Cache the book content
-            await asyncio.to_thread(update_cache, current_sha, json.dumps(book))
-            return book
+        )
+    )
+    new_pages = {
+        key: content for key, content in fetched_pages.items() if content is not None
+    }
+    if new_pages:
+        await asyncio.to_thread(update_cache_many, new_pages, pages_by_key)
+    page_contents.update(fetched_pages)
+    return page_contents
+
+
+async def iter_page_contents(
+    entries: list[tuple[Book, BookPage]], window: int = 64
+) -> AsyncIterator[tuple[Book, BookPage]]:
+    """
+    Stream (book, page) pairs with their content filled in, `window` pages at a
+    time, so only one window of page text is held in memory.
+
+    Pages that failed to fetch keep `content=None` so callers can tell them
+    apart from pages that were removed upstream.
+    """
+    for start in range(0, len(entries), window):
+        batch = entries[start : start + window]
+        page_contents = await load_page_contents([page for _, page in batch])
+        for book, page in batch:
+            yield book, {**page, "content": page_contents.get(f'page-{page["sha"]}')}
+
+
+async def get_books() -> list[Book] | None:
+    """
+    Resolve every book in reading order together with the content of its pages.
+
+    All page content is loaded in a single window, so a warm start costs two
+    SQLite queries regardless of how many chapters there are.
+    """
+    books = await get_book_index()
+    if books is None:
+        return None
 
-        tasks = [process_book(k, v) for k, v in books]
-        data = await asyncio.gather(*tasks)
-        return data
-    return None
+    entries = [(book, page) for book in books for page in book["pages"]]
+    loaded = {}
+    async for book, page in iter_page_contents(entries, window=max(1, len(entries))):
+        loaded.setdefault(book["id"], []).append(page)
+    return [{**book, "pages": loaded.get(book["id"], [])} for book in books]
 
 
-def get_books_by_sha(sha: str):
+async def get_books_by_sha(sha: str):
     """
     Get books by SHA.
     :param sha: The SHA of the book.
     :return: A dictionary of books with their reading order.
     """
-    contents = get_repo_contents()
-    readme, _ = get_readme_content(contents)
+    contents = await get_repo_contents()
+    readme, _ = await get_readme_content(contents)
 
     if readme:
-        result = analyze_intro_readme(readme, contents, sha)
+        result = await asyncio.to_thread(analyze_intro_readme, readme, contents, sha)
         return result
     return {}
+
+
+async def prune_book_cache(books: list[Book]) -> int:
+    """
+    Drop cached trees and pages the given books no longer refer to, e.g. after
+    a successful ingestion of the current repository.
+    :return: The number of cache entries deleted.
+    """
+    keys = {f'book-{book["sha"]}' for book in books}
+    keys.update(f'page-{page["sha"]}' for book in books for page in book["pages"])
+    return await asyncio.to_thread(delete_unreferenced_entries, keys)
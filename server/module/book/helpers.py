@@ -1,17 +1,25 @@
 import os
+import json
+import asyncio
 from typing import Optional, Tuple
 
+from utils.make_request import fetch
+from module.book.local_repo import get_local_repo, is_local_url
 from utils.translate_base64_content_To_text import translate_base64_content_to_text
-from module.book.cache import update_cache, get_cached_record
-from module.book.types import GitHubFileItem, GitHubBookItem
+from module.book.cache import (
+    update_cache,
+    get_cached_text,
+    get_http_cache,
+    update_http_cache,
+)
+from module.book.types import GitHubFileItem, GitHubBookItem, GitHubTreeItem
 
 ydkjs_base_repo_url = os.getenv("YDKJS_REPO_URL")
+# A local checkout, bare repository or tarball to read instead of the GitHub API.
+ydkjs_source = os.getenv("YDKJS_SOURCE")
 
 
-import requests
-
-
-def get_readme_content(data: list[GitHubFileItem]) -> Optional[Tuple[str, str]]:
+async def get_readme_content(data: list[GitHubFileItem]) -> Optional[Tuple[str, str]]:
     # Find the README file from the list
     get_readme = lambda item: item["name"].lower() == "readme.md"
     match = next(filter(get_readme, data), None)
@@ -19,52 +27,68 @@ def get_readme_content(data: list[GitHubFileItem]) -> Optional[Tuple[str, str]]:
         raise ValueError("README.md not found in the repository contents")
 
     current_sha = match["sha"]
-    cached_row = get_cached_record(current_sha)
+    cached = await asyncio.to_thread(get_cached_text, current_sha)
 
     # If SHA matches cache, return the cached content
-    if cached_row and cached_row[1] == current_sha:
-        _, sha, content, _ = cached_row
-        return content, current_sha
+    if cached is not None:
+        return cached, current_sha
 
     # Else, fetch new README content and cache it
-    response = requests.get(match["git_url"])
-    if response.status_code == 200:
-        data = response.json()
-        base64_content = data["content"]
-        content = translate_base64_content_to_text(base64_content)
-        update_cache(current_sha, content)
-        return content, current_sha
+    blob = await get_repo_book_contents(match["git_url"])
+    content = get_blob_text(blob)
+    await asyncio.to_thread(update_cache, current_sha, content)
+    return content, current_sha
+
+
+def get_blob_text(blob: GitHubBookItem) -> str:
+    """
+    Decode a blob payload; local sources hand over text that needs no base64 pass.
+    """
+    if blob.get("encoding") == "utf-8":
+        return blob["content"]
+    return translate_base64_content_to_text(blob["content"])
+
 
-    return None
+def is_markdown_page(item: GitHubTreeItem) -> bool:
+    return item.get("type") == "blob" and item["path"].lower().endswith(".md")
 
 
-def get_repo_contents() -> list[GitHubFileItem]:
+async def get_repo_contents() -> list[GitHubFileItem]:
     """
     Fetch the contents of the YDKJS repository.
+
+    The listing is requested with the ETag from the previous run, so when the
+    repository has not changed GitHub answers with a 304 and the stored body is
+    reused (conditional requests do not count against the rate limit).
     :return: A list of GitHubFileItem representing the contents of the repository.
     """
-    import requests
+    if ydkjs_source:
+        repo = await asyncio.to_thread(get_local_repo, ydkjs_source)
+        return repo.contents()
+
+    url = f"{ydkjs_base_repo_url}/contents"
+    cached = await asyncio.to_thread(get_http_cache, url)
 
-    response = requests.get(f"{ydkjs_base_repo_url}/contents")
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(
-            f"Failed to fetch repository contents: {response.status_code} {response.text}"
-        )
+    response = await fetch(url, etag=cached[0] if cached else None)
+    if response.status_code == 304 and cached:
+        return json.loads(cached[1])
 
+    etag = response.headers.get("ETag")
+    if etag:
+        await asyncio.to_thread(update_http_cache, url, etag, response.text)
+    return response.json()
 
-def get_repo_book_contents(book_url: str) -> GitHubBookItem | None:
+
+async def get_repo_book_contents(book_url: str) -> GitHubBookItem | None:
     """
-    Fetch the contents of the YDKJS repository.
-    :return: A list of GitHubFileItem representing the contents of the repository.
+    Fetch a git tree or blob from the YDKJS repository.
+
+    Trees and blobs are addressed by SHA and never change, so callers cache them
+    by SHA instead of revalidating.
+    :return: The decoded JSON response.
     """
-    import requests
-
-    response = requests.get(book_url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(
-            f"Failed to fetch repository contents: {response.status_code} {response.text}"
-        )
+    if is_local_url(book_url):
+        return get_local_repo(ydkjs_source).get(book_url)
+
+    response = await fetch(book_url)
+    return response.json()
@@ -0,0 +1,237 @@
+import functools
+import os
+import subprocess
+import tarfile
+from pathlib import Path
+
+from module.book.types import GitHubFileItem, GitHubTree, GitHubBookItem
+from utils.git_objects import (
+    MODE_EXECUTABLE,
+    MODE_FILE,
+    MODE_SYMLINK,
+    MODE_TREE,
+    git_blob_sha,
+    git_tree_sha,
+)
+
+LOCAL_URL_PREFIX = "local://"
+
+# sha -> ("blob", bytes) or ("tree", [(mode, name, sha), ...])
+GitObjects = dict[str, tuple[str, object]]
+
+
+class LocalRepo:
+    """
+    An in-memory copy of the book repository that answers like the GitHub API.
+
+    Objects are keyed by their git SHA, so pages read from disk share the
+    `book-<sha>` / `page-<sha>` cache entries with pages fetched from GitHub.
+    Blob payloads are returned as plain text (`"encoding": "utf-8"`), which
+    spares the base64 round trip of the API.
+    """
+
+    def __init__(self, root_sha: str, objects: GitObjects):
+        self.root_sha = root_sha
+        self.objects = objects
+
+    def contents(self) -> list[GitHubFileItem]:
+        items = []
+        for mode, name, sha in self.objects[self.root_sha][1]:
+            kind = "trees" if mode == MODE_TREE else "blobs"
+            git_url = f"{LOCAL_URL_PREFIX}{kind}/{sha}"
+            items.append(
+                {
+                    "name": name,
+                    "path": name,
+                    "sha": sha,
+                    "size": 0 if mode == MODE_TREE else len(self.objects[sha][1]),
+                    "url": git_url,
+                    "html_url": git_url,
+                    "git_url": git_url,
+                    "download_url": None,
+                    "type": "dir" if mode == MODE_TREE else "file",
+                    "_links": {"self": git_url, "git": git_url, "html": git_url},
+                }
+            )
+        return items
+
+    def tree(self, sha: str) -> GitHubTree:
+        entries = []
+        for mode, name, child_sha in self.objects[sha][1]:
+            is_tree = mode == MODE_TREE
+            entry = {
+                "path": name,
+                "mode": "040000" if is_tree else mode,
+                "type": "tree" if is_tree else "blob",
+                "sha": child_sha,
+                "url": f"{LOCAL_URL_PREFIX}{'trees' if is_tree else 'blobs'}/{child_sha}",
+            }
+            if not is_tree:
+                entry["size"] = len(self.objects[child_sha][1])
+            entries.append(entry)
+        return {"sha": sha, "url": f"{LOCAL_URL_PREFIX}trees/{sha}", "tree": entries, "truncated": False}
+
+    def blob(self, sha: str) -> GitHubBookItem:
+        data = self.objects[sha][1]
+        return {
+            "sha": sha,
+            "node_id": sha,
+            "size": len(data),
+            "url": f"{LOCAL_URL_PREFIX}blobs/{sha}",
+            "content": data.decode("utf-8"),
+            "encoding": "utf-8",
+        }
+
+    def get(self, url: str) -> GitHubTree | GitHubBookItem:
+        kind, _, sha = url.removeprefix(LOCAL_URL_PREFIX).partition("/")
+        if sha not in self.objects:
+            raise ValueError(f"Object {sha} not found in the local repository")
+        return self.tree(sha) if kind == "trees" else self.blob(sha)
+
+
+def is_local_url(url: str) -> bool:
+    return url.startswith(LOCAL_URL_PREFIX)
+
+
+def _add_tree(objects: GitObjects, files: dict[str, tuple[str, bytes]]) -> str:
+    """
+    Hash a nested file listing bottom-up, the way `git write-tree` would.
+    :param files: Repository-relative path -> (mode, content).
+    :return: The root tree SHA.
+    """
+    children: dict[str, dict] = {}
+    for path, (mode, data) in files.items():
+        node = children
+        *parents, name = path.split("/")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = (mode, data)
+
+    def visit(node: dict) -> str:
+        entries = []
+        for name, child in node.items():
+            if isinstance(child, dict):
+                entries.append((MODE_TREE, name, visit(child)))
+            else:
+                mode, data = child
+                sha = git_blob_sha(data)
+                objects[sha] = ("blob", data)
+                entries.append((mode, name, sha))
+        sha = git_tree_sha(entries)
+        objects[sha] = ("tree", entries)
+        return sha
+
+    return visit(children)
+
+
+def load_directory(root: Path) -> LocalRepo:
+    files = {}
+    for path in sorted(root.rglob("*")):
+        relative = path.relative_to(root)
+        if ".git" in relative.parts or path.is_dir():
+            continue
+        if path.is_symlink():
+            files[relative.as_posix()] = (MODE_SYMLINK, os.readlink(path).encode("utf-8"))
+        else:
+            mode = MODE_EXECUTABLE if os.access(path, os.X_OK) else MODE_FILE
+            files[relative.as_posix()] = (mode, path.read_bytes())
+    objects: GitObjects = {}
+    return LocalRepo(_add_tree(objects, files), objects)
+
+
+def load_tarball(path: Path) -> LocalRepo:
+    files = {}
+    with tarfile.open(path) as archive:
+        for member in archive.getmembers():
+            if member.isfile():
+                mode = MODE_EXECUTABLE if member.mode & 0o111 else MODE_FILE
+                files[member.name.removeprefix("./")] = (mode, archive.extractfile(member).read())
+            elif member.issym():
+                files[member.name.removeprefix("./")] = (
+                    MODE_SYMLINK,
+                    member.linkname.encode("utf-8"),
+                )
+
+    # GitHub archives wrap everything in a single `<repo>-<ref>/` directory.
+    top_levels = {name.split("/", 1)[0] for name in files}
+    if len(top_levels) == 1 and all("/" in name for name in files):
+        files = {name.split("/", 1)[1]: value for name, value in files.items()}
+
+    objects: GitObjects = {}
+    return LocalRepo(_add_tree(objects, files), objects)
+
+
+def load_git_repository(path: Path, ref: str = "HEAD") -> LocalRepo:
+    """
+    Read a (bare or non-bare) git repository at `ref` using git's own object SHAs.
+    """
+    git = ["git", f"--git-dir={path}"]
+    root_sha = subprocess.run(
+        [*git, "rev-parse", f"{ref}^{{tree}}"], check=True, capture_output=True, text=True
+    ).stdout.strip()
+    listing = subprocess.run(
+        [*git, "ls-tree", "-r", "-t", "-z", "--full-tree", root_sha],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    objects: GitObjects = {}
+    trees: dict[str, list] = {"": []}
+    tree_shas = {"": root_sha}
+    blob_shas = []
+    for line in filter(None, listing.split("\0")):
+        meta, path_name = line.split("\t", 1)
+        mode, kind, sha = meta.split()
+        parent, _, name = path_name.rpartition("/")
+        if kind == "tree":
+            trees.setdefault(path_name, [])
+            tree_shas[path_name] = sha
+            mode = MODE_TREE
+        elif kind == "blob":
+            blob_shas.append(sha)
+        else:
+            # Submodules point at commits in another repository.
+            continue
+        trees[parent].append((mode, name, sha))
+
+    for tree_path, entries in trees.items():
+        objects[tree_shas[tree_path]] = ("tree", entries)
+
+    # Stream every blob out of git in one process rather than one per file.
+    unique_blobs = list(dict.fromkeys(blob_shas))
+    output = subprocess.run(
+        [*git, "cat-file", "--batch"],
+        input="\n".join(unique_blobs).encode("utf-8") + b"\n",
+        check=True,
+        capture_output=True,
+    ).stdout
+    offset = 0
+    for sha in unique_blobs:
+        header_end = output.index(b"\n", offset)
+        _, _, size = output[offset:header_end].split()
+        start = header_end + 1
+        objects[sha] = ("blob", output[start : start + int(size)])
+        offset = start + int(size) + 1
+
+    return LocalRepo(root_sha, objects)
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_repo(source: str) -> LocalRepo:
+    """
+    Load the book repository from a local path.
+
+    :param source: A working directory, a bare git repository (read at
+        `YDKJS_SOURCE_REF`, default HEAD) or a `.tar`/`.tar.gz`/`.tgz` archive.
+    :return: The loaded repository, cached until `get_local_repo.cache_clear()`
+        (each sync starts with one).
+    """
+    path = Path(source).expanduser()
+    if path.is_file():
+        return load_tarball(path)
+    if (path / "HEAD").is_file() and (path / "objects").is_dir():
+        return load_git_repository(path, os.getenv("YDKJS_SOURCE_REF", "HEAD"))
+    if path.is_dir():
+        return load_directory(path)
+    raise ValueError(f"YDKJS_SOURCE {source} is not a directory, git repository or tarball")
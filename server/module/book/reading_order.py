@@ -0,0 +1,62 @@
+import re
+
+from module.book.types import GitHubFileItem
+from module.llm.types import ReadingOrder
+
+# [Title](target) with an optional "title" after the target; images are skipped.
+_LINK = re.compile(r'(?<!!)\[([^\]\n]+)\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_EMPHASIS = re.compile(r"[*_`~]+")
+
+
+def _is_folder(item: GitHubFileItem) -> bool:
+    if item.get("type"):
+        return item["type"] == "dir"
+    return "." not in item["name"]
+
+
+def _link_folder(target: str) -> str | None:
+    """
+    The top-level folder a relative link points into, e.g. "get-started" for
+    "./get-started/README.md"; None for absolute links and in-page anchors.
+    """
+    if "://" in target or target.startswith(("#", "mailto:")):
+        return None
+    path = target.split("#", 1)[0].split("?", 1)[0].removeprefix("./").lstrip("/")
+    return path.split("/", 1)[0] or None
+
+
+def parse_reading_order(readme: str, contents: list[GitHubFileItem]) -> ReadingOrder | None:
+    """
+    Read the book order straight from the README's markdown links.
+
+    Every relative link into a top-level folder of the repository is a book, in
+    order of first appearance, titled with the link text. Links in list items
+    (the README's "read the books in this order" list) win over links elsewhere
+    when there are any. Books without a folder (not yet started) and HTML cover
+    images are ignored.
+
+    :param readme: The raw README markdown.
+    :param contents: The repository's top-level entries from `get_repo_contents`.
+    :return: The reading order, or None when no link matches a folder.
+    """
+    folders = {item["name"]: item for item in contents if _is_folder(item)}
+
+    listed: list[tuple[str, str]] = []
+    other: list[tuple[str, str]] = []
+    for line in readme.splitlines():
+        found = listed if _LIST_ITEM.match(line) else other
+        for text, target in _LINK.findall(line):
+            folder = _link_folder(target)
+            if folder in folders:
+                found.append((_EMPHASIS.sub("", text).strip() or folder, folder))
+
+    order: ReadingOrder = {}
+    seen = set()
+    for title, folder in listed or other:
+        if folder in seen or title in order:
+            continue
+        seen.add(folder)
+        item = folders[folder]
+        order[title] = {"order": len(order) + 1, "url": item["git_url"], "sha": item["sha"]}
+    return order or None
@@ -27,3 +27,40 @@ class GitHubBookItem(TypedDict):
     size: str
     node_id: str
     content: str
+
+
+class GitHubTreeItem(TypedDict):
+    path: str
+    mode: str
+    type: str
+    sha: str
+    size: int
+    url: str
+
+
+class GitHubTree(TypedDict):
+    sha: str
+    url: str
+    tree: list[GitHubTreeItem]
+    truncated: bool
+
+
+class BookPage(GitHubTreeItem):
+    content: str | None
+
+
+class Book(TypedDict):
+    name: str
+    id: str
+    sha: str
+    pages: list[BookPage]
+
+
+class CacheCompaction(TypedDict):
+    entries_deleted: int
+    blobs_deleted: int
+    blob_bytes_deleted: int
+    full_vacuum: bool
+    bytes_before: int
+    bytes_after: int
+    bytes_reclaimed: int
@@ -0,0 +1,66 @@
+from configs.lite_db import run_db_query, run_db_many
+
+
+def get_indexed_pages() -> dict[str, tuple[str, int]]:
+    """
+    :return: A mapping of page key to the (sha, chunk count) it was last indexed with.
+    """
+    rows = run_db_query(
+        "SELECT page_key, sha, chunk_count FROM indexed_pages", fetchall=True
+    )
+    return {page_key: (sha, chunk_count) for page_key, sha, chunk_count in rows}
+
+
+def update_indexed_page(
+    page_key: str, book_id: str, path: str, sha: str, chunk_count: int
+) -> None:
+    run_db_query(
+        """
+        INSERT OR REPLACE INTO indexed_pages (page_key, book_id, path, sha, chunk_count)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (page_key, book_id, path, sha, chunk_count),
+    )
+
+
+def delete_indexed_pages(page_keys: list[str]) -> None:
+    run_db_many(
+        "DELETE FROM indexed_pages WHERE page_key = ?", [(key,) for key in page_keys]
+    )
+
+
+def get_index_generation() -> int:
+    """
+    :return: A counter bumped whenever a sync changes the collection, so other
+        processes (the API server) can tell their query caches are stale.
+    """
+    row = run_db_query(
+        "SELECT value FROM index_state WHERE name = 'generation'", fetchone=True
+    )
+    return row[0] if row else 0
+
+
+def bump_index_generation() -> None:
+    run_db_query(
+        """
+        INSERT INTO index_state (name, value) VALUES ('generation', 1)
+        ON CONFLICT (name) DO UPDATE SET value = value + 1
+        """
+    )
+
+
+def init_index_db() -> None:
+    create_table = """
+    CREATE TABLE IF NOT EXISTS indexed_pages (
+        page_key TEXT PRIMARY KEY,
+        book_id TEXT NOT NULL,
+        path TEXT NOT NULL,
+        sha TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL,
+        indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    run_db_query(create_table)
+    run_db_query(
+        "CREATE TABLE IF NOT EXISTS index_state (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+    )
@@ -0,0 +1,151 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from module.book.controller import iter_page_contents
+from module.book.types import Book, BookPage
+from module.index.cache import (
+    bump_index_generation,
+    delete_indexed_pages,
+    get_indexed_pages,
+    update_indexed_page,
+)
+from module.index.pipeline import get_page_key, run_index_pipeline
+from module.index.types import IndexSummary
+from module.search.cache import (
+    clear_lexical_index,
+    delete_lexical_chunks,
+    get_lexical_index_size,
+    index_chunks,
+)
+
+
+def _delete_page_chunks(collection, page_key: str) -> int:
+    ids = collection.get(where={"page_key": page_key}, include=[])["ids"]
+    if ids:
+        collection.delete(ids=ids)
+        delete_lexical_chunks(ids)
+    return len(ids)
+
+
+def _reset_untracked_collection(collection) -> int:
+    """
+    Vectors written before page tracking existed carry no page key and cannot be
+    diffed, so the first tracked run starts from an empty collection.
+    """
+    ids = collection.get(include=[])["ids"]
+    for start in range(0, len(ids), 5000):
+        collection.delete(ids=ids[start : start + 5000])
+    clear_lexical_index()
+    return len(ids)
+
+
+def _backfill_lexical_index(collection, batch_size: int = 1000) -> int:
+    """
+    Build the lexical index from chunks already in Chroma, for collections that
+    were indexed before it existed. New chunks are added by the pipeline itself.
+    """
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(
+            include=["documents", "metadatas"], limit=batch_size, offset=offset
+        )
+        docs = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(batch["documents"], batch["metadatas"])
+        ]
+        index_chunks(batch["ids"], docs)
+    return total
+
+
+async def sync_index(books: list[Book], collection=None) -> IndexSummary:
+    """
+    Bring the Chroma collection in line with the given books, page by page.
+
+    Pages are diffed by their GitHub blob SHA against what was last indexed, before
+    any content is loaded: unchanged pages are skipped entirely, only added or
+    changed pages are streamed through the indexing pipeline, and chunks of changed
+    or removed pages are deleted. Pages whose content could not be fetched keep
+    their previous vectors. The lexical index follows the collection chunk for chunk.
+
+    :param books: The books returned by `get_book_index` (content is loaded lazily).
+    :param collection: The Chroma collection to sync; defaults to the app's.
+    :return: Counts of pages and chunks added, updated, removed and skipped.
+    """
+    if collection is None:
+        from configs.chroma_db import collection
+
+    summary: IndexSummary = {
+        "pages": {"added": 0, "updated": 0, "removed": 0, "skipped": 0},
+        "chunks": {"added": 0, "updated": 0, "removed": 0, "skipped": 0},
+        "embedded": 0,
+        "cached": 0,
+        "seconds": 0.0,
+        "chunks_per_sec": 0.0,
+        "embedding": None,
+    }
+
+    indexed = await asyncio.to_thread(get_indexed_pages)
+    if not indexed:
+        summary["chunks"]["removed"] += await asyncio.to_thread(
+            _reset_untracked_collection, collection
+        )
+    elif not await asyncio.to_thread(get_lexical_index_size):
+        if await asyncio.to_thread(_backfill_lexical_index, collection):
+            await asyncio.to_thread(bump_index_generation)
+
+    current = {}
+    for book in books:
+        for page in book["pages"]:
+            current[get_page_key(book, page)] = (book, page)
+
+    pending = []
+    for page_key, (book, page) in current.items():
+        previous = indexed.get(page_key)
+        if previous and previous[0] == page["sha"]:
+            summary["pages"]["skipped"] += 1
+            summary["chunks"]["skipped"] += previous[1]
+        else:
+            pending.append((book, page))
+
+    async def changed_pages():
+        async for book, page in iter_page_contents(pending):
+            page_key = get_page_key(book, page)
+            previous = indexed.get(page_key)
+            if page["content"] is None:
+                summary["pages"]["skipped"] += 1
+                summary["chunks"]["skipped"] += previous[1] if previous else 0
+                continue
+            if previous:
+                summary["chunks"]["removed"] += await asyncio.to_thread(
+                    _delete_page_chunks, collection, page_key
+                )
+            yield book, page
+
+    def on_page_indexed(book: Book, page: BookPage, chunk_count: int):
+        page_key = get_page_key(book, page)
+        status = "updated" if page_key in indexed else "added"
+        update_indexed_page(page_key, book["id"], page["path"], page["sha"], chunk_count)
+        summary["pages"][status] += 1
+        summary["chunks"][status] += chunk_count
+
+    stats = await run_index_pipeline(changed_pages(), on_page_indexed, collection=collection)
+    summary["embedded"] = stats["embedded"]
+    summary["cached"] = stats["cached"]
+    summary["seconds"] = stats["seconds"]
+    summary["chunks_per_sec"] = stats["chunks_per_sec"]
+    summary["embedding"] = stats["embedding"]
+
+    removed = [page_key for page_key in indexed if page_key not in current]
+    for page_key in removed:
+        summary["chunks"]["removed"] += await asyncio.to_thread(
+            _delete_page_chunks, collection, page_key
+        )
+    await asyncio.to_thread(delete_indexed_pages, removed)
+    summary["pages"]["removed"] = len(removed)
+
+    changed = summary["chunks"]["added"] + summary["chunks"]["updated"] + summary["chunks"]["removed"]
+    if changed:
+        await asyncio.to_thread(bump_index_generation)
+
+    return summary
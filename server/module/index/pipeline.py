@@ -0,0 +1,194 @@
+import asyncio
+import time
+from typing import AsyncIterable, Callable
+
+from langchain_core.documents import Document
+
+from module.book.types import Book, BookPage
+from module.index.types import PipelineStats
+from module.llm.embedding import EmbeddingEngine
+from module.llm.helpers import (
+    aembed_chunks,
+    filter_new_chunks,
+    split_document_into_chunks,
+    upsert_chunks,
+)
+from module.search.cache import index_chunks
+from utils.metrics import registry
+
+_DONE = object()
+
+ingest_stage_seconds = registry.histogram(
+    "ydkjs_ingest_stage_seconds",
+    "Indexing time per page (split) or per batch (embed, write).",
+    ("stage",),
+)
+ingest_pages = registry.counter("ydkjs_ingest_pages_total", "Pages split by the indexing pipeline.")
+ingest_chunks = registry.counter(
+    "ydkjs_ingest_chunks_total",
+    "Chunks seen by the indexing pipeline: already indexed, embedding cache hits, or embedded.",
+    ("result",),
+)
+
+
+class PageEnd:
+    """
+    Marker that follows the last chunk of a page through the pipeline, so the
+    writer knows when every chunk of that page has been stored.
+    """
+
+    def __init__(self, book: Book, page: BookPage, chunk_count: int):
+        self.book = book
+        self.page = page
+        self.chunk_count = chunk_count
+
+
+def get_page_key(book: Book, page: BookPage) -> str:
+    return f'{book["id"]}/{page["path"]}'
+
+
+def get_page_metadata(book: Book, page: BookPage) -> dict:
+    return {
+        "book": book["name"],
+        "book_id": book["id"],
+        "path": page["path"],
+        "chapter": page["path"].rsplit("/", 1)[-1].removesuffix(".md"),
+        "page_key": get_page_key(book, page),
+        "sha": page["sha"],
+    }
+
+
+async def run_index_pipeline(
+    pages: AsyncIterable[tuple[Book, BookPage]],
+    on_page_indexed: Callable[[Book, BookPage, int], None],
+    collection=None,
+    embedder=None,
+    model: str | None = None,
+    batch_size: int = 64,
+    max_pending_batches: int = 4,
+    embed_batch_size: int | None = None,
+    embed_concurrency: int | None = None,
+) -> PipelineStats:
+    """
+    Stream pages through splitter -> batched embedder -> vector-store writer.
+    The writer also adds each stored batch to the lexical (BM25) index, so both
+    indexes always hold the same chunks.
+
+    Stages are connected by bounded queues, so a fast stage waits for a slow one
+    instead of buffering: at most one window of pages, `max_pending_batches`
+    batches of chunks waiting to be embedded and as many being embedded or
+    waiting to be written are alive at any time, whatever the size of the corpus.
+    Embedding runs through an `EmbeddingEngine`, so several write batches can be
+    embedding concurrently while the writer still stores them in order.
+
+    :param pages: (book, page) pairs whose `content` is loaded.
+    :param on_page_indexed: Called (from a worker thread) once every chunk of a
+        page has been written, with the page's chunk count.
+    :param collection: The Chroma collection to write to; defaults to the app's.
+    :param embedder: The embedding model; defaults to the app's.
+    :param model: The embedding model name used for the embedding cache.
+    :param batch_size: Chunks per upsert.
+    :param max_pending_batches: Capacity of each queue, in batches.
+    :param embed_batch_size: Texts per embedding request (EMBED_BATCH_SIZE).
+    :param embed_concurrency: Embedding requests in flight (EMBED_CONCURRENCY).
+    :return: Throughput counters for the run.
+    """
+    if collection is None:
+        from configs.chroma_db import collection
+
+    stats: PipelineStats = {
+        "pages": 0,
+        "chunks": 0,
+        "indexed": 0,
+        "cached": 0,
+        "embedded": 0,
+        "seconds": 0.0,
+        "chunks_per_sec": 0.0,
+        "embedding": None,
+    }
+    engine = EmbeddingEngine(embedder, embed_batch_size, embed_concurrency)
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * max_pending_batches)
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+    started = time.perf_counter()
+
+    async def split():
+        async for book, page in pages:
+            split_started = time.perf_counter()
+            docs = await asyncio.to_thread(
+                split_document_into_chunks,
+                page["content"],
+                metadata=get_page_metadata(book, page),
+            )
+            ingest_stage_seconds.observe(time.perf_counter() - split_started, stage="split")
+            ingest_pages.inc()
+            for doc in docs:
+                await chunk_queue.put(doc)
+            await chunk_queue.put(PageEnd(book, page, len(docs)))
+            stats["pages"] += 1
+        await chunk_queue.put(_DONE)
+
+    async def embed():
+        docs: list[Document] = []
+        markers: list[PageEnd] = []
+
+        async def prepare(batch: list[Document], batch_markers: list[PageEnd]):
+            embed_started = time.perf_counter()
+            ids, new_docs = await asyncio.to_thread(filter_new_chunks, collection, batch)
+            vectors, embedded = await aembed_chunks(new_docs, engine, model)
+            ingest_stage_seconds.observe(time.perf_counter() - embed_started, stage="embed")
+            stats["chunks"] += len(batch)
+            stats["indexed"] += len(batch) - len(new_docs)
+            stats["cached"] += len(new_docs) - embedded
+            stats["embedded"] += embedded
+            ingest_chunks.inc(len(batch) - len(new_docs), result="indexed")
+            ingest_chunks.inc(len(new_docs) - embedded, result="cached")
+            ingest_chunks.inc(embedded, result="embedded")
+            return ids, vectors, new_docs, batch_markers
+
+        async def flush():
+            # Queue the in-flight task itself: batches embed concurrently, but the
+            # writer awaits them in queue order, so page markers stay in sequence.
+            await write_queue.put(asyncio.create_task(prepare(list(docs), list(markers))))
+            docs.clear()
+            markers.clear()
+
+        while (item := await chunk_queue.get()) is not _DONE:
+            if isinstance(item, PageEnd):
+                markers.append(item)
+            else:
+                docs.append(item)
+            if len(docs) >= batch_size:
+                await flush()
+        if docs or markers:
+            await flush()
+        await write_queue.put(_DONE)
+
+    async def write():
+        while (item := await write_queue.get()) is not _DONE:
+            ids, vectors, docs, markers = await item
+            if ids:
+                write_started = time.perf_counter()
+                await asyncio.to_thread(upsert_chunks, collection, ids, vectors, docs)
+                await asyncio.to_thread(index_chunks, ids, docs)
+                ingest_stage_seconds.observe(time.perf_counter() - write_started, stage="write")
+            for marker in markers:
+                await asyncio.to_thread(
+                    on_page_indexed, marker.book, marker.page, marker.chunk_count
+                )
+
+    tasks = [asyncio.create_task(stage()) for stage in (split, embed, write)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # If one stage fails the others would wait on their queues forever.
+        for task in tasks:
+            task.cancel()
+        while not write_queue.empty():
+            item = write_queue.get_nowait()
+            if isinstance(item, asyncio.Task):
+                item.cancel()
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+    stats["embedding"] = engine.stats()
+    return stats
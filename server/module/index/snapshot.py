@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from configs import chroma_db, lite_db, llm
+from module.index.cache import bump_index_generation
+from module.index.types import SnapshotManifest
+from module.llm.helpers import upsert_chunks
+from module.search.vector import rebuild_vector_index
+
+SNAPSHOT_FORMAT = 1
+MANIFEST = "manifest.json"
+CHUNKS = "chunks.jsonl"
+VECTORS = "vectors.npy"
+DATABASE = "app.db"
+
+# Emptied in the exported app.db: summaries of users' conversations must not
+# ship in a bundle baked into images, and answers and HTTP responses are this
+# deployment's own.
+LOCAL_TABLES = ("conversation_summaries", "answer_cache", "http_cache")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_path() -> Path | None:
+    value = os.getenv("INDEX_SNAPSHOT")
+    return Path(value) if value else None
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while block := file.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _clear_local_tables(connection: sqlite3.Connection) -> None:
+    tables = {
+        name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    for table in LOCAL_TABLES:
+        if table in tables:
+            connection.execute(f"DELETE FROM {table}")
+    connection.commit()
+    # Deleted rows stay in free pages until the file is rewritten.
+    connection.execute("VACUUM")
+
+
+def _clear_collection(collection, batch_size: int) -> None:
+    while ids := collection.get(include=[], limit=batch_size)["ids"]:
+        collection.delete(ids=ids)
+
+
+def export_snapshot(directory: Path, collection=None, batch_size: int = 1000) -> SnapshotManifest:
+    """
+    Write the index to `directory` so another replica can start from it:
+
+    - chunks.jsonl: one {"id", "document", "metadata"} per chunk,
+    - vectors.npy: the chunk vectors as float32, row i for line i (loadable with
+      `numpy.load(..., mmap_mode="r")`),
+    - app.db: a consistent copy of the SQLite caches (book cache, embedding
+      cache, indexed pages and the lexical index), with the LOCAL_TABLES
+      emptied,
+    - manifest.json: format version, embedding model, dimensions, counts and a
+      sha256 per file.
+
+    Run it between syncs; a sync running concurrently may be half captured.
+    """
+    import numpy as np
+
+    if collection is None:
+        from configs.chroma_db import collection
+
+    directory.mkdir(parents=True, exist_ok=True)
+    total = collection.count()
+    vectors = None
+    dimensions = 0
+    written = 0
+    with (directory / CHUNKS).open("w", encoding="utf-8") as chunks:
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+            if vectors is None and len(embeddings):
+                dimensions = embeddings.shape[1]
+                vectors = np.lib.format.open_memmap(
+                    directory / VECTORS, mode="w+", dtype=np.float32, shape=(total, dimensions)
+                )
+            for chunk_id, document, metadata in zip(
+                batch["ids"], batch["documents"], batch["metadatas"]
+            ):
+                chunks.write(
+                    json.dumps({"id": chunk_id, "document": document, "metadata": metadata or {}})
+                    + "\n"
+                )
+            vectors[written : written + len(embeddings)] = embeddings
+            written += len(embeddings)
+    if vectors is None:
+        np.save(directory / VECTORS, np.zeros((0, 0), dtype=np.float32))
+    else:
+        vectors.flush()
+        del vectors
+
+    # The backup API copies a consistent state even while the server is reading.
+    target = sqlite3.connect(directory / DATABASE)
+    with lite_db.get_db_connection() as source:
+        source.backup(target)
+    _clear_local_tables(target)
+    target.close()
+
+    manifest: SnapshotManifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embedding_model": llm.embedding_model,
+        "dimensions": dimensions,
+        "chunks": written,
+        "files": {
+            name: {"bytes": (directory / name).stat().st_size, "sha256": _file_sha256(directory / name)}
+            for name in (CHUNKS, VECTORS, DATABASE)
+        },
+    }
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def read_manifest(directory: Path, verify: bool = True) -> SnapshotManifest:
+    """
+    :raise SnapshotError: When the snapshot is unreadable, of another format,
+        built with another embedding model, or a file fails its checksum.
+    """
+    try:
+        manifest: SnapshotManifest = json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"No readable snapshot manifest in {directory}") from e
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Snapshot format {manifest.get('format')} is not {SNAPSHOT_FORMAT}")
+    if manifest.get("embedding_model") != llm.embedding_model:
+        raise SnapshotError(
+            f"Snapshot was embedded with {manifest.get('embedding_model')!r}, "
+            f"this server embeds questions with {llm.embedding_model!r}"
+        )
+    if verify:
+        for name, expected in manifest["files"].items():
+            path = directory / name
+            if not path.exists() or path.stat().st_size != expected["bytes"]:
+                raise SnapshotError(f"Snapshot file {name} is missing or truncated")
+            if _file_sha256(path) != expected["sha256"]:
+                raise SnapshotError(f"Snapshot file {name} does not match its checksum")
+    return manifest
+
+
+def import_snapshot(directory: Path, collection=None, batch_size: int = 1000) -> SnapshotManifest:
+    """
+    Replace the SQLite caches with the snapshot's and the collection's chunks
+    with its chunks and vectors, without embedding anything. The vectors are
+    read through a memory map, one batch at a time.
+    """
+    import numpy as np
+
+    if collection is None:
+        from configs.chroma_db import collection
+
+    manifest = read_manifest(directory)
+
+    # Chunks the snapshot's indexed_pages do not describe could never be
+    # removed by a sync. The lexical index is replaced with app.db below.
+    _clear_collection(collection, batch_size)
+
+    # Restore the caches first: indexed_pages must describe the chunks loaded below.
+    source = sqlite3.connect(directory / DATABASE)
+    with lite_db.get_db_connection() as target:
+        target.commit()
+        source.backup(target)
+    source.close()
+
+    vectors = np.load(directory / VECTORS, mmap_mode="r")
+    with (directory / CHUNKS).open(encoding="utf-8") as chunks:
+        row = 0
+        batch = []
+
+        def flush():
+            upsert_chunks(
+                collection,
+                [chunk["id"] for chunk in batch],
+                vectors[row - len(batch) : row].tolist(),
+                [Document(page_content=chunk["document"], metadata=chunk["metadata"]) for chunk in batch],
+            )
+            batch.clear()
+
+        for line in chunks:
+            batch.append(json.loads(line))
+            row += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    if row != manifest["chunks"]:
+        raise SnapshotError(f"Snapshot lists {manifest['chunks']} chunks but holds {row}")
+    rebuild_vector_index(collection)
+    # Caches in a running server were built against the previous index.
+    bump_index_generation()
+    return manifest
+
+
+def restore_snapshot_if_empty(directory: Path | None = None, collection=None) -> SnapshotManifest | None:
+    """
+    Load the snapshot at INDEX_SNAPSHOT into an empty collection, so a new
+    replica can serve without ingesting. A populated collection is left alone,
+    apart from publishing its flat index if none exists yet.
+    """
+    directory = directory or snapshot_path()
+    if directory is None:
+        return None
+    if collection is None:
+        collection = chroma_db.collection
+    # Judged by the collection the import writes into, not by the retriever: a
+    # flat index is empty until published, however full the collection is.
+    if collection.count():
+        if rebuild_vector_index(collection, if_missing=True) is not None:
+            bump_index_generation()
+        return None
+    started = time.perf_counter()
+    manifest = import_snapshot(directory, collection)
+    print(f"Loaded {manifest['chunks']} chunks from {directory} in {time.perf_counter() - started:.1f}s")
+    return manifest
+
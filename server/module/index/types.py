@@ -0,0 +1,45 @@
+from typing import TypedDict
+
+from module.llm.types import EmbeddingStats
+
+
+class PageCounts(TypedDict):
+    added: int
+    updated: int
+    removed: int
+    skipped: int
+
+
+class IndexSummary(TypedDict):
+    pages: PageCounts
+    chunks: PageCounts
+    embedded: int
+    cached: int
+    seconds: float
+    chunks_per_sec: float
+    embedding: EmbeddingStats | None
+
+
+class PipelineStats(TypedDict):
+    pages: int
+    chunks: int
+    indexed: int
+    cached: int
+    embedded: int
+    seconds: float
+    chunks_per_sec: float
+    embedding: EmbeddingStats | None
+
+
+class SnapshotFile(TypedDict):
+    bytes: int
+    sha256: str
+
+
+class SnapshotManifest(TypedDict):
+    format: int
+    created_at: str
+    embedding_model: str
+    dimensions: int
+    chunks: int
+    files: dict[str, SnapshotFile]
@@ -0,0 +1,56 @@
+import hashlib
+from array import array
+
+from configs.lite_db import run_db_query, run_db_many
+
+# SQLite caps the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+
+def get_embedding_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def get_cached_embeddings(keys: list[str]) -> dict[str, list[float]]:
+    """
+    Fetch stored vectors for the given content-hash keys.
+    :param keys: Keys built with `get_embedding_key`.
+    :return: A mapping of key to vector for every key found in the cache.
+    """
+    found = {}
+    for start in range(0, len(keys), _LOOKUP_BATCH):
+        batch = keys[start : start + _LOOKUP_BATCH]
+        placeholders = ", ".join(["?"] * len(batch))
+        rows = run_db_query(
+            f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})",
+            tuple(batch),
+            fetchall=True,
+        )
+        for key, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            found[key] = vector.tolist()
+    return found
+
+
+def update_embedding_cache(entries: dict[str, list[float]], model: str) -> None:
+    run_db_many(
+        "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+        [
+            (key, model, len(vector), array("f", vector).tobytes())
+            for key, vector in entries.items()
+        ],
+    )
+
+
+def init_embedding_cache_db() -> None:
+    create_table = """
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        dim INTEGER NOT NULL,
+        vector BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    run_db_query(create_table)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import random
+import time
+
+from module.llm.types import EmbeddingStats
+from utils.metrics import registry
+from utils.tokens import estimate_tokens
+
+embed_batch_seconds = registry.histogram(
+    "ydkjs_embed_batch_seconds", "Embedding backend latency per batch, retries included."
+)
+embed_retries = registry.counter("ydkjs_embed_retries_total", "Embedding batches retried after an error.")
+
+
+class EmbeddingEngine:
+    """
+    Batches texts for the embedding backend and keeps several batches in flight.
+
+    Texts are cut into batches of `batch_size`; at most `concurrency` batches are
+    sent at once (shared by every caller of the engine), and a batch that fails is
+    retried on its own with exponential backoff without disturbing the others.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+        max_retries: int = 3,
+    ):
+        if embedder is None:
+            from configs.llm import embedder
+        self.embedder = embedder
+        self.batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", 32))
+        self.concurrency = concurrency or int(os.getenv("EMBED_CONCURRENCY", 4))
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._counters = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0}
+        self._first_started: float | None = None
+        self._last_finished: float | None = None
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        async with self._semaphore:
+            batch_started = time.perf_counter()
+            if self._first_started is None:
+                self._first_started = batch_started
+            for attempt in range(self.max_retries + 1):
+                try:
+                    vectors = await self.embedder.aembed_documents(texts)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self._counters["retries"] += 1
+                    embed_retries.inc()
+                    print(f"Retrying embedding batch of {len(texts)} after {e!r}")
+                    await asyncio.sleep(min(2**attempt, 30) * 0.5 + random.uniform(0, 0.5))
+            self._last_finished = time.perf_counter()
+            embed_batch_seconds.observe(self._last_finished - batch_started)
+
+        self._counters["chunks"] += len(texts)
+        self._counters["tokens"] += sum(estimate_tokens(text) for text in texts)
+        self._counters["batches"] += 1
+        return vectors
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts, preserving their order.
+        """
+        batches = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    def stats(self) -> EmbeddingStats:
+        busy = (
+            self._last_finished - self._first_started
+            if self._first_started is not None and self._last_finished is not None
+            else 0.0
+        )
+        return {
+            **self._counters,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "seconds": busy,
+            "chunks_per_sec": self._counters["chunks"] / busy if busy else 0.0,
+            "tokens_per_sec": self._counters["tokens"] / busy if busy else 0.0,
+        }
@@ -1,15 +1,17 @@
 import ast
+import asyncio
+import functools
+import hashlib
 import json
-from langchain.schema.document import Document
+from langchain_core.documents import Document
 
-from langchain_text_splitters import MarkdownHeaderTextSplitter
-
-from configs.llm import chat_llm
-from module.book.cache import update_cache, get_cached_record
+from configs import llm
+from module.book.cache import update_cache, get_cached_text
+from module.book.reading_order import parse_reading_order
 from module.book.types import GitHubFileItem
+from module.llm.cache import get_cached_embeddings, get_embedding_key, update_embedding_cache
 from module.llm.types import ReadingOrder
 from prompts.get_recommended_books_in_order import get_recommended_books_in_order
-from utils.remove_html_contents import remove_html_contents
 
 
 def analyze_intro_readme(
@@ -17,26 +19,34 @@ def analyze_intro_readme(
 ) -> ReadingOrder:
     """
     Analyzes the README content to recommend books in order.
+
+    The order is read from the README's links by `parse_reading_order`; the chat
+    model is only asked (and its answer cached by README sha) when no link
+    resolves to a book folder.
     :param readme:
     :param contents:
     :param sha:
     :return:
     """
-    from langchain_core.messages import HumanMessage
+    order = parse_reading_order(readme, contents)
+    if order:
+        return order
+
+    from utils.remove_html_contents import remove_html_contents
 
     readme = remove_html_contents(readme)
 
     # if sha exist, then return cached llm response
     current_sha = f"ai-{sha}"
-    cached_row = get_cached_record(current_sha)
+    cached = get_cached_text(current_sha)
 
-    if cached_row and cached_row[1] == current_sha:
-        _, _, content, _ = cached_row
-        return json.loads(content)
+    if cached is not None:
+        return json.loads(cached)
 
+    print("Reading order not found in README links, asking the chat model")
     prompt = get_recommended_books_in_order(readme=readme, file_contents=contents)
 
-    raw_response = chat_llm.invoke(
+    raw_response = llm.chat_llm.invoke(
        prompt
     ).content
 
@@ -53,8 +63,24 @@ def analyze_intro_readme(
     return result
 
 
+@functools.lru_cache(maxsize=8)
+def _get_splitters(chunk_size: int, overlap: int):
+    from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+
+    markdown_splitter = MarkdownHeaderTextSplitter(
+        headers_to_split_on=[("#", "h1"), ("##", "h2"), ("###", "h3"), ("###", "h4")]
+    )
+    recursive_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=overlap, length_function=len
+    )
+    return markdown_splitter, recursive_splitter
+
+
 def split_document_into_chunks(
-    document: str, chunk_size: int = 800, overlap: int = 100
+    document: str,
+    chunk_size: int = 800,
+    overlap: int = 100,
+    metadata: dict | None = None,
 ) -> list[Document]:
     """
     Splits a document into chunks of specified size with overlap.
@@ -63,6 +89,7 @@ def split_document_into_chunks(
         document (str): The document to split.
         chunk_size (int): The size of each chunk.
         overlap (int): The number of characters to overlap between chunks.
+        metadata (dict | None): Metadata copied onto every chunk, e.g. the source page.
 
     Returns:
         list[str]: A list of document chunks.
@@ -78,37 +105,111 @@ def split_document_into_chunks(
     #
     # return chunks
 
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-    markdown_splitter = MarkdownHeaderTextSplitter(
-        headers_to_split_on=[("#", "h1"), ("##", "h2"), ("###", "h3"), ("###", "h4")]
-    )
+    markdown_splitter, recursive_splitter = _get_splitters(chunk_size, overlap)
 
     markdown_sections: list[Document] = markdown_splitter.split_text(document)
 
-    # Further split each section into overlapping chunks
-    recursive_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=overlap, length_function=len
-    )
-
     final_docs: list[Document] = []
 
+    # Further split each section into overlapping chunks
     for section in markdown_sections:
+        section.metadata = {**(metadata or {}), **section.metadata}
         sub_docs = recursive_splitter.split_documents([section])
         final_docs.extend(sub_docs)
 
+    # Position within the source document, so neighbouring chunks can be found again.
+    for index, doc in enumerate(final_docs):
+        doc.metadata["chunk_index"] = index
+
     return final_docs
 
 
-def store_embeddings(docs: list[Document]):
-    from configs.chroma_db import chroma_client, collection_name
-    from configs.llm import embedder
-    from langchain_chroma import Chroma
+def get_chunk_id(doc: Document) -> str:
+    """
+    Derive a stable id for a chunk from its text and metadata, so re-ingesting
+    the same content upserts the same record instead of adding a duplicate.
+    """
+    metadata = json.dumps(doc.metadata, sort_keys=True)
+    return hashlib.sha256(f"{metadata}\n{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+def upsert_chunks(collection, ids, embeddings, docs: list[Document]) -> None:
+    # Chroma rejects empty metadata dicts, so chunks without any go in on their own.
+    groups = {True: ([], [], []), False: ([], [], [])}
+    for chunk_id, embedding, doc in zip(ids, embeddings, docs):
+        group = groups[bool(doc.metadata)]
+        group[0].append(chunk_id)
+        group[1].append(embedding)
+        group[2].append(doc)
+
+    for has_metadata, (group_ids, group_embeddings, group_docs) in groups.items():
+        if not group_ids:
+            continue
+        collection.upsert(
+            ids=group_ids,
+            embeddings=group_embeddings,
+            documents=[doc.page_content for doc in group_docs],
+            metadatas=[doc.metadata for doc in group_docs] if has_metadata else None,
+        )
+
+
+def filter_new_chunks(collection, docs: list[Document]) -> tuple[list[str], list[Document]]:
+    """
+    Drop duplicate chunks and chunks whose id is already in the collection.
+    :return: The ids and documents that still need to be embedded and written.
+    """
+    unique_docs = {get_chunk_id(doc): doc for doc in docs}
+    if not unique_docs:
+        return [], []
+    existing = set(collection.get(ids=list(unique_docs), include=[])["ids"])
+    ids = [chunk_id for chunk_id in unique_docs if chunk_id not in existing]
+    return ids, [unique_docs[chunk_id] for chunk_id in ids]
+
 
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=embedder,
-        collection_name=collection_name,
-        client=chroma_client,
-    )
-    return vectorstore.as_retriever()
+def embed_chunks(
+    docs: list[Document], embedder=None, model: str | None = None
+) -> tuple[list[list[float]], int]:
+    """
+    Embed chunk texts, reusing vectors from the embedding cache where possible.
+    :return: One vector per document and the number of documents actually embedded.
+    """
+    if embedder is None:
+        from configs.llm import embedder
+    if model is None:
+        from configs.llm import embedding_model as model
+
+    keys = [get_embedding_key(doc.page_content, model) for doc in docs]
+    vectors = get_cached_embeddings(keys)
+
+    missing = [i for i, key in enumerate(keys) if key not in vectors]
+    if missing:
+        embedded = embedder.embed_documents([docs[i].page_content for i in missing])
+        new_vectors = {keys[i]: vector for i, vector in zip(missing, embedded)}
+        update_embedding_cache(new_vectors, model)
+        vectors.update(new_vectors)
+
+    return [vectors[key] for key in keys], len(missing)
+
+
+async def aembed_chunks(
+    docs: list[Document], engine, model: str | None = None
+) -> tuple[list[list[float]], int]:
+    """
+    Async counterpart of `embed_chunks` that sends cache misses through an
+    `EmbeddingEngine`, so several batches can be in flight at once.
+    :return: One vector per document and the number of documents actually embedded.
+    """
+    if model is None:
+        from configs.llm import embedding_model as model
+
+    keys = [get_embedding_key(doc.page_content, model) for doc in docs]
+    vectors = await asyncio.to_thread(get_cached_embeddings, keys)
+
+    missing = [i for i, key in enumerate(keys) if key not in vectors]
+    if missing:
+        embedded = await engine.embed([docs[i].page_content for i in missing])
+        new_vectors = {keys[i]: vector for i, vector in zip(missing, embedded)}
+        await asyncio.to_thread(update_embedding_cache, new_vectors, model)
+        vectors.update(new_vectors)
+
+    return [vectors[key] for key in keys], len(missing)
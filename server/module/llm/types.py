@@ -8,3 +8,15 @@ class SingleBook(TypedDict):
 
 
 ReadingOrder = Dict[str, SingleBook]
+
+
+class EmbeddingStats(TypedDict):
+    chunks: int
+    tokens: int
+    batches: int
+    retries: int
+    batch_size: int
+    concurrency: int
+    seconds: float
+    chunks_per_sec: float
+    tokens_per_sec: float
@@ -0,0 +1,179 @@
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from configs.lite_db import get_db_connection, run_db_query
+from module.search.helpers import bm25_idf, bm25_term_score, tokenize
+
+# SQLite caps the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+# Terms present in more than this share of chunks carry almost no signal and
+# would pull most of the postings table into every query.
+_MAX_DOC_FREQ_RATIO = 0.5
+
+
+def index_chunks(ids: list[str], docs: list[Document]) -> None:
+    """
+    Add chunks to the lexical index under the same ids they have in Chroma.
+    Chunk ids are content hashes, so re-indexing an id rewrites identical postings.
+    """
+    chunk_rows = []
+    posting_rows = []
+    for chunk_id, doc in zip(ids, docs):
+        terms = tokenize(doc.page_content)
+        chunk_rows.append(
+            (
+                chunk_id,
+                doc.metadata.get("page_key"),
+                doc.metadata.get("book_id"),
+                doc.metadata.get("chapter"),
+                len(terms),
+            )
+        )
+        posting_rows.extend((term, chunk_id, tf) for term, tf in Counter(terms).items())
+
+    with get_db_connection() as conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO lexical_chunks (chunk_id, page_key, book_id, chapter, length)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            chunk_rows,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO lexical_postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+            posting_rows,
+        )
+
+
+def delete_lexical_chunks(ids: list[str]) -> None:
+    with get_db_connection() as conn:
+        for start in range(0, len(ids), _LOOKUP_BATCH):
+            batch = ids[start : start + _LOOKUP_BATCH]
+            placeholders = ", ".join(["?"] * len(batch))
+            conn.execute(f"DELETE FROM lexical_postings WHERE chunk_id IN ({placeholders})", batch)
+            conn.execute(f"DELETE FROM lexical_chunks WHERE chunk_id IN ({placeholders})", batch)
+
+
+def clear_lexical_index() -> None:
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM lexical_postings")
+        conn.execute("DELETE FROM lexical_chunks")
+
+
+def get_lexical_index_size() -> int:
+    return run_db_query("SELECT COUNT(*) FROM lexical_chunks", fetchone=True)[0]
+
+
+def _scope_clause(book_id: str | None, chapter: str | None) -> tuple[str, list[str]]:
+    clause, params = "", []
+    if book_id is not None:
+        clause += " AND c.book_id = ?"
+        params.append(book_id)
+    if chapter is not None:
+        clause += " AND c.chapter = ?"
+        params.append(chapter)
+    return clause, params
+
+
+def search_lexical(
+    query: str,
+    limit: int = 20,
+    book_id: str | None = None,
+    chapter: str | None = None,
+) -> list[tuple[str, float]]:
+    """
+    Rank indexed chunks against a query with BM25.
+
+    :param book_id: Only rank chunks of this book.
+    :param chapter: Only rank chunks of this chapter (combine with `book_id`).
+    :return: Up to `limit` (chunk id, score) pairs, best first.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:_LOOKUP_BATCH]
+    if not terms:
+        return []
+    scope, scope_params = _scope_clause(book_id, chapter)
+
+    with get_db_connection() as conn:
+        # Collection statistics are taken over the scope, which is the corpus being ranked.
+        total_docs, avg_length = conn.execute(
+            f"SELECT COUNT(*), AVG(length) FROM lexical_chunks c WHERE 1 = 1{scope}",
+            scope_params,
+        ).fetchone()
+        if not total_docs:
+            return []
+
+        placeholders = ", ".join(["?"] * len(terms))
+        doc_freqs = dict(
+            conn.execute(
+                f"""
+                SELECT p.term, COUNT(*)
+                FROM lexical_postings p JOIN lexical_chunks c ON c.chunk_id = p.chunk_id
+                WHERE p.term IN ({placeholders}){scope}
+                GROUP BY p.term
+                """,
+                [*terms, *scope_params],
+            ).fetchall()
+        )
+        idfs = {
+            term: bm25_idf(total_docs, doc_freq)
+            for term, doc_freq in doc_freqs.items()
+            if doc_freq <= total_docs * _MAX_DOC_FREQ_RATIO
+        }
+        if not idfs:
+            return []
+
+        placeholders = ", ".join(["?"] * len(idfs))
+        postings = conn.execute(
+            f"""
+            SELECT p.term, p.chunk_id, p.tf, c.length
+            FROM lexical_postings p JOIN lexical_chunks c ON c.chunk_id = p.chunk_id
+            WHERE p.term IN ({placeholders}){scope}
+            """,
+            [*idfs, *scope_params],
+        ).fetchall()
+
+    scores: dict[str, float] = {}
+    for term, chunk_id, tf, length in postings:
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + bm25_term_score(
+            tf, length, avg_length, idfs[term]
+        )
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def init_search_db() -> None:
+    columns = {
+        row[1] for row in run_db_query("PRAGMA table_info(lexical_chunks)", fetchall=True)
+    }
+    if columns and "book_id" not in columns:
+        # Indexes built before chunks were scoped by book are dropped; the next
+        # sync backfills them from Chroma.
+        run_db_query("DROP TABLE IF EXISTS lexical_postings")
+        run_db_query("DROP TABLE lexical_chunks")
+
+    create_chunks = """
+    CREATE TABLE IF NOT EXISTS lexical_chunks (
+        chunk_id TEXT PRIMARY KEY,
+        page_key TEXT,
+        book_id TEXT,
+        chapter TEXT,
+        length INTEGER NOT NULL
+    );
+    """
+    create_postings = """
+    CREATE TABLE IF NOT EXISTS lexical_postings (
+        term TEXT NOT NULL,
+        chunk_id TEXT NOT NULL,
+        tf INTEGER NOT NULL,
+        PRIMARY KEY (term, chunk_id)
+    ) WITHOUT ROWID;
+    """
+    run_db_query(create_chunks)
+    run_db_query(create_postings)
+    run_db_query(
+        "CREATE INDEX IF NOT EXISTS idx_lexical_chunks_scope ON lexical_chunks (book_id, chapter)"
+    )
+    run_db_query(
+        "CREATE INDEX IF NOT EXISTS idx_lexical_postings_chunk_id ON lexical_postings (chunk_id)"
+    )
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from langchain_core.documents import Document
+
+VECTORS = "vectors.npy"
+CHUNKS = "chunks.db"
+CURRENT = "CURRENT"
+_GENERATION_PREFIX = "gen-"
+
+# Rows scored per matrix product: bounds the float32 copy a float16 index needs
+# while keeping every product large enough for BLAS.
+_BLOCK_ROWS = 65536
+
+# The columns scope filters can use, kept in memory as integer codes.
+_FILTER_FIELDS = ("book_id", "chapter")
+
+# (ids, documents, metadatas, embeddings) for a run of consecutive rows.
+ChunkBatch = tuple[list[str], list[str], list[dict], list[list[float]]]
+
+
+def flat_index_path() -> Path:
+    return Path(os.getenv("FLAT_INDEX_PATH", "./flat_index"))
+
+
+def flat_index_dtype() -> str:
+    # float16 halves the file and the page cache it needs, but NumPy has no
+    # half-precision BLAS: every query converts the rows first and scores ~10x
+    # slower (see benchmarks/vector_backends.py). float32 is scored in place.
+    return os.getenv("FLAT_INDEX_DTYPE", "float32")
+
+
+def iter_collection(collection, batch_size: int = 1000) -> Iterator[ChunkBatch]:
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(
+            include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+        )
+        yield batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"]
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _generations(directory: Path) -> list[int]:
+    return sorted(
+        int(path.name.removeprefix(_GENERATION_PREFIX))
+        for path in directory.glob(f"{_GENERATION_PREFIX}*")
+        if path.name.removeprefix(_GENERATION_PREFIX).isdigit()
+    )
+
+
+def current_generation(directory: Path | None = None) -> str | None:
+    """
+    :return: The name of the published generation directory, or None before the
+        first build.
+    """
+    try:
+        return ((directory or flat_index_path()) / CURRENT).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _publish(directory: Path, generation: str) -> None:
+    # Readers only ever follow CURRENT, and rename() swaps it in one step.
+    current_tmp = directory / f"{CURRENT}.tmp"
+    with current_tmp.open("w") as file:
+        file.write(generation)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(current_tmp, directory / CURRENT)
+
+
+def _prune_generations(directory: Path, keep: int) -> None:
+    """
+    Delete generations older than the newest `keep` published ones. Workers still
+    mapping a deleted one keep reading it until they reload: unlinked files
+    live on while they are open.
+    """
+    current = current_generation(directory)
+    if current is None:
+        return
+    published = [n for n in _generations(directory) if n <= int(current.removeprefix(_GENERATION_PREFIX))]
+    for number in published[:-keep]:
+        shutil.rmtree(directory / f"{_GENERATION_PREFIX}{number:08d}", ignore_errors=True)
+
+
+def write_flat_index(
+    directory: Path, batches: Iterable[ChunkBatch], total: int, dtype: str | None = None
+) -> int:
+    """
+    Write chunks to a new generation of the flat index in `directory`:
+
+    - gen-NNNNNNNN/vectors.npy: one L2-normalized row per chunk, so a dot product
+      is the cosine similarity (loadable with `numpy.load(..., mmap_mode="r")`),
+    - gen-NNNNNNNN/chunks.db: a SQLite side table of row -> id, book, chapter,
+      text and metadata,
+    - CURRENT: the name of the generation readers should use.
+
+    A generation is never modified once written. It is published by atomically
+    replacing CURRENT, so every reader sees either the old pair of files or the
+    new one. The previous generation is kept for readers still on it.
+
+    :param batches: Consecutive runs of chunks; see `iter_collection`.
+    :param total: The number of chunks the batches hold, to size the memory map.
+    :return: The number of rows written.
+    """
+    import numpy as np
+
+    directory.mkdir(parents=True, exist_ok=True)
+    generation = f"{_GENERATION_PREFIX}{(_generations(directory) or [0])[-1] + 1:08d}"
+    target = directory / generation
+    target.mkdir()
+
+    conn = sqlite3.connect(target / CHUNKS)
+    conn.execute(
+        """
+        CREATE TABLE chunks (
+            row INTEGER PRIMARY KEY,
+            id TEXT NOT NULL,
+            book_id TEXT,
+            chapter TEXT,
+            document TEXT NOT NULL,
+            metadata TEXT NOT NULL
+        )
+        """
+    )
+
+    vectors = None
+    row = 0
+    for ids, documents, metadatas, embeddings in batches:
+        if not ids:
+            continue
+        normalized = _normalize(embeddings)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(
+                target / VECTORS,
+                mode="w+",
+                dtype=dtype or flat_index_dtype(),
+                shape=(total, normalized.shape[1]),
+            )
+        vectors[row : row + len(ids)] = normalized
+        records = []
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            metadata = metadata or {}
+            records.append(
+                (row, chunk_id, metadata.get("book_id"), metadata.get("chapter"), document, json.dumps(metadata))
+            )
+            row += 1
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", records)
+
+    if vectors is None:
+        np.save(target / VECTORS, np.zeros((0, 0), dtype=dtype or flat_index_dtype()))
+    else:
+        vectors.flush()
+        del vectors
+    conn.commit()
+    conn.close()
+    if row != total:
+        shutil.rmtree(target)
+        raise ValueError(f"Expected {total} chunks, got {row}")
+
+    _publish(directory, generation)
+    _prune_generations(directory, int(os.getenv("FLAT_INDEX_KEEP_GENERATIONS", 2)))
+    return row
+
+
+def build_flat_index(collection=None, directory: Path | None = None) -> int:
+    """
+    Rebuild the flat index from the Chroma collection, e.g. after a sync.
+    """
+    if collection is None:
+        from configs.chroma_db import collection
+
+    return write_flat_index(
+        directory or flat_index_path(), iter_collection(collection), collection.count()
+    )
+
+
+class FlatIndex:
+    """
+    Exact nearest-neighbour search over a memory-mapped matrix of normalized vectors.
+
+    A query is one matrix-vector product against every row (or the rows of the
+    requested book or chapter) followed by a partial sort, so results are exact
+    and nothing is built at startup beyond mapping the file and reading the ids
+    and scope columns. Texts and metadata are read from the side table for the
+    returned rows only.
+
+    Implements the same retriever interface as `ChromaRetriever`. Every call
+    follows CURRENT, so when `write_flat_index` publishes a new generation (from
+    this or another process) the next search switches to it as a whole. The
+    vectors are mapped read-only, so processes serving the same generation share
+    its pages in the OS page cache instead of each holding a copy.
+    """
+
+    def __init__(self, directory: Path | None = None):
+        self.directory = directory or flat_index_path()
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Swapped whole on reload, so a search never mixes two builds.
+        self._state = self._empty_state()
+        self._load()
+
+    @staticmethod
+    def _empty_state() -> dict:
+        import numpy as np
+
+        return {
+            "version": None,
+            "generation": None,
+            "vectors": np.zeros((0, 0), dtype=np.float32),
+            "ids": [],
+            "rows": {},
+            "codes": {field: (np.zeros(0, dtype=np.int32), {}) for field in _FILTER_FIELDS},
+            "conn": None,
+        }
+
+    def _current_version(self):
+        # CURRENT is replaced, never rewritten, so its inode changes with every publish.
+        try:
+            stat = (self.directory / CURRENT).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self) -> None:
+        import numpy as np
+
+        # Version before name: a publish in between makes the next call reload again.
+        version = self._current_version()
+        generation = current_generation(self.directory)
+        if version is None or generation is None:
+            self._state = self._empty_state()
+            return
+
+        target = self.directory / generation
+        vectors = np.load(target / VECTORS, mmap_mode="r")
+        # Generations are never modified, so SQLite can skip locking altogether.
+        conn = sqlite3.connect(
+            f"file:{target / CHUNKS}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        columns = conn.execute("SELECT id, book_id, chapter FROM chunks ORDER BY row").fetchall()
+
+        codes = {}
+        for position, field in enumerate(_FILTER_FIELDS, start=1):
+            values: dict[str, int] = {}
+            codes[field] = (
+                np.fromiter(
+                    (values.setdefault(column[position], len(values)) for column in columns),
+                    dtype=np.int32,
+                    count=len(columns),
+                ),
+                values,
+            )
+        ids = [column[0] for column in columns]
+        self._state = {
+            "version": version,
+            "generation": generation,
+            "vectors": vectors,
+            "ids": ids,
+            "rows": {chunk_id: row for row, chunk_id in enumerate(ids)},
+            "codes": codes,
+            "conn": conn,
+        }
+
+    def refresh(self) -> None:
+        # One stat call: negligible next to a search, so every call checks.
+        if self._current_version() == self._state["version"]:
+            return
+        with self._reload_lock:
+            if self._current_version() == self._state["version"]:
+                return
+            try:
+                self._load()
+            except (FileNotFoundError, sqlite3.OperationalError) as e:
+                # Pruned by two rebuilds in a row; keep serving and retry on the next call.
+                print(f"Flat index reload failed, keeping {self._state['generation']}: {e!r}")
+
+    def stats(self) -> dict:
+        self.refresh()
+        state = self._state
+        return {
+            "backend": "flat",
+            "generation": state["generation"],
+            "chunks": len(state["ids"]),
+            "dtype": str(state["vectors"].dtype),
+            "bytes": state["vectors"].nbytes,
+        }
+
+    def count(self) -> int:
+        self.refresh()
+        return len(self._state["ids"])
+
+    @staticmethod
+    def _filter_rows(state: dict, where: dict | None):
+        """
+        The rows matching a Chroma-style `where` filter: equality on book_id or
+        chapter, or an `$and` of those (see `get_scope_filter`). None is every row.
+        """
+        import numpy as np
+
+        if not where:
+            return None
+        conditions = where["$and"] if "$and" in where else [where]
+        mask = np.ones(len(state["ids"]), dtype=bool)
+        for condition in conditions:
+            for field, value in condition.items():
+                if field not in state["codes"]:
+                    raise ValueError(f"The flat index cannot filter on {field!r}")
+                codes, values = state["codes"][field]
+                if value not in values:
+                    return np.zeros(0, dtype=np.int64)
+                mask &= codes == values[value]
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def _scores(vectors, queries, rows):
+        import numpy as np
+
+        if rows is not None:
+            vectors = vectors[rows]
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            block = np.asarray(vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+            scores[:, start : start + len(block)] = queries @ block.T
+        return scores
+
+    def _search(self, state: dict, embeddings: list[list[float]], k: int, where: dict | None):
+        """
+        Score a batch of queries against one generation in one pass over the vectors.
+
+        :return: For each query, up to k (row, cosine similarity) pairs, best first.
+        """
+        import numpy as np
+
+        if not state["ids"] or k <= 0:
+            return [[] for _ in embeddings]
+        rows = self._filter_rows(state, where)
+        if rows is not None and not len(rows):
+            return [[] for _ in embeddings]
+        queries = _normalize(embeddings).reshape(len(embeddings), -1)
+        scores = self._scores(state["vectors"], queries, rows)
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            best = candidates[np.argsort(-query_scores[candidates], kind="stable")]
+            found = best if rows is None else rows[best]
+            results.append([(int(row), float(query_scores[i])) for row, i in zip(found, best)])
+        return results
+
+    def _documents_for_rows(self, state: dict, rows: list[int]) -> dict[int, Document]:
+        if not rows:
+            return {}
+        with self._lock:
+            records = state["conn"].execute(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({', '.join('?' * len(rows))})",
+                rows,
+            ).fetchall()
+        return {
+            row: Document(id=chunk_id, page_content=document, metadata=json.loads(metadata))
+            for row, chunk_id, document, metadata in records
+        }
+
+    def similarity_search_by_vectors(
+        self, embeddings: list[list[float]], k: int = 4, filter: dict | None = None
+    ) -> list[list[Document]]:
+        self.refresh()
+        state = self._state
+        found = self._search(state, embeddings, k, filter)
+        documents = self._documents_for_rows(state, sorted({row for hits in found for row, _ in hits}))
+        return [[documents[row] for row, _ in hits if row in documents] for hits in found]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ) -> list[Document]:
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    async def asimilarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ) -> list[Document]:
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k, filter)
+
+    def get_documents(self, ids: list[str]) -> dict[str, Document]:
+        self.refresh()
+        state = self._state
+        rows = [state["rows"][chunk_id] for chunk_id in ids if chunk_id in state["rows"]]
+        return {doc.id: doc for doc in self._documents_for_rows(state, rows).values()}
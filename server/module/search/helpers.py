@@ -0,0 +1,62 @@
+import math
+import re
+
+# Dotted identifiers (`Object.freeze`, `Symbol.iterator`) are kept whole as well as
+# split into their parts; JS operators are spelled out so `??=` or `?.` stay
+# searchable without picking up every markdown `**` or `---`.
+_TOKEN_RE = re.compile(
+    r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*"
+    r"|\d+(?:\.\d+)?"
+    r"|\?\?=|\?\?|\?\.|\.\.\.|===|!==|==|!=|=>|\*\*=|&&=|\|\|=|&&|\|\||>>>=?|<<=|>>=|<<|>>|\+\+"
+)
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its "
+    "of on or so than that the then there these they this to was we what when where "
+    "which while who why will with you your".split()
+)
+
+# Okapi BM25 parameters, at their usual defaults.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase search terms, keeping JS identifiers and operators intact.
+    """
+    tokens = []
+    for match in _TOKEN_RE.findall(text):
+        token = match.lower()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if "." in token and (token[0].isalpha() or token[0] in "_$"):
+            tokens.extend(part for part in token.split(".") if part not in STOPWORDS)
+    return tokens
+
+
+def bm25_idf(total_docs: int, doc_freq: int) -> float:
+    return math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(tf: int, length: int, avg_length: float, idf: float) -> float:
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+    return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """
+    Merge several rankings of ids with reciprocal-rank fusion: each id scores
+    sum(1 / (k + rank)) over the rankings it appears in, so an id ranked well
+    by either retriever surfaces without their scores having to be comparable.
+
+    :param rankings: Lists of ids, best first.
+    :param k: Damping constant; larger values flatten the advantage of top ranks.
+    :return: Every id that appears in any ranking, best fused score first.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
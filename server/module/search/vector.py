@@ -0,0 +1,96 @@
+import os
+
+from langchain_core.documents import Document
+
+from configs.serving import is_worker
+
+
+def vector_backend() -> str:
+    # "chroma" searches the Chroma collection; "flat" the memory-mapped index
+    # in FLAT_INDEX_PATH, rebuilt from the collection after every sync. Request
+    # workers default to the flat index, which they can share read-only.
+    return os.getenv("VECTOR_BACKEND", "flat" if is_worker() else "chroma").lower()
+
+
+class ChromaRetriever:
+    """
+    The retriever interface over Chroma. Every backend behind
+    `configs.chroma_db.retriever` provides:
+
+    - `asimilarity_search_by_vector(embedding, k, filter)` and its sync twin,
+    - `similarity_search_by_vectors(embeddings, k, filter)` for a batch of queries,
+    - `get_documents(ids)`, chunks by id for those only the lexical search found,
+    - `count()`, the number of indexed chunks, and `stats()` for /stats.
+
+    `filter` is a Chroma `where` clause as built by `get_scope_filter`.
+    """
+
+    def __init__(self, vector_store, collection):
+        self.vector_store = vector_store
+        self.collection = collection
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ) -> list[Document]:
+        return self.vector_store.similarity_search_by_vector(embedding, k=k, filter=filter)
+
+    async def asimilarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ) -> list[Document]:
+        return await self.vector_store.asimilarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vectors(
+        self, embeddings: list[list[float]], k: int = 4, filter: dict | None = None
+    ) -> list[list[Document]]:
+        results = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=filter,
+            include=["documents", "metadatas"],
+        )
+        return [
+            [
+                Document(id=chunk_id, page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            for ids, texts, metadatas in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        ]
+
+    def get_documents(self, ids: list[str]) -> dict[str, Document]:
+        records = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(
+                records["ids"], records["documents"], records["metadatas"]
+            )
+        }
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def stats(self) -> dict:
+        return {"backend": "chroma", "chunks": self.count()}
+
+
+def rebuild_vector_index(
+    collection=None, if_missing: bool = False, force: bool = False
+) -> int | None:
+    """
+    Bring the flat index in line with the collection after it changed; a no-op
+    with the Chroma backend unless forced.
+
+    :param if_missing: Only build an index that does not exist yet.
+    :param force: Build whatever this process's backend is, as the writer does
+        for SERVE_MODE=workers servers.
+    :return: The number of chunks in the rebuilt index, or None if not rebuilt.
+    """
+    if not force and vector_backend() != "flat":
+        return None
+    from module.search.flat_index import build_flat_index, current_generation
+
+    if if_missing and current_generation() is not None:
+        return None
+
+    return build_flat_index(collection)
@@ -0,0 +1,60 @@
+def build_rewrite_prompt(question: str, conversation: str) -> list:
+    """
+    Builds a prompt that turns a follow-up question into a standalone one for retrieval.
+
+    Args:
+        question (str): The latest user question, possibly referring back to the conversation.
+        conversation (str): The conversation so far, as formatted by `format_conversation`.
+
+    Returns:
+        list: A list of messages forming the prompt.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    system_prompt = SystemMessage(
+        content="""
+        You rewrite follow-up questions about JavaScript into standalone questions.
+        Replace pronouns and references such as "it", "that" or "the previous example"
+        with what they refer to in the conversation. Keep the user's wording otherwise.
+        Reply with the rewritten question only, on a single line.
+        """
+    )
+    user = HumanMessage(
+        content=f"""Conversation:
+        {conversation}
+        Follow-up question:
+        {question}
+        Standalone question:"""
+    )
+    return [system_prompt, user]
+
+
+def build_summary_prompt(summary: str, messages: str) -> list:
+    """
+    Builds a prompt that folds new messages into the running conversation summary.
+
+    Args:
+        summary (str): The summary so far, empty for the first update.
+        messages (str): The messages to add, one per line with their role.
+
+    Returns:
+        list: A list of messages forming the prompt.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    system_prompt = SystemMessage(
+        content="""
+        You maintain a short running summary of a conversation between a developer and
+        an assistant about the "You Don't Know JS" books. Update the summary with the new
+        messages: keep the topics, code and conclusions that later questions may refer to,
+        drop pleasantries. Reply with the updated summary only, in at most 120 words.
+        """
+    )
+    user = HumanMessage(
+        content=f"""Current summary:
+        {summary or "(none)"}
+        New messages:
+        {messages}
+        Updated summary:"""
+    )
+    return [system_prompt, user]
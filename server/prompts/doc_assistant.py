@@ -1,10 +1,11 @@
-def build_assistant_prompt(question: str, context: str) -> list:
+def build_assistant_prompt(question: str, context: str, conversation: str = "") -> list:
     """
     Builds a prompt for the document assistant based on the question and context.
 
     Args:
         question (str): The question to be answered.
         context (str): The documentation context to use for answering the question.
+        conversation (str): The conversation so far (summary and recent messages), if any.
 
     Returns:
         list: A list of messages forming the prompt.
@@ -21,9 +22,12 @@ def build_assistant_prompt(question: str, context: str) -> list:
         """
     )
 
+    history = f"""Conversation so far:
+        {conversation}
+        """ if conversation else ""
     user = HumanMessage(
         content=f"""Based on the following documentation context, answer the question thoroughly but clearly.
-        Context:
+        {history}Context:
         {context}
         Question:
         {question}
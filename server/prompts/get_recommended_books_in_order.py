@@ -1,5 +1,3 @@
-from langchain_core.messages import HumanMessage, SystemMessage
-
 from module.book.types import GitHubFileItem
 import json
 
@@ -16,6 +14,8 @@ def get_recommended_books_in_order(
     Returns:
         str: A formatted prompt for the LLM to extract the recommended books in order.
     """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
     system_message = SystemMessage("""
     You are an assistant that extracts structured data from documentation.
 
@@ -0,0 +1,39 @@
+import hashlib
+
+# Git file modes as they appear in tree objects and in the GitHub trees API.
+MODE_FILE = "100644"
+MODE_EXECUTABLE = "100755"
+MODE_SYMLINK = "120000"
+MODE_TREE = "40000"
+
+
+def git_object_sha(kind: str, data: bytes) -> str:
+    header = f"{kind} {len(data)}\0".encode("utf-8")
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def git_blob_sha(data: bytes) -> str:
+    """
+    Compute the SHA git (and GitHub) assigns to a file with this content.
+    """
+    return git_object_sha("blob", data)
+
+
+def git_tree_sha(entries: list[tuple[str, str, str]]) -> str:
+    """
+    Compute the SHA of a tree object from its direct entries.
+
+    :param entries: (mode, name, sha) for each child, with modes like `MODE_FILE`.
+    :return: The hex SHA git would assign to the tree.
+    """
+
+    # Git sorts entries bytewise, comparing directory names as if they ended in "/".
+    def sort_key(entry):
+        mode, name, _ = entry
+        return name.encode("utf-8") + (b"/" if mode == MODE_TREE else b"")
+
+    body = b"".join(
+        f"{mode} {name}\0".encode("utf-8") + bytes.fromhex(sha)
+        for mode, name, sha in sorted(entries, key=sort_key)
+    )
+    return git_object_sha("tree", body)
@@ -1,12 +1,120 @@
-def fetch(url: str):
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    def __init__(self, url: str, status_code: int, text: str):
+        super().__init__(f"Failed to fetch {url}: {status_code} {text}")
+        self.url = url
+        self.status_code = status_code
+
+
+def _max_concurrency() -> int:
+    return int(os.getenv("GITHUB_MAX_CONCURRENCY", 8))
+
+
+def _max_retries() -> int:
+    return int(os.getenv("GITHUB_MAX_RETRIES", 5))
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared keep-alive client, creating it for the running event loop.
+
+    Concurrency is capped twice: by the connection pool and by a semaphore that
+    also covers time spent backing off, so retries never exceed the limit.
     """
-    Fetch the contents of the YDKJS repository.
-    :return: A list of GitHubFileItem representing the contents of the repository.
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        concurrency = _max_concurrency()
+        headers = {"Accept": "application/vnd.github+json", "User-Agent": "ydkjs-reader"}
+        token = os.getenv("GITHUB_TOKEN")
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        _client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(float(os.getenv("GITHUB_TIMEOUT", 30)), connect=10.0),
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+        )
+        _client_loop = loop
+        _semaphore = asyncio.Semaphore(concurrency)
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    # GitHub reports primary and secondary rate limits as 403 as well as 429.
+    if response.status_code == 403:
+        return (
+            response.headers.get("X-RateLimit-Remaining") == "0"
+            or "Retry-After" in response.headers
+        )
+    return response.status_code in RETRY_STATUSES
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """
+    Honour GitHub's rate-limit hints when present, otherwise back off exponentially.
     """
-    import requests
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        reset = response.headers.get("X-RateLimit-Reset")
+        if response.headers.get("X-RateLimit-Remaining") == "0" and reset and reset.isdigit():
+            return min(max(0.0, int(reset) - time.time()) + 1, 300.0)
+    return min(2**attempt, 60) + random.uniform(0, 1)
+
+
+async def fetch(url: str, etag: Optional[str] = None) -> httpx.Response:
+    """
+    GET a GitHub API url through the shared client with retries.
+
+    :param url: The url to fetch.
+    :param etag: A previously seen ETag; sent as If-None-Match so an unchanged
+        resource comes back as a 304 with an empty body.
+    :return: The 200 or 304 response.
+    """
+    client = get_http_client()
+    headers = {"If-None-Match": etag} if etag else {}
+    retries = _max_retries()
+
+    async with _semaphore:
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                print(f"Retrying {url} after {e!r}")
+            else:
+                if response.status_code in (200, 304):
+                    return response
+                if not _should_retry(response) or attempt == retries:
+                    raise FetchError(url, response.status_code, response.text)
+                print(f"Retrying {url} after HTTP {response.status_code}")
+            await asyncio.sleep(_retry_delay(response, attempt))
 
-    response = requests.get(f"{url}")
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"Failed to fetch: {response.status_code} {response.text}")
+    raise FetchError(url, 0, "retries exhausted")
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def profiler_enabled() -> bool:
+    return os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class SamplingProfiler:
+    """
+    A stack sampler for hot-path investigation on a running server.
+
+    A background thread snapshots the stack of every other thread each
+    `interval` seconds and counts identical stacks; the result is in the
+    "collapsed" format read by flamegraph.pl and speedscope. Nothing is traced
+    between samples, so the cost is one `sys._current_frames()` per interval and
+    none at all while the profiler is stopped.
+    """
+
+    def __init__(self, interval: float | None = None, max_depth: int = 64):
+        self.interval = interval or float(os.getenv("PROFILER_INTERVAL_MS", 5)) / 1000
+        self.max_depth = max_depth
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            module = os.path.basename(code.co_filename).removesuffix(".py")
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.samples[self._collapse(threads.get(ident, str(ident)), frame)] += 1
+
+    def start(self) -> None:
+        # Locked so two concurrent callers cannot both start a sampling thread.
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("The profiler is already running")
+            self.samples.clear()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> str:
+        """
+        :return: The collected stacks, one "frame;frame;... count" line each,
+            most frequent first.
+        """
+        self._stop.set()
+        with self._lock:
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def profile(self, seconds: float) -> str:
+        self.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            # Also on an invalid duration, or the sampler would run for good.
+            stacks = self.stop()
+        return stacks
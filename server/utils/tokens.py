@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    # Close enough for throughput reporting; nomic-embed-text averages ~4 chars/token on prose.
+    return max(1, len(text) // 4)